@@ -1,4 +1,6 @@
+import asyncio
 from contextlib import asynccontextmanager
+import anyio
 from fastapi import FastAPI, Request, Form
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse, RedirectResponse
@@ -16,22 +18,45 @@ uvicorn_logger.setLevel(logging.ERROR)
 uvicorn_access_logger = logging.getLogger("uvicorn.access")
 uvicorn_access_logger.setLevel(logging.ERROR)
 
-from app.models import db, create_tables, close_db
+from app.models import db, create_tables, close_db, new_db_state
+from app.services.album_artists import backfill_album_artists
+from app.services.import_jobs import import_worker
+from app.services.scrape_jobs import scrape_worker
+from app.services.http_client import http_client, close_http_client
 from app.routes import albums, browse, stats, admin
 from app.auth import login, logout, is_authenticated
-from app.config import SECRET_KEY
+from app.config import SECRET_KEY, WORKER_THREADS
 from app.templates_globals import templates
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = WORKER_THREADS
     create_tables()
-    yield
+    backfill_album_artists()
     close_db(None)
+    http_client()
+    workers = [asyncio.create_task(import_worker()), asyncio.create_task(scrape_worker())]
+    yield
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    await close_http_client()
+    db.close_all()
 
 app = FastAPI(title="Music Library", lifespan=lifespan)
 
 app.add_middleware(SessionMiddleware, secret_key=SECRET_KEY)
 
+@app.middleware("http")
+async def db_connection(request: Request, call_next):
+    # Each request checks a connection out of the pool on its first query
+    # and hands it back here once the response is ready
+    new_db_state()
+    try:
+        return await call_next(request)
+    finally:
+        close_db(None)
+
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
 @app.get("/login", response_class=HTMLResponse)
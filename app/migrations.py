@@ -0,0 +1,186 @@
+"""Numbered schema migrations.
+
+Each migration runs once, in order, inside its own transaction and is
+recorded in schema_migrations. They run at startup from create_tables()
+and can be applied or inspected by hand:
+
+    python -m app.migrations           # apply pending migrations
+    python -m app.migrations --list    # show applied/pending migrations
+"""
+import sys
+import logging
+from app.models import db, SchemaMigration, MODELS
+
+logger = logging.getLogger(__name__)
+
+# Serializes migrations when several uvicorn workers start at once
+MIGRATION_LOCK_ID = 7305150021
+
+MIGRATIONS = []
+
+
+def migration(version: int, name: str):
+    def register(func):
+        MIGRATIONS.append((version, name, func))
+        return func
+    return register
+
+
+@migration(1, "album_genres_jsonb")
+def album_genres_jsonb():
+    columns = {c.name: c.data_type for c in db.get_columns('albums')}
+    if columns.get('genres') != 'jsonb':
+        db.execute_sql("ALTER TABLE albums ALTER COLUMN genres TYPE jsonb USING genres::jsonb")
+    if 'genres_normalized' not in columns:
+        db.execute_sql("ALTER TABLE albums ADD COLUMN genres_normalized jsonb")
+    db.execute_sql("""
+        UPDATE albums SET genres_normalized = COALESCE((
+            SELECT jsonb_agg(DISTINCT lower(btrim(g)))
+            FROM jsonb_array_elements_text(
+                CASE WHEN jsonb_typeof(albums.genres) = 'array' THEN albums.genres ELSE '[]'::jsonb END
+            ) AS g
+            WHERE btrim(g) <> ''
+        ), '[]'::jsonb)
+        WHERE genres_normalized IS NULL
+    """)
+    db.execute_sql(
+        "CREATE INDEX IF NOT EXISTS album_genres_normalized ON albums USING GIN (genres_normalized)"
+    )
+
+
+@migration(2, "album_search_trigram")
+def album_search_trigram():
+    db.execute_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    db.execute_sql("CREATE EXTENSION IF NOT EXISTS unaccent")
+    db.execute_sql("""
+        CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text AS
+        $$ SELECT public.unaccent('public.unaccent', $1) $$
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    """)
+    db.execute_sql(
+        "CREATE INDEX IF NOT EXISTS album_title_trgm ON albums USING GIN (f_unaccent(lower(title)) gin_trgm_ops)"
+    )
+    db.execute_sql(
+        "CREATE INDEX IF NOT EXISTS album_artist_trgm ON albums USING GIN (f_unaccent(lower(artist)) gin_trgm_ops)"
+    )
+
+
+@migration(3, "album_listing_indexes")
+def album_listing_indexes():
+    # Collection / wishlist grids: WHERE is_wanted = ? ORDER BY <sort key>, id
+    db.execute_sql("CREATE INDEX IF NOT EXISTS album_wanted_title ON albums (is_wanted, title, id)")
+    db.execute_sql("CREATE INDEX IF NOT EXISTS album_wanted_artist ON albums (is_wanted, artist, id)")
+    db.execute_sql(
+        "CREATE INDEX IF NOT EXISTS album_wanted_year ON albums (is_wanted, COALESCE(year, 9999), id)"
+    )
+    # /year and /decade: equality or range on year within the collection
+    db.execute_sql("CREATE INDEX IF NOT EXISTS album_year_title ON albums (year, title, id) WHERE NOT is_wanted")
+    # /format: equality on format within the collection, artist is the default sort
+    db.execute_sql(
+        "CREATE INDEX IF NOT EXISTS album_format_artist ON albums (physical_format, artist, id) WHERE NOT is_wanted"
+    )
+
+
+@migration(4, "import_lookup_indexes")
+def import_lookup_indexes():
+    # Duplicate detection and Discogs year updates in import_csv.py
+    db.execute_sql(
+        "CREATE INDEX IF NOT EXISTS album_discogs_id ON albums (discogs_id) WHERE discogs_id IS NOT NULL"
+    )
+    db.execute_sql(
+        "CREATE INDEX IF NOT EXISTS album_artist_title_format ON albums (artist, title, physical_format)"
+    )
+    db.execute_sql(
+        "CREATE INDEX IF NOT EXISTS artistmapping_original_name ON artist_mappings (original_name)"
+    )
+    db.execute_sql(
+        "CREATE INDEX IF NOT EXISTS artistmapping_new_name ON artist_mappings (new_name)"
+    )
+
+
+@migration(5, "artist_summaries")
+def artist_summaries():
+    db.execute_sql("""
+        INSERT INTO artist_summaries (name, album_count)
+        SELECT aa.artist_name, COUNT(*)
+        FROM album_artists aa JOIN albums a ON a.id = aa.album_id
+        WHERE NOT a.is_wanted
+        GROUP BY aa.artist_name
+        ON CONFLICT (name) DO UPDATE SET album_count = EXCLUDED.album_count
+    """)
+    # /artists sorts by name or by album count
+    db.execute_sql("CREATE INDEX IF NOT EXISTS artistsummary_lower_name ON artist_summaries (lower(name))")
+    db.execute_sql(
+        "CREATE INDEX IF NOT EXISTS artistsummary_album_count ON artist_summaries (album_count, lower(name))"
+    )
+
+
+@migration(6, "browse_facet_indexes")
+def browse_facet_indexes():
+    # /browse: compilation filter within the collection, artist is the default sort
+    db.execute_sql(
+        "CREATE INDEX IF NOT EXISTS album_compilation_artist ON albums (is_compilation, artist, id) WHERE NOT is_wanted"
+    )
+    # Facet counts group the filtered collection by these columns; lets them run as index-only scans
+    db.execute_sql(
+        "CREATE INDEX IF NOT EXISTS album_facets ON albums (year, physical_format, is_compilation) WHERE NOT is_wanted"
+    )
+
+
+@migration(7, "import_job_queue_index")
+def import_job_queue_index():
+    # Import workers claim the oldest unfinished job
+    db.execute_sql(
+        "CREATE INDEX IF NOT EXISTS importjob_queue ON import_jobs (id) WHERE status IN ('pending', 'running')"
+    )
+
+
+@migration(8, "scrape_job_queue_index")
+def scrape_job_queue_index():
+    # Scrape workers claim the oldest unfinished job
+    db.execute_sql(
+        "CREATE INDEX IF NOT EXISTS scrapejob_queue ON scrape_jobs (id) WHERE status IN ('pending', 'running')"
+    )
+    # One active job per kind, enforced so concurrent submissions can't both queue one
+    db.execute_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS scrapejob_active_kind ON scrape_jobs (kind) WHERE status IN ('pending', 'running', 'paused')"
+    )
+
+
+def applied_versions() -> set:
+    return {m.version for m in SchemaMigration.select(SchemaMigration.version)}
+
+
+def pending_migrations() -> list:
+    applied = applied_versions()
+    return [m for m in sorted(MIGRATIONS, key=lambda m: m[0]) if m[0] not in applied]
+
+
+def run_migrations() -> list:
+    db.create_tables([SchemaMigration], safe=True)
+    db.execute_sql("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+    try:
+        applied = []
+        for version, name, func in pending_migrations():
+            logger.info(f"Applying migration {version:04d}_{name}")
+            with db.atomic():
+                func()
+                SchemaMigration.create(version=version, name=name)
+            applied.append(version)
+        return applied
+    finally:
+        db.execute_sql("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+
+
+if __name__ == "__main__":
+    db.connect()
+    db.create_tables(MODELS, safe=True)
+    if "--list" in sys.argv[1:]:
+        applied = applied_versions()
+        for version, name, _ in sorted(MIGRATIONS, key=lambda m: m[0]):
+            status = "applied" if version in applied else "pending"
+            print(f"{version:04d}_{name}: {status}")
+    else:
+        applied = run_migrations()
+        print(f"Applied {len(applied)} migration(s)" if applied else "Database is up to date")
+    db.close()
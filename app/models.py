@@ -1,8 +1,12 @@
 import json
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime
-from peewee import Model, PostgresqlDatabase, CharField, IntegerField, TextField, BooleanField, DateTimeField
-from playhouse.postgres_ext import JSONField
-from app.config import DATABASE_URL
+from peewee import _ConnectionState, Model, CharField, IntegerField, BigIntegerField, TextField, BooleanField, DateTimeField, ForeignKeyField, BlobField, Case, SQL, fn
+from playhouse.pool import PooledPostgresqlDatabase
+from playhouse.postgres_ext import JSONField, BinaryJSONField
+from app.utils.cache import invalidate_album_caches, use_shared_generation
+from app.config import DATABASE_URL, DB_MAX_CONNECTIONS, DB_STALE_TIMEOUT, DB_POOL_TIMEOUT
 
 def parse_database_url(url):
     from urllib.parse import urlparse
@@ -15,14 +19,58 @@ def parse_database_url(url):
         'database': parsed.path.lstrip('/')
     }
 
+def _fresh_state():
+    return {'closed': True, 'conn': None, 'ctx': [], 'transactions': []}
+
+db_state = ContextVar('db_state', default=None)
+_process_state = _fresh_state()
+
+class ContextConnectionState(_ConnectionState):
+    """Peewee connection state kept in a context variable instead of a thread local.
+
+    All async routes share the event loop thread, so a thread local would hand
+    every in-flight request the same connection. Each request (see the middleware
+    in main.py) and each background job calls new_db_state() to get its own.
+    """
+    def __setattr__(self, name, value):
+        (db_state.get() or _process_state)[name] = value
+
+    def __getattr__(self, name):
+        try:
+            return (db_state.get() or _process_state)[name]
+        except KeyError:
+            raise AttributeError(name)
+
+def new_db_state():
+    db_state.set(_fresh_state())
+
 db_params = parse_database_url(DATABASE_URL)
-db = PostgresqlDatabase(
+db = PooledPostgresqlDatabase(
     db_params['database'],
     host=db_params['host'],
     port=db_params['port'],
     user=db_params['user'],
-    password=db_params['password']
+    password=db_params['password'],
+    max_connections=DB_MAX_CONNECTIONS,
+    stale_timeout=DB_STALE_TIMEOUT,
+    timeout=DB_POOL_TIMEOUT
 )
+db._state = ContextConnectionState()
+
+def normalize_genres(genres) -> list:
+    if isinstance(genres, str):
+        try:
+            genres = json.loads(genres)
+        except ValueError:
+            genres = [genres]
+    normalized = []
+    for genre in genres or []:
+        if not isinstance(genre, str):
+            continue
+        tag = genre.lower().strip()
+        if tag and tag not in normalized:
+            normalized.append(tag)
+    return normalized
 
 class Album(Model):
     title = CharField()
@@ -31,7 +79,8 @@ class Album(Model):
     year_discogs_release = IntegerField(null=True)
     released = CharField(null=True)
     physical_format = CharField(null=True)
-    genres = JSONField(null=True, default=list)
+    genres = BinaryJSONField(null=True, default=list, index=False)
+    genres_normalized = BinaryJSONField(null=True, default=list, index=False)
     cover_image_path = CharField(null=True)
     discogs_id = CharField(null=True)
     is_wanted = BooleanField(default=False)
@@ -46,7 +95,15 @@ class Album(Model):
 
     def save(self, *args, **kwargs):
         self.updated_at = datetime.now()
-        return super().save(*args, **kwargs)
+        self.genres_normalized = normalize_genres(self.genres)
+        result = super().save(*args, **kwargs)
+        invalidate_album_caches()
+        return result
+
+    def delete_instance(self, *args, **kwargs):
+        result = super().delete_instance(*args, **kwargs)
+        invalidate_album_caches()
+        return result
 
 class Artist(Model):
     name = CharField(unique=True)
@@ -74,11 +131,223 @@ class ArtistMapping(Model):
         database = db
         table_name = 'artist_mappings'
 
+class AlbumArtist(Model):
+    album = ForeignKeyField(Album, backref='credits', on_delete='CASCADE')
+    artist_name = CharField()
+    position = IntegerField(default=0)
+
+    class Meta:
+        database = db
+        table_name = 'album_artists'
+        indexes = (
+            (('artist_name', 'album'), True),
+        )
+
+class ArtistSummary(Model):
+    # Collection album count per credited artist, kept current by
+    # refresh_artist_summaries() whenever album credits change
+    name = CharField(unique=True)
+    album_count = IntegerField(default=0)
+
+    class Meta:
+        database = db
+        table_name = 'artist_summaries'
+
+class ImportJob(Model):
+    # Discogs CSV uploads waiting for or run by app.services.import_jobs;
+    # the file is kept in import_job_chunks until the job finishes
+    kind = CharField()
+    filename = CharField()
+    status = CharField(default='pending')
+    rows_total = IntegerField(null=True)
+    rows_processed = IntegerField(default=0)
+    bytes_total = BigIntegerField(default=0)
+    bytes_processed = BigIntegerField(default=0)
+    # Set anew by every claim; a worker whose token no longer matches has lost the job
+    claim_token = CharField(null=True)
+    results = BinaryJSONField(null=True, index=False)
+    error = TextField(null=True)
+    created_at = DateTimeField(default=datetime.now)
+    started_at = DateTimeField(null=True)
+    heartbeat_at = DateTimeField(null=True)
+    finished_at = DateTimeField(null=True)
+
+    class Meta:
+        database = db
+        table_name = 'import_jobs'
+
+class ImportJobChunk(Model):
+    # An import job's uploaded file, split into pieces in upload order
+    job = ForeignKeyField(ImportJob, backref='chunks', on_delete='CASCADE')
+    seq = IntegerField()
+    data = BlobField()
+
+    class Meta:
+        database = db
+        table_name = 'import_job_chunks'
+        indexes = (
+            (('job', 'seq'), True),
+        )
+
+class ImportFingerprint(Model):
+    # Hash of the CSV columns a Discogs release was last imported with, per
+    # list, so weekly re-imports can skip rows that haven't changed
+    discogs_id = CharField()
+    is_wanted = BooleanField()
+    fingerprint = CharField()
+    imported_at = DateTimeField(default=datetime.now)
+
+    class Meta:
+        database = db
+        table_name = 'import_fingerprints'
+        indexes = (
+            (('discogs_id', 'is_wanted'), True),
+        )
+
+class ResponseCache(Model):
+    # Last.fm API and page responses kept by app.services.response_cache,
+    # keyed by a hash of the request without the api_key; body is zlib-compressed
+    key = CharField(unique=True)
+    url = TextField()
+    status_code = IntegerField()
+    headers = BinaryJSONField(index=False)
+    body = BlobField()
+    size = IntegerField()
+    fetched_at = DateTimeField(default=datetime.now)
+    expires_at = DateTimeField()
+    used_at = DateTimeField(default=datetime.now, index=True)
+
+    class Meta:
+        database = db
+        table_name = 'response_cache'
+
+class ScrapeFailure(Model):
+    # Albums (by id) and artists (by name) a bulk scrape found nothing for;
+    # bulk scrapes leave them out until retry_after, see app.services.scrape_failures
+    kind = CharField()
+    key = CharField()
+    attempts = IntegerField(default=1)
+    last_attempt_at = DateTimeField(default=datetime.now)
+    retry_after = DateTimeField()
+
+    class Meta:
+        database = db
+        table_name = 'scrape_failures'
+        indexes = (
+            (('kind', 'key'), True),
+        )
+
+class ScrapeJob(Model):
+    # Bulk Last.fm scrapes run by app.services.scrape_jobs, one row per
+    # album or artist in scrape_job_items
+    kind = CharField()
+    status = CharField(default='pending')
+    items_total = IntegerField(default=0)
+    items_processed = IntegerField(default=0)
+    items_updated = IntegerField(default=0)
+    # items_processed when the current run started, for its rate
+    items_at_start = IntegerField(default=0)
+    # Set anew by every claim; a worker whose token no longer matches has lost the job
+    claim_token = CharField(null=True)
+    error = TextField(null=True)
+    created_at = DateTimeField(default=datetime.now)
+    started_at = DateTimeField(null=True)
+    heartbeat_at = DateTimeField(null=True)
+    finished_at = DateTimeField(null=True)
+
+    class Meta:
+        database = db
+        table_name = 'scrape_jobs'
+
+class ScrapeJobItem(Model):
+    job = ForeignKeyField(ScrapeJob, backref='items', on_delete='CASCADE')
+    key = CharField()
+    status = CharField(default='pending')
+    finished_at = DateTimeField(null=True)
+
+    class Meta:
+        database = db
+        table_name = 'scrape_job_items'
+        indexes = (
+            (('job', 'status'), False),
+        )
+
+def album_missing_genres():
+    return Album.genres_normalized.is_null() | (fn.jsonb_array_length(Album.genres_normalized) == 0)
+
+def artist_missing_genres():
+    # artists.genres is plain json and may hold null or a non-array value
+    genres = Case(None, [(fn.json_typeof(Artist.genres) == 'array', Artist.genres)], SQL("'[]'::json"))
+    return Artist.genres.is_null() | (fn.json_array_length(genres) == 0)
+
+def album_year_sort_key():
+    # NULL years sort after every real year, as they do in a plain ORDER BY year
+    return fn.COALESCE(Album.year, 9999)
+
+def search_key(field):
+    return fn.f_unaccent(fn.lower(field))
+
+def album_search(search: str):
+    escaped = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    pattern = search_key(f"%{escaped}%")
+    return (search_key(Album.title) % pattern) | (search_key(Album.artist) % pattern)
+
+class SchemaMigration(Model):
+    version = IntegerField(primary_key=True)
+    name = CharField()
+    applied_at = DateTimeField(default=datetime.now)
+
+    class Meta:
+        database = db
+        table_name = 'schema_migrations'
+
+class CacheGeneration(Model):
+    # Bumped on every album write so each worker process's album caches can tell
+    # their entries are stale (see app.utils.cache)
+    name = CharField(primary_key=True)
+    generation = BigIntegerField(default=0)
+
+    class Meta:
+        database = db
+        table_name = 'cache_generations'
+
+def read_album_generation() -> int:
+    return (CacheGeneration
+            .select(CacheGeneration.generation)
+            .where(CacheGeneration.name == 'albums')
+            .scalar() or 0)
+
+def bump_album_generation():
+    # Runs in the writer's transaction, so other processes only see the new
+    # generation once the write they have to recompute for is committed
+    (CacheGeneration
+     .insert(name='albums', generation=1)
+     .on_conflict(conflict_target=[CacheGeneration.name],
+                  update={CacheGeneration.generation: CacheGeneration.generation + 1})
+     .execute())
+
+use_shared_generation(read_album_generation, bump_album_generation)
+
+MODELS = [Album, Artist, ArtistMapping, AlbumArtist, ArtistSummary, ImportJob, ImportJobChunk, ImportFingerprint, ResponseCache, ScrapeFailure, ScrapeJob, ScrapeJobItem, SchemaMigration, CacheGeneration]
+
 def create_tables():
+    from app.migrations import run_migrations
+
     db.connect()
-    db.create_tables([Album, Artist, ArtistMapping], safe=True)
+    db.create_tables(MODELS, safe=True)
+    run_migrations()
     db.close()
 
 def close_db(e):
     if not db.is_closed():
         db.close()
+
+@contextmanager
+def own_connection():
+    """Run the block on a pooled connection of its own, outside any transaction open in this context."""
+    token = db_state.set(_fresh_state())
+    try:
+        yield
+    finally:
+        close_db(None)
+        db_state.reset(token)
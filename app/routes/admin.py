@@ -1,12 +1,17 @@
-from fastapi import APIRouter, Request, UploadFile, File, Form, Depends
-from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
-from app.services.import_csv import parse_discogs_csv, get_import_stats, update_discogs_years, is_compilation_artist
-from app.services.lastfm import scrape_album, scrape_artist as scrape_artist_profile
-from app.models import Album, Artist
+from fastapi import APIRouter, Request, UploadFile, File, Form, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse, JSONResponse
+from app.services.import_csv import get_import_stats, is_compilation_artist
+from app.services.import_jobs import submit_import, get_import_job, recent_import_jobs, job_progress
+from app.services.scrape_jobs import submit_scrape, get_scrape_job, recent_scrape_jobs, job_progress as scrape_progress, pause_scrape_job, resume_scrape_job, cancel_scrape_job
+from app.services.album_artists import get_artist_stats
+from app.services.scrape_failures import ALBUM, ARTIST, cooling_down, scrape_failure_counts, reset_scrape_failures
+from app.models import Album, Artist, album_missing_genres
 from app.auth import require_admin
 from app.templates_globals import templates
-from app.config import COVERS_DIR, ARTISTS_DIR, DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME
-from app.utils.artists import split_artists
+from app.config import ADMIN_STATS_CACHE_TTL, COVERS_DIR, ARTISTS_DIR, DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME
+from app.utils.artists import split_artists_many, artist_mappings
+from app.utils.cache import TTLCache, invalidate_album_caches
 import os
 import io
 import zipfile
@@ -15,50 +20,23 @@ from datetime import datetime
 
 router = APIRouter()
 
-_last_import_results = None
+dashboard_cache = TTLCache(ADMIN_STATS_CACHE_TTL)
+
+def get_dashboard_stats() -> tuple:
+    return dashboard_cache.get("dashboard", lambda: (get_import_stats(), get_artist_stats()))
 
 @router.get("/admin", response_class=HTMLResponse)
-async def admin_page(request: Request, message: str = None, error: str = None, _: bool = Depends(require_admin)):
-    global _last_import_results
-    stats = get_import_stats()
-    import_results = _last_import_results
-    _last_import_results = None
-    
-    albums = Album.select().where(Album.is_wanted == False).dicts()
-    
-    artist_names_set = set()
-    for album in albums:
-        artists = split_artists(album['artist'])
-        for artist_name in artists:
-            artist_names_set.add(artist_name)
-    
-    total_artists = len(artist_names_set)
-    
-    artists_missing_image = 0
-    artists_missing_bio = 0
-    artists_missing_genres = 0
-    
-    for artist_name in artist_names_set:
-        artist = Artist.select().where(Artist.name == artist_name).first()
-        
-        if not artist:
-            artists_missing_image += 1
-            artists_missing_bio += 1
-            artists_missing_genres += 1
+def admin_page(request: Request, message: str = None, error: str = None, job: int = None, _: bool = Depends(require_admin)):
+    stats, artist_stats = get_dashboard_stats()
+    
+    import_job = get_import_job(job) if job else None
+    import_job = job_progress(import_job) if import_job else None
+    import_results = None
+    if import_job and import_job['status'] == 'done':
+        if import_job['kind'] == 'discogs-years':
+            message = message or f"Updated {import_job['results']['updated']} albums with Discogs years"
         else:
-            if not artist.image_url:
-                artists_missing_image += 1
-            if not artist.bio:
-                artists_missing_bio += 1
-            if not artist.genres or artist.genres == [] or artist.genres == '[]':
-                artists_missing_genres += 1
-    
-    artist_stats = {
-        'total': total_artists,
-        'missing_image': artists_missing_image,
-        'missing_bio': artists_missing_bio,
-        'missing_genres': artists_missing_genres
-    }
+            import_results = dict(import_job['results'], type=import_job['kind'])
     
     return templates.TemplateResponse("admin.html", {
         "request": request,
@@ -66,82 +44,61 @@ async def admin_page(request: Request, message: str = None, error: str = None, _
         "artist_stats": artist_stats,
         "message": message,
         "error": error,
-        "import_results": import_results
+        "import_job": import_job,
+        "import_results": import_results,
+        "recent_imports": [job_progress(j) for j in recent_import_jobs()],
+        "scrape_failures": scrape_failure_counts(),
+        "scrape_jobs": [scrape_progress(j) for j in recent_scrape_jobs()]
     })
 
-@router.post("/admin/import/collection")
-async def import_collection(request: Request, file: UploadFile = File(...), _: bool = Depends(require_admin)):
-    global _last_import_results
-    
+async def queue_import(file: UploadFile, kind: str):
     if not file.filename.endswith('.csv'):
         return RedirectResponse(
             url="/admin?error=Please+upload+a+CSV+file", 
             status_code=303
         )
     
-    content = await file.read()
-    results = parse_discogs_csv(content, is_wanted=False)
+    job = await run_in_threadpool(submit_import, kind, file.filename, file.file)
     
-    _last_import_results = {
-        'type': 'collection',
-        'imported': results['imported'],
-        'skipped_duplicates': results['skipped_duplicates'],
-        'skipped_missing': results['skipped_missing'],
-        'errors': results['errors']
-    }
-    
-    return RedirectResponse(url="/admin", status_code=303)
+    return RedirectResponse(url=f"/admin?job={job.id}", status_code=303)
+
+@router.post("/admin/import/collection")
+async def import_collection(request: Request, file: UploadFile = File(...), _: bool = Depends(require_admin)):
+    return await queue_import(file, 'collection')
 
 @router.post("/admin/import/wishlist")
 async def import_wishlist(request: Request, file: UploadFile = File(...), _: bool = Depends(require_admin)):
-    global _last_import_results
-    
-    if not file.filename.endswith('.csv'):
-        return RedirectResponse(
-            url="/admin?error=Please+upload+a+CSV+file", 
-            status_code=303
-        )
-    
-    content = await file.read()
-    results = parse_discogs_csv(content, is_wanted=True)
-    
-    _last_import_results = {
-        'type': 'wishlist',
-        'imported': results['imported'],
-        'skipped_duplicates': results['skipped_duplicates'],
-        'skipped_missing': results['skipped_missing'],
-        'errors': results['errors']
-    }
-    
-    return RedirectResponse(url="/admin", status_code=303)
+    return await queue_import(file, 'wishlist')
 
 @router.post("/admin/import/discogs-years")
 async def import_discogs_years(request: Request, file: UploadFile = File(...), _: bool = Depends(require_admin)):
-    from app.services.import_csv import update_discogs_years
-    
-    if not file.filename.endswith('.csv'):
-        return RedirectResponse(
-            url="/admin?error=Please+upload+a+CSV+file", 
-            status_code=303
-        )
-    
-    content = await file.read()
-    results = update_discogs_years(content)
-    
-    return RedirectResponse(
-        url=f"/admin?message=Updated+{results['updated']}+albums+with+Discogs+years", 
-        status_code=303
-    )
+    return await queue_import(file, 'discogs-years')
+
+@router.get("/admin/import/jobs/{job_id:int}")
+def import_job_status(job_id: int, _: bool = Depends(require_admin)):
+    job = get_import_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return JSONResponse(job_progress(job))
+
+def albums_needing_scrape() -> list:
+    candidates = list(Album.select().where(
+        Album.cover_image_path.is_null() | (Album.cover_image_path == '') |
+        Album.year.is_null() | (Album.year == 0) |
+        album_missing_genres()
+    ))
+    credits = split_artists_many(a.artist for a in candidates)
+    skipped = cooling_down(ALBUM)
+    
+    return [
+        a for a in candidates 
+        if str(a.id) not in skipped
+        and not any(is_compilation_artist(artist) for artist in credits[a.artist])
+    ]
 
 @router.post("/admin/scrape")
 async def bulk_scrape(request: Request, _: bool = Depends(require_admin)):
-    all_albums = list(Album.select())
-    
-    albums_to_scrape = [
-        a for a in all_albums 
-        if not any(is_compilation_artist(artist) for artist in split_artists(a.artist))
-        and (not a.cover_image_path or not a.year or not a.genres or a.genres == [] or a.genres == '[]')
-    ]
+    albums_to_scrape = await run_in_threadpool(albums_needing_scrape)
     
     if not albums_to_scrape:
         return RedirectResponse(
@@ -149,30 +106,25 @@ async def bulk_scrape(request: Request, _: bool = Depends(require_admin)):
             status_code=303
         )
     
-    updated_count = 0
-    for album in albums_to_scrape:
-        result = await scrape_album(album)
-        if result["updated"]:
-            updated_count += 1
-    
-    message = f"Scraped {updated_count} of {len(albums_to_scrape)} albums"
-    return RedirectResponse(
-        url=f"/admin?message={message}", 
-        status_code=303
-    )
+    await run_in_threadpool(submit_scrape, ALBUM, [a.id for a in albums_to_scrape])
+    return RedirectResponse(url="/admin#scrape-jobs", status_code=303)
 
 @router.get("/admin/missing-data", response_class=HTMLResponse)
-async def missing_data_page(request: Request, _: bool = Depends(require_admin)):
-    all_albums = list(Album.select())
+def missing_data_page(request: Request, _: bool = Depends(require_admin)):
+    candidates = Album.select().where(
+        Album.year.is_null() | (Album.year == 0) |
+        Album.cover_image_path.is_null() | (Album.cover_image_path == '') |
+        album_missing_genres()
+    )
     
     albums_with_missing = []
-    for album in all_albums:
+    for album in candidates:
         missing = []
         if not album.year:
             missing.append('Year')
         if not album.cover_image_path:
             missing.append('Cover')
-        if not album.genres or album.genres == [] or album.genres == '[]':
+        if not album.genres_normalized:
             missing.append('Genres')
         
         if missing:
@@ -186,20 +138,19 @@ async def missing_data_page(request: Request, _: bool = Depends(require_admin)):
         "albums_with_missing": albums_with_missing
     })
 
-@router.post("/admin/scrape-artists")
-async def bulk_scrape_artists(request: Request, _: bool = Depends(require_admin)):
-    albums = Album.select().where(Album.is_wanted == False).dicts()
+def artists_needing_scrape() -> list:
+    albums = Album.select(Album.artist).where(Album.is_wanted == False).tuples()
     
     artist_names_set = set()
-    for album in albums:
-        artists = split_artists(album['artist'])
+    for artists in split_artists_many(artist for artist, in albums).values():
         for artist_name in artists:
             if not is_compilation_artist(artist_name):
                 artist_names_set.add(artist_name)
     
+    skipped = cooling_down(ARTIST)
     artists_to_scrape = []
     for artist_name in artist_names_set:
-        if is_compilation_artist(artist_name):
+        if is_compilation_artist(artist_name) or artist_name in skipped:
             continue
         artist = Artist.select().where(Artist.name == artist_name).first()
         
@@ -208,31 +159,59 @@ async def bulk_scrape_artists(request: Request, _: bool = Depends(require_admin)
         elif not artist.image_url or not artist.bio or not artist.genres or artist.genres == [] or artist.genres == '[]':
             artists_to_scrape.append(artist_name)
     
+    return artists_to_scrape
+
+@router.post("/admin/scrape-artists")
+async def bulk_scrape_artists(request: Request, _: bool = Depends(require_admin)):
+    artists_to_scrape = await run_in_threadpool(artists_needing_scrape)
+    
     if not artists_to_scrape:
         return RedirectResponse(
             url="/admin?message=No+artists+need+scraping", 
             status_code=303
         )
     
-    updated_count = 0
-    for artist_name in artists_to_scrape:
-        result = await scrape_artist_profile(artist_name)
-        if result["updated"]:
-            updated_count += 1
-    
-    message = f"Scraped {updated_count} of {len(artists_to_scrape)} artist profiles"
+    await run_in_threadpool(submit_scrape, ARTIST, artists_to_scrape)
+    return RedirectResponse(url="/admin#scrape-jobs", status_code=303)
+
+SCRAPE_JOB_ACTIONS = {
+    'pause': pause_scrape_job,
+    'resume': resume_scrape_job,
+    'cancel': cancel_scrape_job,
+}
+
+@router.get("/admin/scrape/jobs/{job_id:int}")
+def scrape_job_status(job_id: int, _: bool = Depends(require_admin)):
+    job = get_scrape_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Scrape job not found")
+    return JSONResponse(scrape_progress(job))
+
+@router.post("/admin/scrape/jobs/{job_id:int}/{action}")
+def scrape_job_action(job_id: int, action: str, _: bool = Depends(require_admin)):
+    if action not in SCRAPE_JOB_ACTIONS:
+        raise HTTPException(status_code=404, detail="Unknown action")
+    if not get_scrape_job(job_id):
+        raise HTTPException(status_code=404, detail="Scrape job not found")
+    SCRAPE_JOB_ACTIONS[action](job_id)
+    return RedirectResponse(url="/admin#scrape-jobs", status_code=303)
+
+@router.post("/admin/scrape/reset-failures")
+def reset_scrape_backoff(_: bool = Depends(require_admin)):
+    cleared = reset_scrape_failures()
     return RedirectResponse(
-        url=f"/admin?message={message}", 
+        url=f"/admin?message=Cleared+{cleared}+scrape+failures",
         status_code=303
     )
 
 @router.get("/admin/missing-artists", response_class=HTMLResponse)
-async def missing_artists_page(request: Request, _: bool = Depends(require_admin)):
-    albums = Album.select().where(Album.is_wanted == False).dicts()
+def missing_artists_page(request: Request, _: bool = Depends(require_admin)):
+    albums = list(Album.select(Album.id, Album.artist).where(Album.is_wanted == False).dicts())
+    credits = split_artists_many(album['artist'] for album in albums)
     
     artist_albums = {}
     for album in albums:
-        artists = split_artists(album['artist'])
+        artists = credits[album['artist']]
         for artist_name in artists:
             if artist_name not in artist_albums:
                 artist_albums[artist_name] = set()
@@ -267,7 +246,7 @@ async def missing_artists_page(request: Request, _: bool = Depends(require_admin
     })
 
 @router.get("/admin/backup", response_class=HTMLResponse)
-async def backup_page(request: Request, _: bool = Depends(require_admin), message: str = None, error: str = None):
+def backup_page(request: Request, _: bool = Depends(require_admin), message: str = None, error: str = None):
     stats = {
         'album_count': Album.select().count(),
         'artist_count': Artist.select().count(),
@@ -282,15 +261,17 @@ async def backup_page(request: Request, _: bool = Depends(require_admin), messag
     })
 
 @router.get("/admin/backup/database")
-async def backup_database(_: bool = Depends(require_admin)):
+def backup_database(_: bool = Depends(require_admin)):
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"music_library_backup_{timestamp}.sql"
     
     env = os.environ.copy()
     env["PGPASSWORD"] = DB_PASSWORD
     
+    # The Last.fm response cache can be rebuilt and would only bloat the dump
     process = subprocess.Popen(
-        ["pg_dump", "-U", DB_USER, "-h", DB_HOST, "-p", str(DB_PORT), "--no-owner", "--no-acl", "--clean", DB_NAME],
+        ["pg_dump", "-U", DB_USER, "-h", DB_HOST, "-p", str(DB_PORT), "--no-owner", "--no-acl", "--clean",
+         "--exclude-table-data=response_cache", DB_NAME],
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
         env=env
@@ -311,7 +292,7 @@ async def backup_database(_: bool = Depends(require_admin)):
     )
 
 @router.get("/admin/backup/images")
-async def backup_images(_: bool = Depends(require_admin)):
+def backup_images(_: bool = Depends(require_admin)):
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"music_library_images_{timestamp}.zip"
     
@@ -355,12 +336,14 @@ async def restore_database(file: UploadFile = File(...), _: bool = Depends(requi
         stderr=subprocess.PIPE,
         env=env
     )
-    stdout, stderr = process.communicate(input=content)
+    stdout, stderr = await run_in_threadpool(process.communicate, content)
     
     if process.returncode != 0:
         error_msg = stderr.decode('utf-8', errors='replace')[:200]
         return RedirectResponse(url=f"/admin/backup?error=Database+restore+failed", status_code=303)
     
+    invalidate_album_caches()
+    artist_mappings.invalidate()
     return RedirectResponse(url="/admin/backup?message=Database+restored+successfully", status_code=303)
 
 @router.post("/admin/restore/covers")
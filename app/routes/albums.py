@@ -2,15 +2,18 @@ import os
 import json
 import re
 from fastapi import APIRouter, Request, Form, UploadFile, File, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import RedirectResponse, HTMLResponse
 from peewee import fn
-from app.models import Album, db
+from app.models import Album, db, album_search, album_year_sort_key
 from app.config import COVERS_DIR
 from app.services.lastfm import scrape_album
-from app.services.image_utils import resize_image
+from app.services.image_utils import save_resized_image
+from app.services.album_artists import sync_album_artists, remove_album, forget_fingerprint
 from app.auth import require_admin
 from app.templates_globals import templates
 from app.utils.artists import apply_artist_mapping, sanitize_filename
+from app.utils.pagination import paginate, DEFAULT_PAGE_SIZE
 
 router = APIRouter()
 
@@ -25,8 +28,22 @@ def album_url(album):
 
 templates.env.globals["album_url"] = album_url
 
+def save_album(album, was_wanted: bool = None):
+    with db.atomic():
+        album.save()
+        sync_album_artists(album)
+        if was_wanted is not None and was_wanted != album.is_wanted:
+            forget_fingerprint(album.discogs_id, was_wanted)
+
+def get_album_or_404(album_id: int):
+    try:
+        return Album.get_by_id(album_id)
+    except Album.DoesNotExist:
+        raise HTTPException(status_code=404, detail="Album not found")
+
 @router.get("/", response_class=HTMLResponse)
-async def home(request: Request, search: str = "", sort: str = "title", order: str = "asc", compilation: str = ""):
+def home(request: Request, search: str = "", sort: str = "title", order: str = "asc", compilation: str = "",
+         after: str = None, before: str = None, limit: int = DEFAULT_PAGE_SIZE):
     query = Album.select().where(Album.is_wanted == False)
     
     if compilation == "true":
@@ -35,23 +52,21 @@ async def home(request: Request, search: str = "", sort: str = "title", order: s
         query = query.where(Album.is_compilation == False)
     
     if search:
-        query = query.where(
-            (Album.title.contains(search)) | 
-            (Album.artist.contains(search))
-        )
+        query = query.where(album_search(search))
     
     if sort == "artist":
-        query = query.order_by(Album.artist.asc() if order == "asc" else Album.artist.desc())
+        sort_key = Album.artist
     elif sort == "year":
-        query = query.order_by(Album.year.asc() if order == "asc" else Album.year.desc())
+        sort_key = album_year_sort_key()
     else:
-        query = query.order_by(Album.title.asc() if order == "asc" else Album.title.desc())
+        sort_key = Album.title
     
-    albums = list(query)
+    page = paginate(query, request, sort_key, order, after=after, before=before, limit=limit)
     
     return templates.TemplateResponse("index.html", {
         "request": request,
-        "albums": albums,
+        "albums": page.items,
+        "page": page,
         "search": search,
         "sort": sort,
         "order": order,
@@ -59,7 +74,8 @@ async def home(request: Request, search: str = "", sort: str = "title", order: s
     })
 
 @router.get("/wanted", response_class=HTMLResponse)
-async def wanted(request: Request, search: str = "", sort: str = "title", order: str = "asc", compilation: str = ""):
+def wanted(request: Request, search: str = "", sort: str = "title", order: str = "asc", compilation: str = "",
+           after: str = None, before: str = None, limit: int = DEFAULT_PAGE_SIZE):
     query = Album.select().where(Album.is_wanted == True)
     
     if compilation == "true":
@@ -68,23 +84,21 @@ async def wanted(request: Request, search: str = "", sort: str = "title", order:
         query = query.where(Album.is_compilation == False)
     
     if search:
-        query = query.where(
-            (Album.title.contains(search)) | 
-            (Album.artist.contains(search))
-        )
+        query = query.where(album_search(search))
     
     if sort == "artist":
-        query = query.order_by(Album.artist.asc() if order == "asc" else Album.artist.desc())
+        sort_key = Album.artist
     elif sort == "year":
-        query = query.order_by(Album.year.asc() if order == "asc" else Album.year.desc())
+        sort_key = album_year_sort_key()
     else:
-        query = query.order_by(Album.title.asc() if order == "asc" else Album.title.desc())
+        sort_key = Album.title
     
-    albums = list(query)
+    page = paginate(query, request, sort_key, order, after=after, before=before, limit=limit)
     
     return templates.TemplateResponse("wanted.html", {
         "request": request,
-        "albums": albums,
+        "albums": page.items,
+        "page": page,
         "search": search,
         "sort": sort,
         "order": order,
@@ -92,7 +106,7 @@ async def wanted(request: Request, search: str = "", sort: str = "title", order:
     })
 
 @router.get("/albums/new", response_class=HTMLResponse)
-async def new_album_form(request: Request, _: bool = Depends(require_admin)):
+def new_album_form(request: Request, _: bool = Depends(require_admin)):
     return templates.TemplateResponse("album_form.html", {
         "request": request,
         "album": None,
@@ -115,23 +129,18 @@ async def create_album(
     is_wanted = is_wanted == "true"
     is_compilation = is_compilation == "true"
     
-    artist = apply_artist_mapping(artist)
+    artist = await run_in_threadpool(apply_artist_mapping, artist)
     
     cover_path = None
     if cover and cover.filename:
         if allowed_file(cover.filename):
             content = await cover.read()
-            resized_content, ext = resize_image(content)
-            filename = f"{sanitize_filename(artist)}_{sanitize_filename(title)}.{ext}".replace(" ", "_").replace("/", "_")
-            os.makedirs(COVERS_DIR, exist_ok=True)
-            filepath = os.path.join(COVERS_DIR, filename)
-            with open(filepath, "wb") as f:
-                f.write(resized_content)
-            cover_path = filename
+            basename = f"{sanitize_filename(artist)}_{sanitize_filename(title)}".replace(" ", "_").replace("/", "_")
+            cover_path = await run_in_threadpool(save_resized_image, content, COVERS_DIR, basename)
     
     genre_list = [g.strip() for g in genres.split(",") if g.strip()] if genres else []
     
-    album = Album.create(
+    album = Album(
         title=title,
         artist=artist,
         year=year,
@@ -142,15 +151,13 @@ async def create_album(
         is_compilation=is_compilation,
         notes=notes
     )
+    await run_in_threadpool(save_album, album)
     
     return RedirectResponse(url=f"/albums/{album.id}", status_code=303)
 
 @router.get("/albums/{album_id:int}/edit", response_class=HTMLResponse)
-async def edit_album_form(request: Request, album_id: int, _: bool = Depends(require_admin)):
-    try:
-        album = Album.get_by_id(album_id)
-    except Album.DoesNotExist:
-        raise HTTPException(status_code=404, detail="Album not found")
+def edit_album_form(request: Request, album_id: int, _: bool = Depends(require_admin)):
+    album = get_album_or_404(album_id)
     
     return templates.TemplateResponse("album_form.html", {
         "request": request,
@@ -175,23 +182,16 @@ async def update_album(
     is_wanted = is_wanted == "true"
     is_compilation = is_compilation == "true"
     
-    try:
-        album = Album.get_by_id(album_id)
-    except Album.DoesNotExist:
-        raise HTTPException(status_code=404, detail="Album not found")
+    album = await run_in_threadpool(get_album_or_404, album_id)
+    was_wanted = album.is_wanted
     
-    artist = apply_artist_mapping(artist)
+    artist = await run_in_threadpool(apply_artist_mapping, artist)
     
     if cover and cover.filename:
         if allowed_file(cover.filename):
             content = await cover.read()
-            resized_content, ext = resize_image(content)
-            filename = f"{sanitize_filename(artist)}_{sanitize_filename(title)}_{album_id}.{ext}".replace(" ", "_").replace("/", "_")
-            os.makedirs(COVERS_DIR, exist_ok=True)
-            filepath = os.path.join(COVERS_DIR, filename)
-            with open(filepath, "wb") as f:
-                f.write(resized_content)
-            album.cover_image_path = filename
+            basename = f"{sanitize_filename(artist)}_{sanitize_filename(title)}_{album_id}".replace(" ", "_").replace("/", "_")
+            album.cover_image_path = await run_in_threadpool(save_resized_image, content, COVERS_DIR, basename)
     
     genre_list = [g.strip() for g in genres.split(",") if g.strip()] if genres else []
     
@@ -203,19 +203,19 @@ async def update_album(
     album.is_wanted = is_wanted
     album.is_compilation = is_compilation
     album.notes = notes
-    album.save()
+    await run_in_threadpool(save_album, album, was_wanted)
     
     return RedirectResponse(url=album_url(album), status_code=303)
 
 @router.post("/albums/{album_id:int}/delete")
-async def delete_album(album_id: int, _: bool = Depends(require_admin)):
+def delete_album(album_id: int, _: bool = Depends(require_admin)):
     try:
         album = Album.get_by_id(album_id)
         if album.cover_image_path:
             filepath = os.path.join(COVERS_DIR, album.cover_image_path)
             if os.path.exists(filepath):
                 os.remove(filepath)
-        album.delete_instance()
+        remove_album(album)
     except Album.DoesNotExist:
         raise HTTPException(status_code=404, detail="Album not found")
     
@@ -223,15 +223,14 @@ async def delete_album(album_id: int, _: bool = Depends(require_admin)):
 
 @router.post("/albums/{album_id:int}/scrape")
 async def scrape_single_album(album_id: int, _: bool = Depends(require_admin)):
-    try:
-        album = Album.get_by_id(album_id)
-    except Album.DoesNotExist:
-        raise HTTPException(status_code=404, detail="Album not found")
+    album = await run_in_threadpool(get_album_or_404, album_id)
     
     result = await scrape_album(album)
     
     if result["updated"]:
         message = "Album updated"
+    elif result["failed"]:
+        message = "Last.fm could not be reached"
     else:
         message = "No updates needed"
     
@@ -241,11 +240,8 @@ async def scrape_single_album(album_id: int, _: bool = Depends(require_admin)):
     )
 
 @router.post("/albums/{album_id:int}/accept-discogs-year")
-async def accept_discogs_year(album_id: int, _: bool = Depends(require_admin)):
-    try:
-        album = Album.get_by_id(album_id)
-    except Album.DoesNotExist:
-        raise HTTPException(status_code=404, detail="Album not found")
+def accept_discogs_year(album_id: int, _: bool = Depends(require_admin)):
+    album = get_album_or_404(album_id)
     
     if album.year_discogs_release:
         album.year = album.year_discogs_release
@@ -260,7 +256,7 @@ async def accept_discogs_year(album_id: int, _: bool = Depends(require_admin)):
     )
 
 @router.get("/albums/{album_slug:path}", response_class=HTMLResponse)
-async def get_album(request: Request, album_slug: str, message: str = None):
+def get_album(request: Request, album_slug: str, message: str = None):
     try:
         album_id = int(album_slug.split('-')[0])
         album = Album.get_by_id(album_id)
@@ -1,46 +1,45 @@
-from fastapi import APIRouter, Request, Form, UploadFile, File, Depends, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
-from peewee import fn
-from urllib.parse import quote
-import os
-from app.models import Album, Artist, ArtistMapping
-from app.utils.artists import split_artists
+from fastapi import APIRouter, Request, Form, UploadFile, File, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from peewee import fn, JOIN
+from urllib.parse import quote, urlencode
+from app.models import Album, Artist, ArtistMapping, AlbumArtist, ArtistSummary, album_year_sort_key
+from app.services.album_artists import sync_album_artists
 from app.services.lastfm import scrape_artist, get_or_create_artist
-from app.services.image_utils import resize_image
+from app.services.image_utils import save_resized_image
+from app.services.facets import FACETS, parse_filters, filter_params, filtered_albums, facet_counts
 from app.config import ARTISTS_DIR
 from app.auth import require_admin
 from app.templates_globals import templates
+from app.utils.pagination import paginate, DEFAULT_PAGE_SIZE
+from app.utils.cache import invalidate_album_caches
+from app.utils.artists import artist_mappings
+from app.routes.albums import album_url
 
 router = APIRouter()
 
 @router.get("/artists", response_class=HTMLResponse)
-async def browse_artists(request: Request, sort: str = "name", order: str = "asc"):
-    albums = Album.select().where(Album.is_wanted == False).dicts()
-    
-    artist_counts = {}
-    for album in albums:
-        artists = split_artists(album['artist'])
-        for artist_name in artists:
-            if artist_name in artist_counts:
-                artist_counts[artist_name] += 1
-            else:
-                artist_counts[artist_name] = 1
-    
-    artists_list = []
-    for artist_name, album_count in artist_counts.items():
-        artist = Artist.select().where(Artist.name == artist_name).first()
-        
-        artists_list.append({
-            'name': artist_name,
-            'album_count': album_count,
-            'image_url': artist.image_url if artist else None,
-            'genres': artist.genres if artist else []
-        })
+def browse_artists(request: Request, sort: str = "name", order: str = "asc"):
+    query = (ArtistSummary
+             .select(ArtistSummary.name, ArtistSummary.album_count, Artist.image_url, Artist.genres)
+             .join(Artist, JOIN.LEFT_OUTER, on=(Artist.name == ArtistSummary.name)))
     
+    name_key = fn.LOWER(ArtistSummary.name)
     if sort == "albums":
-        artists_list.sort(key=lambda x: x['album_count'], reverse=(order == "desc"))
+        count_key = ArtistSummary.album_count
+        query = query.order_by(count_key.desc() if order == "desc" else count_key.asc(), name_key)
     else:
-        artists_list.sort(key=lambda x: x['name'].lower(), reverse=(order == "desc"))
+        query = query.order_by(name_key.desc() if order == "desc" else name_key.asc())
+    
+    artists_list = [
+        {
+            'name': row['name'],
+            'album_count': row['album_count'],
+            'image_url': row['image_url'],
+            'genres': row['genres'] or []
+        }
+        for row in query.dicts()
+    ]
     
     return templates.TemplateResponse("artists.html", {
         "request": request,
@@ -50,20 +49,11 @@ async def browse_artists(request: Request, sort: str = "name", order: str = "asc
     })
 
 @router.get("/artist/{artist_name:path}/edit", response_class=HTMLResponse)
-async def edit_artist_form(request: Request, artist_name: str, _: bool = Depends(require_admin)):
+def edit_artist_form(request: Request, artist_name: str, _: bool = Depends(require_admin)):
     count = Album.select().where(Album.artist == artist_name).count()
     artist = Artist.select().where(Artist.name == artist_name).first()
     
-    original_name = artist_name
-    current = artist_name
-    visited = set()
-    while True:
-        mapping = ArtistMapping.select().where(ArtistMapping.new_name == current).first()
-        if not mapping or mapping.original_name in visited:
-            break
-        original_name = mapping.original_name
-        visited.add(mapping.original_name)
-        current = mapping.original_name
+    original_name = artist_mappings.original(artist_name)
     
     return templates.TemplateResponse("edit_artist.html", {
         "request": request,
@@ -73,6 +63,34 @@ async def edit_artist_form(request: Request, artist_name: str, _: bool = Depends
         "original_name": original_name
     })
 
+def rename_artist(artist_name: str, new_name: str, original_name: str, bio: str, genres: list, image_filename: str = None):
+    with artist_mappings.atomic():
+        if new_name != artist_name:
+            source_name = original_name if original_name else artist_name
+            
+            ArtistMapping.update(new_name=new_name).where(ArtistMapping.new_name == artist_name).execute()
+            artist_mappings.invalidate()
+            artist_mappings.add(source_name, new_name)
+        
+        renamed_albums = list(Album.select().where(Album.artist == artist_name))
+        Album.update(artist=new_name).where(Album.artist == artist_name).execute()
+        for album in renamed_albums:
+            album.artist = new_name
+            sync_album_artists(album)
+        
+        artist_record = Artist.select().where(Artist.name == artist_name).first()
+        if not artist_record:
+            Artist.create(name=new_name, image_url=image_filename, bio=bio, genres=genres)
+        else:
+            if image_filename:
+                artist_record.image_url = image_filename
+            artist_record.name = new_name
+            artist_record.bio = bio
+            artist_record.genres = genres
+            artist_record.save()
+    artist_mappings.invalidate()
+    invalidate_album_caches()
+
 @router.post("/artist/{artist_name:path}/edit")
 async def update_artist_name(
     artist_name: str,
@@ -91,58 +109,21 @@ async def update_artist_name(
     
     new_name = new_name.strip()
     
-    if new_name != artist_name:
-        source_name = original_name if original_name else artist_name
-        
-        chained_mappings = ArtistMapping.select().where(ArtistMapping.new_name == artist_name)
-        for mapping in chained_mappings:
-            mapping.new_name = new_name
-            mapping.save()
-        
-        existing_mapping = ArtistMapping.select().where(
-            (ArtistMapping.original_name == source_name) &
-            (ArtistMapping.new_name == new_name)
-        ).first()
-        if not existing_mapping:
-            ArtistMapping.create(original_name=source_name, new_name=new_name)
-    
-    updated = Album.update(artist=new_name).where(Album.artist == artist_name).execute()
-    
-    artist_record = Artist.select().where(Artist.name == artist_name).first()
-    
+    image_filename = None
     if image and image.filename:
         allowed_extensions = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
         ext = image.filename.rsplit('.', 1)[-1].lower() if '.' in image.filename else 'jpg'
         if ext in allowed_extensions:
-            os.makedirs(ARTISTS_DIR, exist_ok=True)
             content = await image.read()
-            resized_content, ext = resize_image(content)
-            filename = f"{new_name.replace(' ', '_').replace('/', '_')}.{ext}"
-            filepath = os.path.join(ARTISTS_DIR, filename)
-            with open(filepath, "wb") as f:
-                f.write(resized_content)
-            
-            if not artist_record:
-                artist_record = Artist.create(
-                    name=new_name,
-                    image_url=filename
-                )
-            else:
-                artist_record.image_url = filename
+            image_filename = await run_in_threadpool(
+                save_resized_image, content, ARTISTS_DIR, new_name.replace(' ', '_').replace('/', '_')
+            )
     
     genre_list = [g.strip() for g in genres.split(",") if g.strip()] if genres else []
-    
-    if not artist_record:
-        artist_record = Artist.create(
-            name=new_name,
-            bio=bio.strip() if bio else None,
-            genres=genre_list
-        )
-    else:
-        artist_record.name = new_name
-        artist_record.bio = bio.strip() if bio else None
-        artist_record.genres = genre_list
-        artist_record.save()
+    await run_in_threadpool(
+        rename_artist, artist_name, new_name, original_name,
+        bio.strip() if bio else None, genre_list, image_filename
+    )
     
     return RedirectResponse(
         url=f"/artist/{quote(new_name)}?message=Artist+updated",
@@ -155,6 +136,8 @@ async def scrape_artist_profile(artist_name: str, _: bool = Depends(require_admi
     
     if result["updated"]:
         message = "Artist profile updated"
+    elif result["failed"]:
+        message = "Last.fm could not be reached"
     else:
         message = "No updates available"
     
@@ -164,32 +147,33 @@ async def scrape_artist_profile(artist_name: str, _: bool = Depends(require_admi
     )
 
 def artist_has_albums(artist_name: str) -> bool:
-    all_albums = Album.select()
-    for album in all_albums:
-        album_artists = [a.strip() for a in album.artist.split(',')]
-        if artist_name in album_artists:
-            return True
-    return False
+    return AlbumArtist.select().where(AlbumArtist.artist_name == artist_name).exists()
+
+def artist_albums(artist_name: str, sort: str, order: str) -> list:
+    query = (Album
+             .select()
+             .join(AlbumArtist)
+             .where(AlbumArtist.artist_name == artist_name))
+    
+    if sort == "title":
+        sort_key = Album.title
+    else:
+        sort_key = fn.COALESCE(Album.year, 0)
+    return list(query.order_by(sort_key.desc() if order == "desc" else sort_key.asc(), Album.id))
 
 
 @router.get("/artist/{artist_name:path}", response_class=HTMLResponse)
 async def browse_artist(request: Request, artist_name: str, sort: str = "year", order: str = "asc", message: str = None):
-    artist = Artist.select().where(Artist.name == artist_name).first()
+    artist = await run_in_threadpool(get_or_create_artist, artist_name)
     
     if not artist:
-        if not artist_has_albums(artist_name):
+        if not await run_in_threadpool(artist_has_albums, artist_name):
             raise HTTPException(status_code=404, detail="Artist not found")
         result = await scrape_artist(artist_name)
         if result["created"]:
-            artist = Artist.select().where(Artist.name == artist_name).first()
-    
-    all_albums = Album.select()
-    albums = [a for a in all_albums if artist_name in [x.strip() for x in a.artist.split(',')]]
+            artist = await run_in_threadpool(get_or_create_artist, artist_name)
     
-    if sort == "title":
-        albums.sort(key=lambda a: (a.title or "") if order == "asc" else "", reverse=order == "desc")
-    else:
-        albums.sort(key=lambda a: (a.year or 0) if order == "asc" else 0, reverse=order == "desc")
+    albums = await run_in_threadpool(artist_albums, artist_name, sort, order)
     
     return templates.TemplateResponse("browse_artist.html", {
         "request": request,
@@ -202,26 +186,26 @@ async def browse_artist(request: Request, artist_name: str, sort: str = "year",
     })
 
 @router.get("/year/{year}", response_class=HTMLResponse)
-async def browse_year(request: Request, year: int, sort: str = "title", order: str = "asc"):
+def browse_year(request: Request, year: int, sort: str = "title", order: str = "asc",
+                after: str = None, before: str = None, limit: int = DEFAULT_PAGE_SIZE):
     query = Album.select().where((Album.year == year) & (Album.is_wanted == False))
     
-    if sort == "artist":
-        query = query.order_by(Album.artist.asc() if order == "asc" else Album.artist.desc())
-    else:
-        query = query.order_by(Album.title.asc() if order == "asc" else Album.title.desc())
+    sort_key = Album.artist if sort == "artist" else Album.title
     
-    albums = list(query)
+    page = paginate(query, request, sort_key, order, after=after, before=before, limit=limit)
     
     return templates.TemplateResponse("browse_year.html", {
         "request": request,
-        "albums": albums,
+        "albums": page.items,
+        "page": page,
         "year": year,
         "sort": sort,
         "order": order
     })
 
 @router.get("/decade/{decade}", response_class=HTMLResponse)
-async def browse_decade(request: Request, decade: str, sort: str = "artist", order: str = "asc"):
+def browse_decade(request: Request, decade: str, sort: str = "artist", order: str = "asc",
+                  after: str = None, before: str = None, limit: int = DEFAULT_PAGE_SIZE):
     try:
         decade_start = int(decade.replace('s', ''))
         decade_end = decade_start + 9
@@ -234,17 +218,18 @@ async def browse_decade(request: Request, decade: str, sort: str = "artist", ord
     )
     
     if sort == "title":
-        query = query.order_by(Album.title.asc() if order == "asc" else Album.title.desc())
+        sort_key = Album.title
     elif sort == "year":
-        query = query.order_by(Album.year.asc() if order == "asc" else Album.year.desc())
+        sort_key = album_year_sort_key()
     else:
-        query = query.order_by(Album.artist.asc() if order == "asc" else Album.artist.desc())
+        sort_key = Album.artist
     
-    albums = list(query)
+    page = paginate(query, request, sort_key, order, after=after, before=before, limit=limit)
     
     return templates.TemplateResponse("browse_decade.html", {
         "request": request,
-        "albums": albums,
+        "albums": page.items,
+        "page": page,
         "decade": decade,
         "decade_start": decade_start,
         "decade_end": decade_end,
@@ -253,43 +238,144 @@ async def browse_decade(request: Request, decade: str, sort: str = "artist", ord
     })
 
 @router.get("/format/{format_name}", response_class=HTMLResponse)
-async def browse_format(request: Request, format_name: str, sort: str = "artist", order: str = "asc"):
+def browse_format(request: Request, format_name: str, sort: str = "artist", order: str = "asc",
+                  after: str = None, before: str = None, limit: int = DEFAULT_PAGE_SIZE):
     query = Album.select().where((Album.physical_format == format_name) & (Album.is_wanted == False))
     
     if sort == "title":
-        query = query.order_by(Album.title.asc() if order == "asc" else Album.title.desc())
+        sort_key = Album.title
     elif sort == "year":
-        query = query.order_by(Album.year.asc() if order == "asc" else Album.year.desc())
+        sort_key = album_year_sort_key()
     else:
-        query = query.order_by(Album.artist.asc() if order == "asc" else Album.artist.desc())
+        sort_key = Album.artist
     
-    albums = list(query)
+    page = paginate(query, request, sort_key, order, after=after, before=before, limit=limit)
     
     return templates.TemplateResponse("browse_format.html", {
         "request": request,
-        "albums": albums,
+        "albums": page.items,
+        "page": page,
         "format_name": format_name,
         "sort": sort,
         "order": order
     })
 
 @router.get("/genre/{tag}", response_class=HTMLResponse)
-async def browse_genre(request: Request, tag: str, sort: str = "artist", order: str = "asc"):
-    all_albums = list(Album.select().where(Album.is_wanted == False))
-    tag_lower = tag.lower()
-    albums = [a for a in all_albums if a.genres and any(tag_lower == g.lower() for g in a.genres)]
+def browse_genre(request: Request, tag: str, sort: str = "artist", order: str = "asc",
+                 after: str = None, before: str = None, limit: int = DEFAULT_PAGE_SIZE):
+    query = Album.select().where(
+        (Album.is_wanted == False) & Album.genres_normalized.contains([tag.lower().strip()])
+    )
     
     if sort == "title":
-        albums.sort(key=lambda a: a.title, reverse=(order == "desc"))
+        sort_key = Album.title
     elif sort == "year":
-        albums.sort(key=lambda a: a.year or 0, reverse=(order == "desc"))
+        sort_key = album_year_sort_key()
     else:
-        albums.sort(key=lambda a: a.artist, reverse=(order == "desc"))
+        sort_key = Album.artist
+    
+    page = paginate(query, request, sort_key, order, after=after, before=before, limit=limit)
     
     return templates.TemplateResponse("browse_genre.html", {
         "request": request,
-        "albums": albums,
+        "albums": page.items,
+        "page": page,
         "tag": tag,
         "sort": sort,
         "order": order
     })
+
+FACET_LABELS = {
+    'decade': 'Decade',
+    'year': 'Year',
+    'format': 'Format',
+    'genre': 'Genre',
+    'compilation': 'Compilation',
+}
+
+def browse_url(path: str, params: dict) -> str:
+    return f"{path}?{urlencode(params)}" if params else path
+
+def facet_groups(filters: dict, counts: dict, sort: str, order: str) -> list:
+    current = filter_params(filters)
+    groups = []
+    for facet in FACETS:
+        values = []
+        for value, count in counts[facet]:
+            if facet == 'compilation':
+                param, label = ('true', 'Compilations') if value else ('false', 'Regular albums')
+            else:
+                param = label = str(value)
+            active = current.get(facet) == param
+            params = {k: v for k, v in current.items() if k != facet}
+            if not active:
+                params[facet] = param
+            params.update(sort=sort, order=order)
+            values.append({
+                'label': label,
+                'count': count,
+                'active': active,
+                'url': browse_url("/browse", params),
+            })
+        groups.append({'name': facet, 'label': FACET_LABELS[facet], 'values': values})
+    return groups
+
+def browse_results(request: Request, filters: dict, sort: str, order: str,
+                   after: str, before: str, limit: int) -> dict:
+    if sort == "title":
+        sort_key = Album.title
+    elif sort == "year":
+        sort_key = album_year_sort_key()
+    else:
+        sort = "artist"
+        sort_key = Album.artist
+    
+    page = paginate(filtered_albums(filters), request, sort_key, order, after=after, before=before, limit=limit)
+    counts = facet_counts(filters)
+    
+    return {
+        "albums": page.items,
+        "page": page,
+        "facets": facet_groups(filters, counts, sort, order),
+        "filters": filter_params(filters),
+        "sort": sort,
+        "order": order
+    }
+
+@router.get("/browse", response_class=HTMLResponse)
+def browse(request: Request, decade: str = None, year: str = None,
+           format_name: str = Query(None, alias="format"), genre: str = None, compilation: str = None,
+           sort: str = "artist", order: str = "asc",
+           after: str = None, before: str = None, limit: int = DEFAULT_PAGE_SIZE):
+    filters = parse_filters(decade, year, format_name, genre, compilation)
+    context = browse_results(request, filters, sort, order, after, before, limit)
+    return templates.TemplateResponse("browse.html", {"request": request, **context})
+
+@router.get("/browse/data")
+def browse_data(request: Request, decade: str = None, year: str = None,
+                format_name: str = Query(None, alias="format"), genre: str = None, compilation: str = None,
+                sort: str = "artist", order: str = "asc",
+                after: str = None, before: str = None, limit: int = DEFAULT_PAGE_SIZE):
+    filters = parse_filters(decade, year, format_name, genre, compilation)
+    context = browse_results(request, filters, sort, order, after, before, limit)
+    page = context["page"]
+    
+    return JSONResponse({
+        "albums": [
+            {
+                "id": album.id,
+                "title": album.title,
+                "artist": album.artist,
+                "year": album.year,
+                "physical_format": album.physical_format,
+                "cover_image_path": album.cover_image_path,
+                "url": album_url(album),
+            }
+            for album in page.items
+        ],
+        "total": page.total,
+        "next_url": page.next_url,
+        "prev_url": page.prev_url,
+        "facets": context["facets"],
+        "filters": context["filters"],
+    })
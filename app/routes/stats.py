@@ -1,55 +1,75 @@
-from collections import Counter
 from fastapi import APIRouter, Request
 from fastapi.responses import HTMLResponse, JSONResponse
-from app.models import Album
+from peewee import fn, SQL
+from app.models import Album, AlbumArtist
+from app.config import STATS_CACHE_TTL
 from app.templates_globals import templates
-from app.utils.artists import split_artists
 from app.services.import_csv import is_compilation_artist
+from app.utils.cache import TTLCache
 
 router = APIRouter()
 
-def get_decade(year):
-    if year is None or year == 0:
-        return "Unknown"
-    return f"{(year // 10) * 10}s"
+stats_cache = TTLCache(STATS_CACHE_TTL)
 
-def get_stats_data():
-    albums = list(Album.select().where(Album.is_wanted == False))
-    
-    decade_counts = Counter(get_decade(a.year) for a in albums)
-    decades = sorted(
-        [(d, c) for d, c in decade_counts.items() if d != "Unknown"],
-        key=lambda x: int(x[0][:-1])
-    )
-    if "Unknown" in decade_counts:
-        decades.append(("Unknown", decade_counts["Unknown"]))
-    
-    format_counts = Counter(a.physical_format or "Unknown" for a in albums)
-    formats = sorted(format_counts.items(), key=lambda x: -x[1])
-    
-    artist_counts = Counter()
-    for album in albums:
-        for artist_name in split_artists(album.artist):
-            if not is_compilation_artist(artist_name):
-                artist_counts[artist_name] += 1
-    top_artists = artist_counts.most_common(20)
-    
-    genre_counts = Counter()
-    for album in albums:
-        if album.genres:
-            for genre in album.genres:
-                normalized = genre.lower().strip()
-                genre_counts[normalized] += 1
-    genres = sorted(genre_counts.items(), key=lambda x: -x[1])
-    
+def decade_counts() -> list:
+    # NULL and 0 years both fall into the trailing "Unknown" bucket
+    decade = (fn.NULLIF(Album.year, 0) / 10) * 10
+    query = (Album
+             .select(decade.alias('decade'), fn.COUNT(Album.id).alias('count'))
+             .where(Album.is_wanted == False)
+             .group_by(SQL('decade'))
+             .order_by(SQL('decade').asc(nulls='LAST')))
+    return [(f"{d}s" if d is not None else "Unknown", c) for d, c in query.tuples()]
+
+def format_counts() -> list:
+    format_name = fn.COALESCE(fn.NULLIF(Album.physical_format, ''), 'Unknown')
+    count = fn.COUNT(Album.id)
+    query = (Album
+             .select(format_name.alias('format'), count)
+             .where(Album.is_wanted == False)
+             .group_by(SQL('format'))
+             .order_by(count.desc(), SQL('format')))
+    return list(query.tuples())
+
+def top_artist_counts(limit: int = 20) -> list:
+    count = fn.COUNT(AlbumArtist.id)
+    query = (AlbumArtist
+             .select(AlbumArtist.artist_name, count)
+             .join(Album)
+             .where(Album.is_wanted == False)
+             .group_by(AlbumArtist.artist_name)
+             .order_by(count.desc(), AlbumArtist.artist_name))
+    top = []
+    # Compilation credits ("Various", "V.A.") are few; skip them while streaming
+    for artist_name, album_count in query.tuples().iterator():
+        if is_compilation_artist(artist_name):
+            continue
+        top.append((artist_name, album_count))
+        if len(top) == limit:
+            break
+    return top
+
+def genre_counts() -> list:
+    count = fn.COUNT(SQL('*'))
+    query = (Album
+             .select(fn.jsonb_array_elements_text(Album.genres_normalized).alias('genre'), count)
+             .where(Album.is_wanted == False)
+             .group_by(SQL('genre'))
+             .order_by(count.desc(), SQL('genre')))
+    return list(query.tuples())
+
+def compute_stats_data():
     return {
-        "decades": decades,
-        "formats": formats,
-        "top_artists": top_artists,
-        "genres": genres,
-        "total": len(albums)
+        "decades": decade_counts(),
+        "formats": format_counts(),
+        "top_artists": top_artist_counts(),
+        "genres": genre_counts(),
+        "total": Album.select().where(Album.is_wanted == False).count()
     }
 
+def get_stats_data():
+    return stats_cache.get("stats", compute_stats_data)
+
 @router.get("/stats", response_class=HTMLResponse)
 async def stats_page(request: Request):
     return templates.TemplateResponse("stats.html", {
@@ -57,5 +77,5 @@ async def stats_page(request: Request):
     })
 
 @router.get("/stats/data")
-async def stats_data():
+def stats_data():
     return JSONResponse(get_stats_data())
@@ -0,0 +1,144 @@
+import sys
+from peewee import fn, JOIN
+from app.models import db, Album, Artist, AlbumArtist, ArtistSummary, ImportFingerprint, artist_missing_genres
+from app.utils.artists import split_artists
+from app.utils.cache import invalidate_album_caches
+
+
+def album_credits(artist_string: str) -> list:
+    names = []
+    for name in split_artists(artist_string):
+        if name not in names:
+            names.append(name)
+    return names
+
+
+def credit_rows(album_id: int, artist_string: str) -> list:
+    return [
+        {'album': album_id, 'artist_name': name, 'position': position}
+        for position, name in enumerate(album_credits(artist_string))
+    ]
+
+
+def album_artist_names(album_id: int) -> set:
+    query = AlbumArtist.select(AlbumArtist.artist_name).where(AlbumArtist.album == album_id)
+    return {name for name, in query.tuples()}
+
+
+def refresh_artist_summaries(names) -> None:
+    names = set(names)
+    if not names:
+        return
+    query = (AlbumArtist
+             .select(AlbumArtist.artist_name, fn.COUNT(AlbumArtist.id))
+             .join(Album)
+             .where((Album.is_wanted == False) & AlbumArtist.artist_name.in_(names))
+             .group_by(AlbumArtist.artist_name))
+    counts = dict(query.tuples())
+    with db.atomic():
+        gone = names - counts.keys()
+        if gone:
+            ArtistSummary.delete().where(ArtistSummary.name.in_(gone)).execute()
+        if counts:
+            (ArtistSummary
+             .insert_many([{'name': name, 'album_count': count} for name, count in counts.items()])
+             .on_conflict(conflict_target=[ArtistSummary.name], preserve=[ArtistSummary.album_count])
+             .execute())
+
+
+def rebuild_artist_summaries() -> None:
+    query = (AlbumArtist
+             .select(AlbumArtist.artist_name, fn.COUNT(AlbumArtist.id))
+             .join(Album)
+             .where(Album.is_wanted == False)
+             .group_by(AlbumArtist.artist_name))
+    with db.atomic():
+        ArtistSummary.delete().execute()
+        ArtistSummary.insert_from(query, [ArtistSummary.name, ArtistSummary.album_count]).execute()
+
+
+def get_artist_stats() -> dict:
+    count = fn.COUNT(ArtistSummary.id)
+    no_profile = Artist.id.is_null()
+    query = (ArtistSummary
+             .select(
+                 count.alias('total'),
+                 count.filter(no_profile | Artist.image_url.is_null() | (Artist.image_url == '')).alias('missing_image'),
+                 count.filter(no_profile | Artist.bio.is_null() | (Artist.bio == '')).alias('missing_bio'),
+                 count.filter(no_profile | artist_missing_genres()).alias('missing_genres'),
+             )
+             .join(Artist, JOIN.LEFT_OUTER, on=(Artist.name == ArtistSummary.name)))
+    return query.dicts().get()
+
+
+def sync_album_artists(album) -> None:
+    with db.atomic():
+        previous = album_artist_names(album.id)
+        AlbumArtist.delete().where(AlbumArtist.album == album.id).execute()
+        rows = credit_rows(album.id, album.artist)
+        if rows:
+            AlbumArtist.insert_many(rows).execute()
+        refresh_artist_summaries(previous | {row['artist_name'] for row in rows})
+    invalidate_album_caches()
+
+
+def add_album_credits(albums) -> None:
+    """Credit freshly inserted albums, given as (album_id, artist) pairs."""
+    rows = []
+    for album_id, artist in albums:
+        rows.extend(credit_rows(album_id, artist))
+    if not rows:
+        return
+    with db.atomic():
+        AlbumArtist.insert_many(rows).execute()
+        refresh_artist_summaries(row['artist_name'] for row in rows)
+
+
+def remove_album(album) -> None:
+    with db.atomic():
+        names = album_artist_names(album.id)
+        album.delete_instance()
+        refresh_artist_summaries(names)
+        forget_fingerprint(album.discogs_id, album.is_wanted)
+
+
+def forget_fingerprint(discogs_id, is_wanted: bool) -> None:
+    """Drop a release's import fingerprint for one list, when the album leaves that list."""
+    if discogs_id:
+        # Let the next import bring the release back, as it would have before fingerprints
+        ImportFingerprint.delete().where(
+            (ImportFingerprint.discogs_id == discogs_id) &
+            (ImportFingerprint.is_wanted == is_wanted)
+        ).execute()
+
+
+def backfill_album_artists(rebuild: bool = False, batch_size: int = 1000) -> int:
+    """Populate album_artists for albums that have no credits yet (or all albums when rebuilding)."""
+    if rebuild:
+        AlbumArtist.delete().execute()
+
+    query = Album.select(Album.id, Album.artist).where(
+        ~fn.EXISTS(AlbumArtist.select().where(AlbumArtist.album == Album.id))
+    ).order_by(Album.id).tuples()
+
+    processed = 0
+    rows = []
+    with db.atomic():
+        for album_id, artist in query.iterator():
+            rows.extend(credit_rows(album_id, artist))
+            processed += 1
+            if len(rows) >= batch_size:
+                AlbumArtist.insert_many(rows).execute()
+                rows = []
+        if rows:
+            AlbumArtist.insert_many(rows).execute()
+        if processed or rebuild:
+            rebuild_artist_summaries()
+
+    invalidate_album_caches()
+    return processed
+
+
+if __name__ == "__main__":
+    count = backfill_album_artists(rebuild="--rebuild" in sys.argv[1:])
+    print(f"Backfilled artist credits for {count} albums")
@@ -0,0 +1,95 @@
+from peewee import fn, SQL, Value
+from app.models import Album
+
+FACETS = ['decade', 'year', 'format', 'genre', 'compilation']
+
+
+def parse_filters(decade: str = None, year: str = None, format: str = None,
+                  genre: str = None, compilation: str = None) -> dict:
+    filters = {}
+    if decade:
+        try:
+            filters['decade'] = int(decade.rstrip('s'))
+        except ValueError:
+            pass
+    if year:
+        try:
+            filters['year'] = int(year)
+        except ValueError:
+            pass
+    if format:
+        filters['format'] = format
+    if genre and genre.strip():
+        filters['genre'] = genre.lower().strip()
+    if compilation in ('true', 'false'):
+        filters['compilation'] = compilation == 'true'
+    return filters
+
+
+def filter_params(filters: dict) -> dict:
+    params = dict(filters)
+    if 'decade' in params:
+        params['decade'] = f"{params['decade']}s"
+    if 'compilation' in params:
+        params['compilation'] = 'true' if params['compilation'] else 'false'
+    return params
+
+
+def facet_condition(facet: str, value):
+    if facet == 'decade':
+        return (Album.year >= value) & (Album.year <= value + 9)
+    if facet == 'year':
+        return Album.year == value
+    if facet == 'format':
+        return Album.physical_format == value
+    if facet == 'genre':
+        return Album.genres_normalized.contains([value])
+    return Album.is_compilation == value
+
+
+def filtered_albums(filters: dict, exclude: str = None):
+    query = Album.select().where(Album.is_wanted == False)
+    for facet, value in filters.items():
+        if facet != exclude:
+            query = query.where(facet_condition(facet, value))
+    return query
+
+
+def facet_value(facet: str):
+    if facet == 'decade':
+        return (fn.NULLIF(Album.year, 0) / 10) * 10
+    if facet == 'year':
+        return fn.NULLIF(Album.year, 0)
+    if facet == 'format':
+        return fn.NULLIF(Album.physical_format, '')
+    if facet == 'genre':
+        return fn.jsonb_array_elements_text(Album.genres_normalized)
+    return Album.is_compilation
+
+
+def facet_counts(filters: dict) -> dict:
+    """Album counts per value of every facet, in one UNION ALL statement.
+
+    Each facet is counted with every other active filter applied but not its
+    own, so a selected facet still lists its alternatives.
+    """
+    query = None
+    for facet in FACETS:
+        value = facet_value(facet).cast('text')
+        part = (filtered_albums(filters, exclude=facet)
+                .select(Value(facet).alias('facet'), value.alias('value'), fn.COUNT(SQL('*')).alias('count'))
+                .group_by(SQL('2')))
+        query = part if query is None else query.union_all(part)
+
+    counts = {facet: [] for facet in FACETS}
+    for facet, value, count in query.tuples():
+        if value is not None:
+            counts[facet].append((value, count))
+
+    for facet in ('decade', 'year'):
+        counts[facet].sort(key=lambda item: int(item[0]))
+    counts['decade'] = [(f"{value}s", count) for value, count in counts['decade']]
+    counts['format'].sort(key=lambda item: (-item[1], item[0]))
+    counts['genre'].sort(key=lambda item: (-item[1], item[0]))
+    counts['compilation'] = [(value == 'true', count) for value, count in sorted(counts['compilation'])]
+    return counts
@@ -0,0 +1,43 @@
+"""The process-wide HTTP client for Last.fm and image downloads.
+
+One pooled httpx.AsyncClient keeps connections alive between requests, so
+scrapes don't pay a new TCP and TLS handshake on every call. It is opened
+in the app lifespan and closed on shutdown; code running outside the app
+gets one on first use. HTTP/2 comes from the httpx[http2] requirement;
+an environment without h2 falls back to HTTP/1.1.
+"""
+import importlib.util
+from typing import Optional
+import httpx
+from app.config import USER_AGENT, HTTP_TIMEOUT, HTTP_MAX_CONNECTIONS
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def create_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=min(HTTP_TIMEOUT, 5.0)),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+            keepalive_expiry=30.0,
+        ),
+        headers={"User-Agent": USER_AGENT},
+    )
+
+
+def http_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_http_client()
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -21,3 +21,13 @@ def resize_image(content: bytes, max_size: int = MAX_IMAGE_SIZE) -> tuple:
     output.seek(0)
     
     return output.getvalue(), 'jpg'
+
+
+def save_resized_image(content: bytes, directory: str, basename: str) -> str:
+    """Resize and write an image to directory. Returns the stored filename."""
+    resized_content, ext = resize_image(content)
+    filename = f"{basename}.{ext}"
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, filename), "wb") as f:
+        f.write(resized_content)
+    return filename
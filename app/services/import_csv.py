@@ -1,12 +1,33 @@
+import codecs
 import csv
+import hashlib
 import io
+import multiprocessing
 import re
-from app.models import Album, ArtistMapping
-from app.utils.artists import split_artists, join_artists, apply_artist_mapping
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+from peewee import fn
+from app.models import db, Album, ImportFingerprint, album_missing_genres, own_connection
+from app.utils.artists import split_artists, join_artists, apply_artist_mapping, artist_mappings
+from app.services.album_artists import add_album_credits, credit_rows, rebuild_artist_summaries
+from app.utils.cache import invalidate_album_caches
 
 
 COMPILATION_ARTISTS = {'various', 'v.a.', 'v a', 'va', 'variousartists', 'unknown'}
 
+SNIFF_BYTES = 64 * 1024
+# Per-row details kept for the import report; totals are always exact
+MAX_REPORTED_ROWS = 500
+IMPORT_BATCH_SIZE = 500
+# Rows buffered per COPY into a staging table
+COPY_BATCH_SIZE = 10000
+# Columns that decide whether a re-imported row changed since the last import
+FINGERPRINT_COLUMNS = ('Artist', 'Title', 'Format', 'Released', 'Notes')
+# Rows sent to a normalization worker at a time
+NORMALIZE_CHUNK_SIZE = 2000
+
 
 def is_compilation_artist(artist: str) -> bool:
     if not artist:
@@ -15,61 +36,114 @@ def is_compilation_artist(artist: str) -> bool:
     return normalized in COMPILATION_ARTISTS
 
 
-def detect_artist_mappings(csv_content: bytes) -> dict:
+def latin1_fallback(error):
+    # Exports are UTF-8 but older ones carry stray Latin-1 bytes further down the file
+    return error.object[error.start:error.end].decode('latin-1'), error.end
+
+
+codecs.register_error('latin1_fallback', latin1_fallback)
+
+
+def open_csv(csv_file) -> csv.DictReader:
+    """DictReader over an uploaded export, decoded incrementally.
+
+    Accepts bytes (or a bytea memoryview) or a binary file object. The encoding is sniffed from the
+    first block: UTF-8 (with or without BOM) unless that block isn't valid
+    UTF-8, in which case the whole file is read as Latin-1.
+    """
+    if isinstance(csv_file, (bytes, bytearray, memoryview)):
+        csv_file = io.BytesIO(csv_file)
+    stream = io.BufferedReader(csv_file) if not hasattr(csv_file, 'peek') else csv_file
+    sample = stream.peek(SNIFF_BYTES)[:SNIFF_BYTES]
+    try:
+        codecs.getincrementaldecoder('utf-8-sig')().decode(sample, final=False)
+        encoding = 'utf-8-sig'
+    except UnicodeDecodeError:
+        encoding = 'latin-1'
+    text = io.TextIOWrapper(stream, encoding=encoding, errors='latin1_fallback', newline='')
+    return csv.DictReader(text)
+
+
+def record(results: dict, key: str, item) -> None:
+    """Count a skipped row and keep its details, up to MAX_REPORTED_ROWS."""
+    results[f'{key}_count'] = results.get(f'{key}_count', 0) + 1
+    if len(results[key]) < MAX_REPORTED_ROWS:
+        results[key].append(item)
+
+
+def with_progress(rows, progress, every: int = IMPORT_BATCH_SIZE):
+    """Yield rows, calling progress(count) after every `every` of them and with the total at the end."""
+    count = 0
+    for row in rows:
+        yield row
+        count += 1
+        if progress and count % every == 0:
+            progress(count)
+    if progress and count % every:
+        progress(count)
+
+
+def outside_transaction(progress):
+    """Wrap a progress callback to run on its own connection.
+
+    For imports that run in one transaction: what the callback writes is
+    visible to other connections straight away rather than on commit.
+    """
+    if progress is None:
+        return None
+    
+    def report(count):
+        with own_connection():
+            progress(count)
+    return report
+
+
+def row_discogs_id(row: dict):
+    for column in ('release_id', 'Release Id', 'Release ID'):
+        # Short rows have None for their missing columns
+        value = (row.get(column) or '').strip()
+        if value:
+            return value
+    return None
+
+
+def detect_row_mappings(row_num: int, artist: str, discogs_id: str, db_artist: str, results: dict) -> None:
+    if not db_artist or db_artist == artist:
+        return
+    
+    for csv_a in split_artists(artist):
+        if csv_a != db_artist:
+            if is_compilation_artist(csv_a) or is_compilation_artist(db_artist):
+                continue
+            
+            record(results, 'details', {
+                'row': row_num,
+                'csv_artist': csv_a,
+                'db_artist': db_artist,
+                'discogs_id': discogs_id
+            })
+            results['mappings_found'] += 1
+            
+            if artist_mappings.add(csv_a, db_artist):
+                results['mappings_created'] += 1
+
+
+def detect_artist_mappings(csv_file) -> dict:
     results = {
         'mappings_found': 0,
         'mappings_created': 0,
         'details': []
     }
     
-    try:
-        content = csv_content.decode('utf-8-sig')
-    except UnicodeDecodeError:
-        try:
-            content = csv_content.decode('latin-1')
-        except UnicodeDecodeError as e:
-            results['errors'] = [f"Encoding error: {str(e)}"]
-            return results
-    
-    reader = csv.DictReader(io.StringIO(content))
-    
-    for row_num, row in enumerate(reader, start=2):
+    for row_num, row in enumerate(open_csv(csv_file), start=2):
         artist = row.get('Artist', '').strip()
-        discogs_id = row.get('release_id', '').strip() or row.get('Release Id', '').strip() or row.get('Release ID', '').strip() or None
+        discogs_id = row_discogs_id(row)
         
         if not artist or not discogs_id:
             continue
         
         existing = Album.select().where(Album.discogs_id == discogs_id).first()
-        
-        if existing and existing.artist != artist:
-            csv_artists = split_artists(artist)
-            
-            for csv_a in csv_artists:
-                db_artist = existing.artist
-                if csv_a != db_artist:
-                    if is_compilation_artist(csv_a) or is_compilation_artist(db_artist):
-                        continue
-                    
-                    results['details'].append({
-                        'row': row_num,
-                        'csv_artist': csv_a,
-                        'db_artist': db_artist,
-                        'discogs_id': discogs_id
-                    })
-                    results['mappings_found'] += 1
-                    
-                    existing_mapping = ArtistMapping.select().where(
-                        (ArtistMapping.original_name == csv_a) &
-                        (ArtistMapping.new_name == db_artist)
-                    ).first()
-                    
-                    if not existing_mapping:
-                        ArtistMapping.create(
-                            original_name=csv_a,
-                            new_name=db_artist
-                        )
-                        results['mappings_created'] += 1
+        detect_row_mappings(row_num, artist, discogs_id, existing.artist if existing else None, results)
     
     return results
 
@@ -96,183 +170,670 @@ def map_format(discogs_format: str) -> str:
     return discogs_format
 
 
-def parse_discogs_csv(csv_content: bytes, is_wanted: bool = False) -> dict:
-    results = {
+class DuplicateIndex:
+    """In-memory lookup of what an import would duplicate.
+
+    Keyed like the old per-row query: a known discogs_id, or the same
+    artist/title/format/released in the same list (collection or wishlist).
+    """
+    
+    def __init__(self):
+        self.discogs_artists = {}
+        self.keys = set()
+    
+    @staticmethod
+    def key(artist, title, physical_format, released, is_wanted) -> tuple:
+        return (artist, title, physical_format, released, is_wanted)
+    
+    def add(self, discogs_id, artist, title, physical_format, released, is_wanted) -> None:
+        if discogs_id:
+            self.discogs_artists.setdefault(discogs_id, artist)
+        self.keys.add(self.key(artist, title, physical_format, released, is_wanted))
+    
+    def contains(self, discogs_id, artist, title, physical_format, released, is_wanted) -> bool:
+        return (bool(discogs_id) and discogs_id in self.discogs_artists) or \
+            self.key(artist, title, physical_format, released, is_wanted) in self.keys
+
+
+def load_duplicate_index() -> DuplicateIndex:
+    index = DuplicateIndex()
+    query = Album.select(
+        Album.discogs_id, Album.artist, Album.title, Album.physical_format, Album.released, Album.is_wanted
+    ).tuples()
+    for row in query.iterator():
+        index.add(*row)
+    return index
+
+
+def write_albums(rows: list) -> list:
+    """Insert a batch of album rows with their artist credits. Returns the new ids."""
+    with db.atomic():
+        ids = [album_id for album_id, in Album.insert_many(rows).returning(Album.id).tuples().execute()]
+        add_album_credits(list(zip(ids, (row['artist'] for row in rows))))
+    return ids
+
+
+def flush_albums(pending: list, results: dict) -> list:
+    """Write buffered rows. Returns the rows that failed."""
+    failed = []
+    if not pending:
+        return failed
+    rows = [row for _, row in pending]
+    try:
+        write_albums(rows)
+        results['imported'] += len(rows)
+    except Exception:
+        # Find the offending rows by writing the batch one row at a time
+        for row_num, row in pending:
+            try:
+                write_albums([row])
+                results['imported'] += 1
+            except Exception as e:
+                record(results, 'errors', f"Row {row_num}: {str(e)}")
+                failed.append(row)
+    pending.clear()
+    return failed
+
+
+def row_fingerprint(row: dict) -> str:
+    values = '\x1f'.join((row.get(column) or '').strip() for column in FINGERPRINT_COLUMNS)
+    return hashlib.sha1(values.encode('utf-8')).hexdigest()
+
+
+def fingerprint_status(previous, fingerprint) -> str:
+    if previous is None or fingerprint is None:
+        return 'new'
+    return 'unchanged' if previous == fingerprint else 'changed'
+
+
+def load_fingerprints(is_wanted: bool) -> dict:
+    query = (ImportFingerprint
+             .select(ImportFingerprint.discogs_id, ImportFingerprint.fingerprint)
+             .where(ImportFingerprint.is_wanted == is_wanted)
+             .tuples())
+    return dict(query.iterator())
+
+
+def save_fingerprints(fingerprints: dict, is_wanted: bool) -> None:
+    now = datetime.now()
+    rows = [
+        {'discogs_id': discogs_id, 'is_wanted': is_wanted, 'fingerprint': fingerprint, 'imported_at': now}
+        for discogs_id, fingerprint in fingerprints.items()
+    ]
+    with db.atomic():
+        for start in range(0, len(rows), IMPORT_BATCH_SIZE):
+            (ImportFingerprint
+             .insert_many(rows[start:start + IMPORT_BATCH_SIZE])
+             .on_conflict(
+                 conflict_target=[ImportFingerprint.discogs_id, ImportFingerprint.is_wanted],
+                 preserve=[ImportFingerprint.fingerprint, ImportFingerprint.imported_at])
+             .execute())
+
+
+def new_import_results() -> dict:
+    return {
         'imported': 0,
         'skipped_duplicates': [],
         'skipped_missing': [],
-        'errors': []
+        'errors': [],
+        'skipped_duplicates_count': 0,
+        'skipped_missing_count': 0,
+        'errors_count': 0,
+        'new': 0,
+        'changed': 0,
+        'unchanged': 0
+    }
+
+
+def new_mapping_results() -> dict:
+    return {
+        'mappings_found': 0,
+        'mappings_created': 0,
+        'details': []
     }
+
+
+def skip_missing(row_num: int, artist: str, title: str, results: dict) -> bool:
+    if artist and title:
+        return False
+    missing = []
+    if not artist:
+        missing.append('Artist')
+    if not title:
+        missing.append('Title')
+    record(results, 'skipped_missing', {
+        'row': row_num,
+        'artist': artist or '(empty)',
+        'title': title or '(empty)',
+        'missing': ', '.join(missing)
+    })
+    return True
+
+
+def normalize_row(row: dict) -> dict:
+    """The fields of a Discogs CSV row that don't depend on the database.
+
+    Pure, so it can run in a worker process; artist mappings are applied
+    afterwards by album_row().
+    """
+    discogs_id = row_discogs_id(row)
+    artist = row.get('Artist', '').strip()
+    released = row.get('Released', '').strip() or None
     
-    detect_artist_mappings(csv_content)
+    year_discogs_release = None
+    if released:
+        try:
+            year_discogs_release = int(released[:4])
+        except ValueError:
+            pass
     
-    try:
-        content = csv_content.decode('utf-8-sig')
-    except UnicodeDecodeError:
+    return {
+        'discogs_id': discogs_id,
+        'artist': artist,
+        'title': row.get('Title', '').strip(),
+        'released': released,
+        'year_discogs_release': year_discogs_release,
+        'physical_format': map_format(row.get('Format', '').strip()),
+        'notes': row.get('Notes', '').strip() or None,
+        'is_compilation': is_compilation_artist(artist)
+    }
+
+
+def row_dict(fieldnames: list, values: list) -> dict:
+    # As csv.DictReader builds it: missing values are None, extra ones are listed under None
+    row = dict(zip(fieldnames, values))
+    if len(values) > len(fieldnames):
+        row[None] = values[len(fieldnames):]
+    else:
+        for key in fieldnames[len(values):]:
+            row[key] = None
+    return row
+
+
+def normalize_chunk(fieldnames: list, chunk: list) -> list:
+    """normalize_row() over (row_num, values) pairs, as (row_num, fields, error) triples."""
+    normalized = []
+    for row_num, values in chunk:
         try:
-            content = csv_content.decode('latin-1')
-        except UnicodeDecodeError as e:
-            results['errors'].append(f"Encoding error: {str(e)}")
-            return results
+            normalized.append((row_num, normalize_row(row_dict(fieldnames, values)), None))
+        except Exception as e:
+            normalized.append((row_num, None, str(e)))
+    return normalized
+
+
+def row_identity(fieldnames: list, values: list, known: dict) -> dict:
+    """A raw row's discogs_id and fingerprint, and whether it is new, changed or unchanged."""
+    row = row_dict(fieldnames, values)
+    discogs_id = row_discogs_id(row)
+    fingerprint = row_fingerprint(row) if discogs_id else None
+    return {
+        'discogs_id': discogs_id,
+        'fingerprint': fingerprint,
+        'status': fingerprint_status(known.get(discogs_id), fingerprint),
+    }
+
+
+def normalized_rows(csv_file, workers: int = 1, chunk_size: int = NORMALIZE_CHUNK_SIZE, known: dict = None):
+    """Yield (row_num, fields, error) for every row of an export, in file order.
+
+    Every row's fields carry its row_identity() against the `known`
+    fingerprints. Those are taken from the raw row, so unchanged rows are
+    yielded with nothing else and never normalized.
+
+    With more than one worker, chunks of rows are normalized in a process
+    pool while the caller writes earlier ones. At most two chunks per worker
+    are in flight, so memory stays bounded however large the file is.
+    """
+    reader = open_csv(csv_file)
+    fieldnames = reader.fieldnames or []
+    known = known or {}
+    # DictReader skips blank lines without numbering them
+    numbered = enumerate((values for values in reader.reader if values), start=2)
+    chunks = iter(lambda: list(islice(numbered, chunk_size)), [])
+    
+    def identify(chunk):
+        identities = [(row_num, row_identity(fieldnames, values, known)) for row_num, values in chunk]
+        changed = [row for row, (_, identity) in zip(chunk, identities) if identity['status'] != 'unchanged']
+        return identities, changed
+    
+    def merged(identities, normalized):
+        normalized = iter(normalized)
+        for row_num, identity in identities:
+            if identity['status'] == 'unchanged':
+                yield row_num, identity, None
+                continue
+            _, fields, error = next(normalized)
+            yield row_num, dict(fields, **identity) if fields else None, error
+    
+    if workers <= 1:
+        for chunk in chunks:
+            identities, changed = identify(chunk)
+            yield from merged(identities, normalize_chunk(fieldnames, changed))
+        return
+    
+    # Imports run on a thread of the web process, where forking is unsafe
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        in_flight = deque()
+        for chunk in chunks:
+            identities, changed = identify(chunk)
+            in_flight.append((identities, pool.submit(normalize_chunk, fieldnames, changed)))
+            if len(in_flight) >= workers * 2:
+                identities, future = in_flight.popleft()
+                yield from merged(identities, future.result())
+        while in_flight:
+            identities, future = in_flight.popleft()
+            yield from merged(identities, future.result())
+
+
+def album_row(fields: dict, is_wanted: bool) -> dict:
+    """Album fields for a normalized CSV row, with artist mappings applied."""
+    artist = apply_artist_mapping(fields['artist'])
+    now = datetime.now()
+    return {
+        'title': fields['title'],
+        'artist': artist,
+        'year': None,
+        'year_discogs_release': fields['year_discogs_release'],
+        'released': fields['released'],
+        'physical_format': fields['physical_format'],
+        'genres': [],
+        'genres_normalized': [],
+        'cover_image_path': None,
+        'discogs_id': fields['discogs_id'],
+        'is_wanted': is_wanted,
+        'is_compilation': fields['is_compilation'] if artist == fields['artist'] else is_compilation_artist(artist),
+        'notes': fields['notes'],
+        'created_at': now,
+        'updated_at': now
+    }
+
+
+def record_duplicate(row_num: int, album: dict, results: dict) -> None:
+    record(results, 'skipped_duplicates', {
+        'row': row_num,
+        'artist': album['artist'],
+        'title': album['title'],
+        'format': album['physical_format'] or 'Unknown'
+    })
+
+
+def parse_discogs_csv(csv_file, is_wanted: bool = False, batch_size: int = IMPORT_BATCH_SIZE, progress=None,
+                      workers: int = 1) -> dict:
+    """Import a Discogs export in a single streaming pass.
+
+    Duplicates are checked against an index loaded once up front and new
+    albums are written in batches of `batch_size`, each in its own
+    transaction. Artist mappings are detected on the same pass: a row whose
+    release is already in the library under another artist name maps that
+    name first, so the row and every later one resolve through it.
+
+    Rows whose release was imported into the same list before with the
+    same FINGERPRINT_COLUMNS are counted as unchanged and skipped before any
+    other work, normalization included; the rest are counted as new or
+    changed. Fingerprints are only saved for rows that were written, so a
+    changed row skipped as a duplicate is reported as changed again next time.
+
+    `progress`, if given, is called with the number of rows read so far
+    every `batch_size` rows. With `workers` > 1 rows are normalized in that
+    many processes (see normalized_rows()).
+    """
+    results = new_import_results()
+    mappings = new_mapping_results()
     
-    reader = csv.DictReader(io.StringIO(content))
+    known = load_fingerprints(is_wanted)
+    index = load_duplicate_index()
+    pending = []
+    seen = {}
     
-    for row_num, row in enumerate(reader, start=2):
+    for row_num, fields, error in with_progress(normalized_rows(csv_file, workers, known=known), progress, batch_size):
+        if error:
+            record(results, 'errors', f"Row {row_num}: {error}")
+            continue
         try:
-            artist = row.get('Artist', '').strip()
-            title = row.get('Title', '').strip()
-            
-            if not artist or not title:
-                missing = []
-                if not artist:
-                    missing.append('Artist')
-                if not title:
-                    missing.append('Title')
-                results['skipped_missing'].append({
-                    'row': row_num,
-                    'artist': artist or '(empty)',
-                    'title': title or '(empty)',
-                    'missing': ', '.join(missing)
-                })
+            discogs_id = fields['discogs_id']
+            results[fields['status']] += 1
+            if fields['status'] == 'unchanged':
                 continue
             
-            artist = apply_artist_mapping(artist)
+            artist = fields['artist']
+            title = fields['title']
             
-            is_compilation = is_compilation_artist(artist)
+            if discogs_id and artist:
+                detect_row_mappings(row_num, artist, discogs_id, index.discogs_artists.get(discogs_id), mappings)
             
-            discogs_id = row.get('release_id', '').strip() or row.get('Release Id', '').strip() or row.get('Release ID', '').strip() or None
-            
-            discogs_format = row.get('Format', '').strip()
-            physical_format = map_format(discogs_format)
+            if skip_missing(row_num, artist, title, results):
+                continue
             
-            released = row.get('Released', '').strip() or None
+            album = album_row(fields, is_wanted)
+            key = (discogs_id, album['artist'], title, album['physical_format'], album['released'], is_wanted)
             
-            existing = Album.select().where(
-                ((Album.discogs_id == discogs_id) & (discogs_id != None)) |
-                ((Album.artist == artist) &
-                 (Album.title == title) &
-                 (Album.physical_format == physical_format) &
-                 (Album.released == released) &
-                 (Album.is_wanted == is_wanted))
-            ).first()
-
-            if existing:
-                results['skipped_duplicates'].append({
-                    'row': row_num,
-                    'artist': artist,
-                    'title': title,
-                    'format': physical_format or 'Unknown'
-                })
+            if index.contains(*key):
+                record_duplicate(row_num, album, results)
                 continue
-
-            notes = row.get('Notes', '').strip() or None
-
-            year_discogs_release = None
-            year_str = row.get('Released', '').strip()
-            if year_str:
-                try:
-                    year_discogs_release = int(year_str[:4])
-                except ValueError:
-                    pass
-
-            Album.create(
-                title=title,
-                artist=artist,
-                year=None,
-                year_discogs_release=year_discogs_release,
-                released=released,
-                physical_format=physical_format,
-                genres=[],
-                cover_image_path=None,
-                discogs_id=discogs_id,
-                is_wanted=is_wanted,
-                is_compilation=is_compilation,
-                notes=notes
-            )
-            results['imported'] += 1
+            
+            pending.append((row_num, album))
+            index.add(*key)
+            if discogs_id:
+                seen[discogs_id] = fields['fingerprint']
             
         except Exception as e:
-            results['errors'].append(f"Row {row_num}: {str(e)}")
+            record(results, 'errors', f"Row {row_num}: {str(e)}")
+            continue
+        
+        if len(pending) >= batch_size:
+            for album in flush_albums(pending, results):
+                seen.pop(album['discogs_id'], None)
+    
+    for album in flush_albums(pending, results):
+        seen.pop(album['discogs_id'], None)
+    save_fingerprints(seen, is_wanted)
+    if results['imported']:
+        invalidate_album_caches()
     
     return results
 
 
 def get_import_stats() -> dict:
-    collection_count = Album.select().where(Album.is_wanted == False).count()
-    wanted_count = Album.select().where(Album.is_wanted == True).count()
-    
-    missing_year = Album.select().where(
-        (Album.year.is_null()) | (Album.year == 0)
-    ).count()
-    
-    missing_cover = Album.select().where(
-        (Album.cover_image_path.is_null()) | (Album.cover_image_path == '')
-    ).count()
+    count = fn.COUNT(Album.id)
+    query = Album.select(
+        count.filter(Album.is_wanted == False).alias('collection_count'),
+        count.filter(Album.is_wanted == True).alias('wanted_count'),
+        count.filter(Album.year.is_null() | (Album.year == 0)).alias('missing_year'),
+        count.filter(Album.cover_image_path.is_null() | (Album.cover_image_path == '')).alias('missing_cover'),
+        count.filter(album_missing_genres()).alias('missing_genres'),
+    )
+    return query.dicts().get()
+
+
+def discogs_year_row(row: dict):
+    """(artist, title, physical_format, year) for a row with a usable release year, else None."""
+    artist = row.get('Artist', '').strip()
+    title = row.get('Title', '').strip()
+    if not artist or not title:
+        return None
     
-    all_albums = list(Album.select())
-    missing_genres = sum(1 for a in all_albums if not a.genres or a.genres == [] or a.genres == '[]')
+    year_str = row.get('Released', '').strip()
+    if not year_str:
+        return None
+    try:
+        year_discogs = int(year_str[:4])
+    except ValueError:
+        return None
     
-    return {
-        'collection_count': collection_count,
-        'wanted_count': wanted_count,
-        'missing_year': missing_year,
-        'missing_cover': missing_cover,
-        'missing_genres': missing_genres
-    }
+    return (artist, title, map_format(row.get('Format', '').strip()), year_discogs)
+
+
+def copy_value(value) -> str:
+    # COPY's csv format reads an unquoted empty field as NULL and a quoted one as ''
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float)):
+        return str(value)
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def copy_rows(cursor, table: str, columns: tuple, rows: list) -> None:
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(','.join(copy_value(value) for value in row) + '\n')
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
 
 
-def update_discogs_years(csv_content: bytes) -> dict:
+def update_discogs_years(csv_file, progress=None) -> dict:
+    """Set year_discogs_release from a Discogs export in one set-based update.
+
+    Rows are COPY'd into a temporary staging table and applied with a
+    single UPDATE ... FROM matching artist, title and format. When the
+    export lists the same album more than once the last row wins, as it did
+    when rows were applied one by one.
+    """
     results = {
         'updated': 0,
         'not_found': 0,
         'errors': []
     }
+    columns = ('row_num', 'artist', 'title', 'physical_format', 'year')
+    progress = outside_transaction(progress)
     
-    try:
-        content = csv_content.decode('utf-8-sig')
-    except UnicodeDecodeError:
-        try:
-            content = csv_content.decode('latin-1')
-        except UnicodeDecodeError as e:
-            results['errors'].append(f"Encoding error: {str(e)}")
-            return results
+    with db.atomic():
+        db.execute_sql("""
+            CREATE TEMPORARY TABLE discogs_years (
+                row_num integer, artist text, title text, physical_format text, year integer
+            ) ON COMMIT DROP
+        """)
+        cursor = db.cursor()
+        
+        rows = []
+        for row_num, row in enumerate(with_progress(open_csv(csv_file), progress), start=2):
+            try:
+                parsed = discogs_year_row(row)
+            except Exception as e:
+                record(results, 'errors', f"Row {row_num}: {str(e)}")
+                continue
+            if parsed:
+                rows.append((row_num,) + parsed)
+            if len(rows) >= COPY_BATCH_SIZE:
+                copy_rows(cursor, 'discogs_years', columns, rows)
+                rows = []
+        if rows:
+            copy_rows(cursor, 'discogs_years', columns, rows)
+        
+        counts = dict(db.execute_sql("""
+            SELECT EXISTS (
+                SELECT 1 FROM albums a
+                WHERE a.artist = s.artist AND a.title = s.title
+                  AND a.physical_format IS NOT DISTINCT FROM s.physical_format
+            ), COUNT(*)
+            FROM discogs_years s
+            GROUP BY 1
+        """).fetchall())
+        results['updated'] = counts.get(True, 0)
+        results['not_found'] = counts.get(False, 0)
+        
+        db.execute_sql("""
+            UPDATE albums a
+            SET year_discogs_release = s.year, updated_at = now()
+            FROM (
+                SELECT DISTINCT ON (artist, title, physical_format) artist, title, physical_format, year
+                FROM discogs_years
+                ORDER BY artist, title, physical_format, row_num DESC
+            ) s
+            WHERE a.artist = s.artist AND a.title = s.title
+              AND a.physical_format IS NOT DISTINCT FROM s.physical_format
+        """)
     
-    reader = csv.DictReader(io.StringIO(content))
+    if results['updated']:
+        invalidate_album_caches()
+    
+    return results
+
+
+STAGING_COLUMNS = (
+    'row_num', 'title', 'artist', 'year_discogs_release', 'released',
+    'physical_format', 'discogs_id', 'is_compilation', 'notes'
+)
+
+
+def load_discogs_artists() -> dict:
+    query = Album.select(Album.discogs_id, Album.artist).where(Album.discogs_id.is_null(False)).tuples()
+    artists = {}
+    for discogs_id, artist in query.iterator():
+        artists.setdefault(discogs_id, artist)
+    return artists
+
+
+def stage_discogs_csv(cursor, csv_file, is_wanted: bool, results: dict, progress=None, workers: int = 1) -> dict:
+    """COPY a Discogs export into album_import. Returns the fingerprints of the staged rows, first occurrence first."""
+    mappings = new_mapping_results()
+    known = load_fingerprints(is_wanted)
+    discogs_artists = load_discogs_artists()
+    rows = []
+    seen = {}
     
-    for row_num, row in enumerate(reader, start=2):
+    for row_num, fields, error in with_progress(normalized_rows(csv_file, workers, known=known), progress):
+        if error:
+            record(results, 'errors', f"Row {row_num}: {error}")
+            continue
         try:
-            artist = row.get('Artist', '').strip()
-            title = row.get('Title', '').strip()
-            
-            if not artist or not title:
+            discogs_id = fields['discogs_id']
+            results[fields['status']] += 1
+            if fields['status'] == 'unchanged':
                 continue
             
-            discogs_format = row.get('Format', '').strip()
-            physical_format = map_format(discogs_format)
+            artist = fields['artist']
+            title = fields['title']
             
-            year_str = row.get('Released', '').strip()
-            if not year_str:
-                continue
+            if discogs_id and artist:
+                detect_row_mappings(row_num, artist, discogs_id, discogs_artists.get(discogs_id), mappings)
             
-            try:
-                year_discogs = int(year_str[:4])
-            except ValueError:
+            if skip_missing(row_num, artist, title, results):
                 continue
             
-            album = Album.select().where(
-                (Album.artist == artist) & 
-                (Album.title == title) &
-                (Album.physical_format == physical_format)
-            ).first()
-            
-            if album:
-                album.year_discogs_release = year_discogs
-                album.save()
-                results['updated'] += 1
-            else:
-                results['not_found'] += 1
-            
+            album = album_row(fields, is_wanted)
+            if discogs_id:
+                discogs_artists.setdefault(discogs_id, album['artist'])
+                seen.setdefault(discogs_id, fields['fingerprint'])
+            rows.append((row_num,) + tuple(album[column] for column in STAGING_COLUMNS[1:]))
         except Exception as e:
-            results['errors'].append(f"Row {row_num}: {str(e)}")
+            record(results, 'errors', f"Row {row_num}: {str(e)}")
+            continue
+        
+        if len(rows) >= COPY_BATCH_SIZE:
+            copy_rows(cursor, 'album_import', STAGING_COLUMNS, rows)
+            rows = []
+    
+    if rows:
+        copy_rows(cursor, 'album_import', STAGING_COLUMNS, rows)
+    
+    return seen
+
+
+def copy_discogs_csv(csv_file, is_wanted: bool = False, progress=None, workers: int = 1) -> dict:
+    """Import a Discogs export through COPY, for very large files.
+
+    Rows get the same mapping, format and compilation rules as
+    parse_discogs_csv() and are COPY'd into a temporary staging table.
+    Duplicates (a known discogs_id, or the same artist, title, format and
+    release date in the same list) are then marked in SQL, the rest inserted
+    with one INSERT ... SELECT and credited with another COPY, all in one
+    transaction. Within the file the first occurrence of an album wins.
+    Rows are normalized in `workers` processes when it is above one.
+    Returns the same results as parse_discogs_csv().
+    """
+    results = new_import_results()
+    progress = outside_transaction(progress)
+    
+    with artist_mappings.atomic():
+        db.execute_sql("""
+            CREATE TEMPORARY TABLE album_import (
+                row_num integer PRIMARY KEY,
+                title text, artist text, year_discogs_release integer, released text,
+                physical_format text, discogs_id text, is_compilation boolean, notes text,
+                duplicate boolean NOT NULL DEFAULT false
+            ) ON COMMIT DROP
+        """)
+        cursor = db.cursor()
+        fingerprints = stage_discogs_csv(cursor, csv_file, is_wanted, results, progress, workers)
+        
+        db.execute_sql("CREATE INDEX ON album_import (discogs_id)")
+        db.execute_sql("CREATE INDEX ON album_import (artist, title)")
+        db.execute_sql("ANALYZE album_import")
+        
+        # Already in the library
+        db.execute_sql("""
+            UPDATE album_import s SET duplicate = true
+            WHERE (s.discogs_id IS NOT NULL AND EXISTS (
+                      SELECT 1 FROM albums a WHERE a.discogs_id = s.discogs_id))
+               OR EXISTS (
+                      SELECT 1 FROM albums a
+                      WHERE a.artist = s.artist AND a.title = s.title
+                        AND a.physical_format IS NOT DISTINCT FROM s.physical_format
+                        AND a.released IS NOT DISTINCT FROM s.released
+                        AND a.is_wanted = %s)
+        """, (is_wanted,))
+        # Repeated within the file
+        db.execute_sql("""
+            UPDATE album_import s SET duplicate = true
+            WHERE NOT s.duplicate AND EXISTS (
+                SELECT 1 FROM album_import e
+                WHERE e.row_num < s.row_num AND NOT e.duplicate
+                  AND ((s.discogs_id IS NOT NULL AND e.discogs_id = s.discogs_id)
+                       OR (e.artist = s.artist AND e.title = s.title
+                           AND e.physical_format IS NOT DISTINCT FROM s.physical_format
+                           AND e.released IS NOT DISTINCT FROM s.released)))
+        """)
+        
+        results['skipped_duplicates_count'] = db.execute_sql(
+            "SELECT COUNT(*) FROM album_import WHERE duplicate"
+        ).fetchone()[0]
+        duplicates = db.execute_sql(
+            "SELECT row_num, artist, title, physical_format FROM album_import WHERE duplicate ORDER BY row_num LIMIT %s",
+            (MAX_REPORTED_ROWS,)
+        )
+        results['skipped_duplicates'] = [
+            {'row': row_num, 'artist': artist, 'title': title, 'format': physical_format or 'Unknown'}
+            for row_num, artist, title, physical_format in duplicates
+        ]
+        
+        inserted = db.execute_sql("""
+            INSERT INTO albums (
+                title, artist, year, year_discogs_release, released, physical_format,
+                genres, genres_normalized, cover_image_path, discogs_id, is_wanted,
+                is_compilation, notes, created_at, updated_at
+            )
+            SELECT title, artist, NULL, year_discogs_release, released, physical_format,
+                   '[]'::jsonb, '[]'::jsonb, NULL, discogs_id, %s,
+                   is_compilation, notes, LOCALTIMESTAMP, LOCALTIMESTAMP
+            FROM album_import
+            WHERE NOT duplicate
+            ORDER BY row_num
+            RETURNING id, artist
+        """, (is_wanted,)).fetchall()
+        results['imported'] = len(inserted)
+        
+        credits = []
+        for album_id, artist in inserted:
+            credits.extend(
+                (row['album'], row['artist_name'], row['position']) for row in credit_rows(album_id, artist)
+            )
+            if len(credits) >= COPY_BATCH_SIZE:
+                copy_rows(cursor, 'album_artists', ('album_id', 'artist_name', 'position'), credits)
+                credits = []
+        if credits:
+            copy_rows(cursor, 'album_artists', ('album_id', 'artist_name', 'position'), credits)
+        
+        if inserted:
+            rebuild_artist_summaries()
+        # Only rows that were written; a duplicate's changes were not applied
+        written = {discogs_id for discogs_id, in db.execute_sql(
+            "SELECT DISTINCT discogs_id FROM album_import WHERE NOT duplicate AND discogs_id IS NOT NULL"
+        )}
+        save_fingerprints({key: value for key, value in fingerprints.items() if key in written}, is_wanted)
+    
+    if results['imported']:
+        invalidate_album_caches()
     
     return results
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Import a Discogs CSV export through COPY")
+    parser.add_argument("csv_path")
+    parser.add_argument("--wanted", action="store_true", help="import into the wishlist")
+    parser.add_argument("--workers", type=int, default=1, help="processes that normalize rows")
+    args = parser.parse_args()
+    
+    db.connect()
+    with open(args.csv_path, 'rb') as csv_file:
+        results = copy_discogs_csv(csv_file, is_wanted=args.wanted, workers=args.workers)
+    db.close()
+    print(
+        f"{results['new']} new, {results['changed']} changed and {results['unchanged']} unchanged rows. "
+        f"Imported {results['imported']} albums, skipped {results['skipped_duplicates_count']} duplicates "
+        f"and {results['skipped_missing_count']} rows with missing data, {results['errors_count']} errors"
+    )
@@ -0,0 +1,274 @@
+"""Discogs CSV imports run as background jobs.
+
+Uploads are queued in import_jobs and picked up by import_worker(), which
+every uvicorn worker process runs. Jobs are claimed with FOR UPDATE SKIP
+LOCKED, so each runs on exactly one worker, and report progress as they go
+so any worker can answer the progress endpoint. A job whose worker died is
+rerun once it stops reporting progress for IMPORT_JOB_STALE_TIMEOUT seconds;
+duplicate detection skips the rows it had already imported. A side thread
+keeps the heartbeat fresh while the job runs, so long SQL steps that report
+no progress don't make it look stale.
+
+Every claim gives the job a new claim_token. Progress, the final status and
+deleting the upload only happen while the worker's token still matches; a
+worker that finds its job claimed by another one stops where it is.
+
+Uploaded files are stored in CHUNK_SIZE pieces as they are read and
+streamed back the same way, so neither the request nor the worker holds a
+whole file in memory. Progress is reported as rows and bytes read.
+"""
+import io
+import uuid
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta
+from fastapi.concurrency import run_in_threadpool
+from app.models import db, ImportJob, ImportJobChunk, new_db_state, close_db
+from app.config import IMPORT_POLL_INTERVAL, IMPORT_JOB_STALE_TIMEOUT, COPY_IMPORT_THRESHOLD, IMPORT_WORKERS
+from app.services.import_csv import parse_discogs_csv, copy_discogs_csv, update_discogs_years
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def import_albums(upload, is_wanted: bool, rows_estimate: int, progress) -> dict:
+    if rows_estimate >= COPY_IMPORT_THRESHOLD:
+        return copy_discogs_csv(upload, is_wanted=is_wanted, progress=progress, workers=IMPORT_WORKERS)
+    return parse_discogs_csv(upload, is_wanted=is_wanted, progress=progress)
+
+
+IMPORT_KINDS = {
+    'collection': lambda upload, rows_estimate, progress: import_albums(upload, False, rows_estimate, progress),
+    'wishlist': lambda upload, rows_estimate, progress: import_albums(upload, True, rows_estimate, progress),
+    'discogs-years': lambda upload, rows_estimate, progress: update_discogs_years(upload, progress=progress),
+}
+
+
+class JobReclaimed(Exception):
+    """Another worker has claimed the import job this worker was running."""
+
+
+class UploadReader(io.RawIOBase):
+    """A job's uploaded file of `size` bytes, read back one stored chunk at a time."""
+    
+    def __init__(self, job_id: int, size: int):
+        self.job_id = job_id
+        self.size = size
+        self.seq = 0
+        self.chunk = memoryview(b'')
+        self.position = 0
+    
+    def readable(self) -> bool:
+        return True
+    
+    def readinto(self, buffer) -> int:
+        while not self.chunk:
+            data = (ImportJobChunk
+                    .select(ImportJobChunk.data)
+                    .where((ImportJobChunk.job == self.job_id) & (ImportJobChunk.seq == self.seq))
+                    .scalar())
+            if data is None:
+                if self.position < self.size:
+                    # Only a worker that claimed the job since deletes its upload early
+                    raise JobReclaimed(f"Upload of import job {self.job_id} was deleted while being read")
+                return 0
+            self.chunk = memoryview(bytes(data))
+            self.seq += 1
+        size = min(len(buffer), len(self.chunk))
+        buffer[:size] = self.chunk[:size]
+        self.chunk = self.chunk[size:]
+        self.position += size
+        return size
+
+
+def submit_import(kind: str, filename: str, file) -> ImportJob:
+    """Queue an import of a binary file object, stored chunk by chunk as it is read."""
+    if kind not in IMPORT_KINDS:
+        raise ValueError(f"Unknown import kind: {kind}")
+    with db.atomic():
+        job = ImportJob.create(kind=kind, filename=filename)
+        for seq, data in enumerate(iter(lambda: file.read(CHUNK_SIZE), b'')):
+            ImportJobChunk.create(job=job.id, seq=seq, data=data)
+            job.bytes_total += len(data)
+        job.save(only=[ImportJob.bytes_total])
+    return job
+
+
+def get_import_job(job_id: int):
+    return ImportJob.select().where(ImportJob.id == job_id).first()
+
+
+def recent_import_jobs(limit: int = 5) -> list:
+    return list(ImportJob.select().order_by(ImportJob.id.desc()).limit(limit))
+
+
+def claim_next_job():
+    stale = datetime.now() - timedelta(seconds=IMPORT_JOB_STALE_TIMEOUT)
+    with db.atomic():
+        job = (ImportJob
+               .select()
+               .where((ImportJob.status == PENDING) |
+                      ((ImportJob.status == RUNNING) & (ImportJob.heartbeat_at < stale)))
+               .order_by(ImportJob.id)
+               .limit(1)
+               .for_update('FOR UPDATE SKIP LOCKED')
+               .first())
+        if job is None:
+            return None
+        now = datetime.now()
+        job.status = RUNNING
+        job.started_at = now
+        job.heartbeat_at = now
+        job.rows_processed = 0
+        job.bytes_processed = 0
+        job.claim_token = uuid.uuid4().hex
+        job.save(only=[ImportJob.status, ImportJob.started_at, ImportJob.heartbeat_at,
+                       ImportJob.rows_processed, ImportJob.bytes_processed, ImportJob.claim_token])
+    return job
+
+
+def owned_by(job: ImportJob):
+    """Matches the job's row while this worker's claim on it stands."""
+    return (ImportJob.id == job.id) & (ImportJob.claim_token == job.claim_token)
+
+
+def estimate_rows(job: ImportJob) -> int:
+    """Rows in the upload, extrapolated from the lines in its first chunk."""
+    sample = ImportJobChunk.select(ImportJobChunk.data).where(
+        (ImportJobChunk.job == job.id) & (ImportJobChunk.seq == 0)
+    ).scalar()
+    if not sample:
+        return 0
+    lines = bytes(sample).count(b'\n')
+    return max(round(lines * job.bytes_total / len(sample)) - 1, 0)
+
+
+def report_progress(job: ImportJob, rows_processed: int, bytes_processed: int) -> None:
+    updated = (ImportJob
+               .update(rows_processed=rows_processed, bytes_processed=bytes_processed, heartbeat_at=datetime.now())
+               .where(owned_by(job))
+               .execute())
+    if not updated:
+        raise JobReclaimed(f"Import job {job.id} was claimed by another worker")
+
+
+def keep_alive(job: ImportJob, stop: threading.Event) -> None:
+    """Refresh the job's heartbeat on a connection of its own until `stop` is set."""
+    new_db_state()
+    try:
+        while not stop.wait(IMPORT_JOB_STALE_TIMEOUT / 3):
+            try:
+                beat = ImportJob.update(heartbeat_at=datetime.now()).where(owned_by(job)).execute()
+            except Exception:
+                logger.exception(f"Import job {job.id} heartbeat failed")
+                continue
+            finally:
+                close_db(None)
+            if not beat:
+                return
+    finally:
+        close_db(None)
+
+
+def delete_upload(job_id: int) -> None:
+    ImportJobChunk.delete().where(ImportJobChunk.job == job_id).execute()
+
+
+def finish_job(job: ImportJob, **fields) -> None:
+    """Record how the job ended and drop its upload, unless another worker has claimed it since."""
+    with db.atomic():
+        finished = ImportJob.update(finished_at=datetime.now(), **fields).where(
+            owned_by(job) & (ImportJob.status == RUNNING)
+        ).execute()
+        if finished:
+            delete_upload(job.id)
+    if not finished:
+        logger.info(f"Import job {job.id} was claimed by another worker, discarding its outcome")
+
+
+def run_job(job: ImportJob) -> None:
+    upload = UploadReader(job.id, job.bytes_total)
+    rows_read = 0
+    
+    def progress(count):
+        nonlocal rows_read
+        rows_read = count
+        report_progress(job, count, upload.position)
+    
+    stop = threading.Event()
+    threading.Thread(target=keep_alive, args=(job, stop), daemon=True).start()
+    try:
+        results = IMPORT_KINDS[job.kind](upload, estimate_rows(job), progress)
+    except JobReclaimed:
+        logger.info(f"Import job {job.id} was claimed by another worker, stopping")
+        return
+    except Exception as e:
+        logger.exception(f"Import job {job.id} failed")
+        finish_job(job, status=FAILED, error=str(e))
+        return
+    finally:
+        stop.set()
+
+    finish_job(job, status=DONE, results=results, rows_processed=rows_read, rows_total=rows_read,
+               bytes_processed=job.bytes_total)
+
+
+def run_next_job() -> bool:
+    """Claim and run one queued import. Returns False when there was none."""
+    job = claim_next_job()
+    if job is None:
+        return False
+    run_job(job)
+    return True
+
+
+def job_progress(job: ImportJob) -> dict:
+    rows_per_second = None
+    eta_seconds = None
+    percent = round(100 * job.bytes_processed / job.bytes_total) if job.bytes_total else None
+    if job.started_at and job.heartbeat_at and job.rows_processed:
+        elapsed = ((job.finished_at or job.heartbeat_at) - job.started_at).total_seconds()
+        if elapsed > 0:
+            rows_per_second = round(job.rows_processed / elapsed, 1)
+            if job.status == RUNNING and job.bytes_processed:
+                bytes_per_second = job.bytes_processed / elapsed
+                eta_seconds = round(max(job.bytes_total - job.bytes_processed, 0) / bytes_per_second)
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'filename': job.filename,
+        'status': job.status,
+        'rows_processed': job.rows_processed,
+        'rows_total': job.rows_total,
+        'bytes_processed': job.bytes_processed,
+        'bytes_total': job.bytes_total,
+        'percent': percent,
+        'rows_per_second': rows_per_second,
+        'eta_seconds': eta_seconds,
+        'results': job.results,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+async def import_worker(poll_interval: float = IMPORT_POLL_INTERVAL):
+    # Runs for the life of the process with its own connection, separate from requests
+    new_db_state()
+    while True:
+        try:
+            ran = await run_in_threadpool(run_next_job)
+        except Exception:
+            logger.exception("Import worker failed to claim a job")
+            ran = False
+        finally:
+            close_db(None)
+        if not ran:
+            await asyncio.sleep(poll_interval)
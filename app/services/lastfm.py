@@ -1,26 +1,115 @@
-import os
 import html
 import httpx
 import logging
 import re
 import asyncio
-import time
+from datetime import timedelta
 from urllib.parse import quote
 from typing import Optional, List
-from app.config import LASTFM_API_KEY, USER_AGENT, COVERS_DIR, ARTISTS_DIR
-from app.services.image_utils import resize_image
-from app.models import Artist
+from app.config import LASTFM_API_KEY, USER_AGENT, COVERS_DIR, ARTISTS_DIR, LASTFM_RATE_LIMIT, LASTFM_BURST, SCRAPE_CONCURRENCY, LASTFM_CACHE_MAX_MB
+from fastapi.concurrency import run_in_threadpool
+from app.services.image_utils import save_resized_image
+from app.models import Artist, new_db_state, close_db
 from app.utils.artists import split_artists, apply_artist_mapping, sanitize_filename
+from app.utils.rate_limit import TokenBucket
+from app.services.http_client import http_client
+from app.services import response_cache
 
 logger = logging.getLogger(__name__)
 LASTFM_API_BASE = "https://ws.audioscrobbler.com/2.0/"
 
-_last_request_time = 0.0
+# Shared by every Last.fm API and page request in this process
+lastfm_limiter = TokenBucket(LASTFM_RATE_LIMIT, LASTFM_BURST)
+
+# How long a cached response is served before Last.fm is asked again, by API method
+CACHE_TTLS = {
+    "artist.getinfo": timedelta(days=7),
+    "artist.gettoptags": timedelta(days=7),
+    "album.getinfo": timedelta(days=30),
+}
+# last.fm artist and album pages
+PAGE_CACHE_TTL = timedelta(days=7)
+
+
+class LastfmUnavailable(Exception):
+    """Last.fm could not answer: a network error, rate limiting, a server error or a rejected API key.
+
+    Unlike an empty answer this says nothing about whether Last.fm knows the
+    album or artist, so scrapes report it as "failed" rather than a miss.
+    """
+
+
+def unavailable_status(status_code: int) -> bool:
+    return status_code in (401, 403, 429) or status_code >= 500
+
+
+def raise_if_unavailable(error: Exception) -> None:
+    """Re-raise an error caught while fetching if it means the service could not answer."""
+    if isinstance(error, LastfmUnavailable):
+        raise error
+    if isinstance(error, httpx.TransportError) or (
+            isinstance(error, httpx.HTTPStatusError) and unavailable_status(error.response.status_code)):
+        raise LastfmUnavailable(str(error)) from error
+
+
+def safe_url(url: str) -> str:
+    return re.sub(r'api_key=[^&]*', 'api_key=***', url)
+
+
+def cache_ttl(method: str, url: str, params: dict = None) -> Optional[timedelta]:
+    if method.upper() != "GET" or not LASTFM_CACHE_MAX_MB:
+        return None
+    if params and "method" in params:
+        return CACHE_TTLS.get(params["method"])
+    if httpx.URL(url).host == "www.last.fm":
+        return PAGE_CACHE_TTL
+    return None
+
+
+def cacheable(response: httpx.Response) -> bool:
+    """A 200 that isn't a Last.fm API error, which comes back as 200 with a JSON {"error": N} body."""
+    if response.status_code != 200:
+        return False
+    if "json" not in response.headers.get("content-type", ""):
+        return True
+    try:
+        body = response.json()
+    except ValueError:
+        return False
+    return not (isinstance(body, dict) and "error" in body)
 
 
 async def rate_limited_request(client: httpx.AsyncClient, method: str, url: str, **kwargs) -> httpx.Response:
-    global _last_request_time
- 
+    """A Last.fm request, answered from response_cache when possible.
+
+    Fresh cache hits cost no rate limit budget; stale entries are
+    revalidated and kept if Last.fm answers 304 Not Modified.
+    """
+    ttl = cache_ttl(method, url, kwargs.get("params"))
+    if not ttl:
+        return await send_request(client, method, url, **kwargs)
+
+    cached_url = response_cache.normalized_url(url, kwargs.get("params"))
+    key = response_cache.cache_key(method, cached_url)
+    entry = await run_in_threadpool(response_cache.load_entry, key)
+    if entry and response_cache.is_fresh(entry):
+        logger.debug(f"Last.fm cache hit: {cached_url}")
+        return response_cache.entry_response(entry, method)
+
+    if entry:
+        kwargs["headers"] = {**kwargs.get("headers", {}), **response_cache.revalidation_headers(entry)}
+    response = await send_request(client, method, url, **kwargs)
+
+    if entry and response.status_code == 304:
+        logger.debug(f"Last.fm cache revalidated: {cached_url}")
+        await run_in_threadpool(response_cache.refresh_entry, entry, ttl)
+        return response_cache.entry_response(entry, method)
+    if cacheable(response):
+        await run_in_threadpool(response_cache.store_response, key, cached_url, response, ttl)
+    return response
+
+
+async def send_request(client: httpx.AsyncClient, method: str, url: str, **kwargs) -> httpx.Response:
     headers = kwargs.pop("headers", {})
     headers["User-Agent"] = USER_AGENT
 
@@ -34,11 +123,7 @@ async def rate_limited_request(client: httpx.AsyncClient, method: str, url: str,
     retry_delay = 2
 
     for attempt in range(max_retries):
-        elapsed = time.time() - _last_request_time
-        if elapsed < 1.0:
-            wait_time = 1.0 - elapsed
-            logger.debug(f"Rate limiting: waiting {wait_time:.2f}s")
-            await asyncio.sleep(wait_time)
+        await lastfm_limiter.acquire()
 
         logger.debug(f"Last.fm request: {method} {full_url}")
 
@@ -47,93 +132,82 @@ async def rate_limited_request(client: httpx.AsyncClient, method: str, url: str,
                 response = await client.get(url, headers=headers, params=params, **kwargs)
             else:
                 response = await client.post(url, headers=headers, params=params, **kwargs)
-
-            _last_request_time = time.time()
-
-            if response.status_code >= 500:
-                logger.warning(f"Last.fm server error {response.status_code}, attempt {attempt + 1}/{max_retries}")
-                await asyncio.sleep(retry_delay * (attempt + 1))
-                continue
-
-            if response.status_code >= 400:
-                safe_url = re.sub(r'api_key=[^&]*', 'api_key=***', full_url)
-                logger.error(f"Last.fm error: {response.status_code} {response.reason_phrase} for {safe_url}")
-                raise Exception(f"Last.fm error: {response.status_code} {response.reason_phrase}")
-
-            logger.debug(f"Last.fm response: {response.status_code} - Success")
-            return response
-        except httpx.HTTPStatusError as e:
-            _last_request_time = time.time()
-            if attempt < max_retries - 1:
-                logger.warning(f"Last.fm HTTP error, retrying: {e.response.status_code} {e.response.reason_phrase}")
-                await asyncio.sleep(retry_delay * (attempt + 1))
-                continue
-            safe_url = re.sub(r'api_key=[^&]*', 'api_key=***', str(e.request.url))
-            logger.error(f"Last.fm error: {e.response.status_code} {e.response.reason_phrase} for {safe_url}")
-            raise
-        except Exception as e:
-            _last_request_time = time.time()
+        except httpx.TransportError as e:
             if attempt < max_retries - 1:
                 logger.warning(f"Last.fm request failed, retrying: {e}")
                 await asyncio.sleep(retry_delay * (attempt + 1))
                 continue
-            safe_url = re.sub(r'api_key=[^&]*', 'api_key=***', full_url)
-            logger.error(f"Last.fm request failed: {e} for {safe_url}")
-            raise
+            logger.error(f"Last.fm request failed: {e} for {safe_url(full_url)}")
+            raise LastfmUnavailable(f"Last.fm request failed: {e}") from e
 
-    raise Exception(f"Last.fm request failed after {max_retries} retries: {full_url}")
+        if response.status_code == 429 or response.status_code >= 500:
+            logger.warning(f"Last.fm server error {response.status_code}, attempt {attempt + 1}/{max_retries}")
+            await asyncio.sleep(retry_delay * (attempt + 1))
+            continue
 
+        if response.status_code >= 400:
+            logger.error(f"Last.fm error: {response.status_code} {response.reason_phrase} for {safe_url(full_url)}")
+            if unavailable_status(response.status_code):
+                raise LastfmUnavailable(f"Last.fm error: {response.status_code} {response.reason_phrase}")
+            raise Exception(f"Last.fm error: {response.status_code} {response.reason_phrase}")
 
-async def get_artist_image_and_genres_from_html(artist_name: str) -> tuple:
+        logger.debug(f"Last.fm response: {response.status_code} - Success")
+        return response
+
+    raise LastfmUnavailable(f"Last.fm request failed after {max_retries} retries: {safe_url(full_url)}")
+
+
+async def get_artist_image_and_genres_from_html(artist_name: str, client: httpx.AsyncClient = None) -> tuple:
     """Scrape artist image and genres from Last.fm HTML page"""
     try:
         encoded_name = quote(artist_name, safe='').replace("%20", "+")
         url = f"https://www.last.fm/music/{encoded_name}"
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            logger.debug(f"Last.fm scraping artist HTML: {artist_name}")
-            response = await rate_limited_request(client, "GET", url, follow_redirects=True)
-
-            image_url = None
-            match = re.search(r'header-new-background-image[^>]*style="background-image:\s*url\(([^)]+)\)', response.text)
+        client = client or http_client()
+        logger.debug(f"Last.fm scraping artist HTML: {artist_name}")
+        response = await rate_limited_request(client, "GET", url, follow_redirects=True)
+
+        image_url = None
+        match = re.search(r'header-new-background-image[^>]*style="background-image:\s*url\(([^)]+)\)', response.text)
+        if match:
+            image_url = match.group(1).strip('"\'')
+            logger.debug(f"Last.fm artist image found for {artist_name}: {image_url}")
+
+        if not image_url:
+            match = re.search(r'header-new-background-image[^>]*content="([^"]+)"', response.text)
             if match:
-                image_url = match.group(1).strip('"\'')
-                logger.debug(f"Last.fm artist image found for {artist_name}: {image_url}")
-
-            if not image_url:
-                match = re.search(r'header-new-background-image[^>]*content="([^"]+)"', response.text)
-                if match:
-                    image_url = match.group(1)
-                    logger.debug(f"Last.fm artist image found for {artist_name} (content attr): {image_url}")
-
-            if not image_url:
-                logger.debug(f"Last.fm no artist image found for {artist_name}")
-
-            genres = []
-            tag_matches = re.findall(r'data-tag-name="([^"]+)"', response.text)
-            logger.debug(f"Last.fm tag matches (data-tag) for {artist_name}: {tag_matches}")
-            if not tag_matches:
-                tag_matches = re.findall(r'<a[^>]*href="/tag/([^"]+)"', response.text)
-                logger.debug(f"Last.fm tag matches (/tag/) for {artist_name}: {tag_matches}")
-            genres = [g.strip() for g in tag_matches if g.strip() and g.strip().lower() not in ['add tags', 'view all tags']][:5]
-
-            bio = None
-            bio_match = re.search(r'<div class="wiki-block-inner[^>]*>(.*?)</div>', response.text, re.DOTALL)
-            if bio_match:
-                bio = re.sub(r'<[^>]+>', '', bio_match.group(1)).strip()
-                bio = re.sub(r'\s+', ' ', bio)
-
-            if genres:
-                logger.debug(f"Last.fm genres from HTML for {artist_name}: {genres}")
-            if bio:
-                logger.debug(f"Last.fm bio from HTML for {artist_name}: {bio[:100]}...")
-
-            return image_url, genres, bio
+                image_url = match.group(1)
+                logger.debug(f"Last.fm artist image found for {artist_name} (content attr): {image_url}")
+
+        if not image_url:
+            logger.debug(f"Last.fm no artist image found for {artist_name}")
+
+        genres = []
+        tag_matches = re.findall(r'data-tag-name="([^"]+)"', response.text)
+        logger.debug(f"Last.fm tag matches (data-tag) for {artist_name}: {tag_matches}")
+        if not tag_matches:
+            tag_matches = re.findall(r'<a[^>]*href="/tag/([^"]+)"', response.text)
+            logger.debug(f"Last.fm tag matches (/tag/) for {artist_name}: {tag_matches}")
+        genres = [g.strip() for g in tag_matches if g.strip() and g.strip().lower() not in ['add tags', 'view all tags']][:5]
+
+        bio = None
+        bio_match = re.search(r'<div class="wiki-block-inner[^>]*>(.*?)</div>', response.text, re.DOTALL)
+        if bio_match:
+            bio = re.sub(r'<[^>]+>', '', bio_match.group(1)).strip()
+            bio = re.sub(r'\s+', ' ', bio)
+
+        if genres:
+            logger.debug(f"Last.fm genres from HTML for {artist_name}: {genres}")
+        if bio:
+            logger.debug(f"Last.fm bio from HTML for {artist_name}: {bio[:100]}...")
+
+        return image_url, genres, bio
     except Exception as e:
+        raise_if_unavailable(e)
         logger.error(f"Last.fm error scraping artist HTML for {artist_name}: {e}")
         return None, []
 
 
-async def get_artist_info(artist_name: str) -> dict:
+async def get_artist_info(artist_name: str, client: httpx.AsyncClient = None) -> dict:
     if not LASTFM_API_KEY:
         logger.warning("LASTFM_API_KEY not configured")
         return {}
@@ -146,56 +220,57 @@ async def get_artist_info(artist_name: str) -> dict:
     }
 
     try:
-        async with httpx.AsyncClient() as client:
-            logger.debug(f"Last.fm API call: artist.getinfo for {artist_name}")
-            response = await rate_limited_request(client, "GET", LASTFM_API_BASE, params=params)
-            data = response.json()
-
-            if "artist" not in data:
-                logger.warning(f"Last.fm no artist data for: {artist_name}")
-                return {}
-
-            result = {}
-            artist_data = data["artist"]
-
-            image_url, html_genres, html_bio = await get_artist_image_and_genres_from_html(artist_name)
-            if image_url:
-                result["image_url"] = image_url
-
-            if "bio" in artist_data and "summary" in artist_data["bio"]:
-                bio = artist_data["bio"]["summary"]
-                bio = html.unescape(bio)
-                if "<a" in bio:
-                    bio = bio.split("<a")[0].strip()
-                if bio:
-                    result["bio"] = bio
-
-            if not result.get("bio") and html_bio:
-                result["bio"] = html_bio
-
-            if "tags" in artist_data and "tag" in artist_data["tags"]:
-                tags = artist_data["tags"]["tag"]
-                logger.debug(f"Last.fm raw tags for {artist_name}: {tags}")
-                if not isinstance(tags, list):
-                    tags = [tags] if tags else []
-                result["genres"] = [tag["name"] for tag in tags[:5] if isinstance(tag, dict) and "name" in tag]
-                logger.debug(f"Last.fm parsed genres for {artist_name}: {result.get('genres')}")
-
-            if not result.get("genres") and html_genres:
-                result["genres"] = html_genres
-                logger.debug(f"Last.fm genres from HTML for {artist_name}: {html_genres}")
-
-            if "url" in artist_data:
-                result["lastfm_url"] = artist_data["url"]
-
-            logger.debug(f"Last.fm artist info retrieved for {artist_name}")
-            return result
+        client = client or http_client()
+        logger.debug(f"Last.fm API call: artist.getinfo for {artist_name}")
+        response = await rate_limited_request(client, "GET", LASTFM_API_BASE, params=params)
+        data = response.json()
+
+        if "artist" not in data:
+            logger.warning(f"Last.fm no artist data for: {artist_name}")
+            return {}
+
+        result = {}
+        artist_data = data["artist"]
+
+        image_url, html_genres, html_bio = await get_artist_image_and_genres_from_html(artist_name, client)
+        if image_url:
+            result["image_url"] = image_url
+
+        if "bio" in artist_data and "summary" in artist_data["bio"]:
+            bio = artist_data["bio"]["summary"]
+            bio = html.unescape(bio)
+            if "<a" in bio:
+                bio = bio.split("<a")[0].strip()
+            if bio:
+                result["bio"] = bio
+
+        if not result.get("bio") and html_bio:
+            result["bio"] = html_bio
+
+        if "tags" in artist_data and "tag" in artist_data["tags"]:
+            tags = artist_data["tags"]["tag"]
+            logger.debug(f"Last.fm raw tags for {artist_name}: {tags}")
+            if not isinstance(tags, list):
+                tags = [tags] if tags else []
+            result["genres"] = [tag["name"] for tag in tags[:5] if isinstance(tag, dict) and "name" in tag]
+            logger.debug(f"Last.fm parsed genres for {artist_name}: {result.get('genres')}")
+
+        if not result.get("genres") and html_genres:
+            result["genres"] = html_genres
+            logger.debug(f"Last.fm genres from HTML for {artist_name}: {html_genres}")
+
+        if "url" in artist_data:
+            result["lastfm_url"] = artist_data["url"]
+
+        logger.debug(f"Last.fm artist info retrieved for {artist_name}")
+        return result
     except Exception as e:
+        raise_if_unavailable(e)
         logger.error(f"Last.fm error fetching artist info for {artist_name}: {e}")
         return {}
 
 
-async def get_artist_top_tags(artist: str) -> List[str]:
+async def get_artist_top_tags(artist: str, client: httpx.AsyncClient = None) -> List[str]:
     if not LASTFM_API_KEY:
         return []
 
@@ -207,69 +282,71 @@ async def get_artist_top_tags(artist: str) -> List[str]:
     }
 
     try:
-        async with httpx.AsyncClient() as client:
-            logger.debug(f"Last.fm API call: artist.gettoptags for {artist}")
-            response = await rate_limited_request(client, "GET", LASTFM_API_BASE, params=params)
-            data = response.json()
-
-            if "toptags" not in data or "tag" not in data["toptags"]:
-                logger.debug(f"Last.fm no top tags for {artist}")
-                return []
-
-            tags = data["toptags"]["tag"]
-            logger.debug(f"Last.fm raw toptags for {artist}: {tags}")
-            if not isinstance(tags, list):
-                tags = [tags] if tags else []
-
-            result_tags = [tag["name"] for tag in tags[:5] if isinstance(tag, dict) and "name" in tag]
-            logger.debug(f"Last.fm parsed toptags for {artist}: {result_tags}")
-            return result_tags
+        client = client or http_client()
+        logger.debug(f"Last.fm API call: artist.gettoptags for {artist}")
+        response = await rate_limited_request(client, "GET", LASTFM_API_BASE, params=params)
+        data = response.json()
+
+        if "toptags" not in data or "tag" not in data["toptags"]:
+            logger.debug(f"Last.fm no top tags for {artist}")
+            return []
+
+        tags = data["toptags"]["tag"]
+        logger.debug(f"Last.fm raw toptags for {artist}: {tags}")
+        if not isinstance(tags, list):
+            tags = [tags] if tags else []
+
+        result_tags = [tag["name"] for tag in tags[:5] if isinstance(tag, dict) and "name" in tag]
+        logger.debug(f"Last.fm parsed toptags for {artist}: {result_tags}")
+        return result_tags
     except Exception as e:
+        raise_if_unavailable(e)
         logger.error(f"Last.fm error getting top tags for {artist}: {e}")
         return []
 
 
-async def get_album_info_from_html(artist: str, album: str) -> dict:
+async def get_album_info_from_html(artist: str, album: str, client: httpx.AsyncClient = None) -> dict:
     """Scrape album cover and year from Last.fm HTML page"""
     try:
         encoded_artist = quote(artist, safe='').replace("%20", "+")
         encoded_album = quote(album, safe='').replace("%20", "+")
         url = f"https://www.last.fm/music/{encoded_artist}/{encoded_album}"
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            logger.debug(f"Last.fm scraping album HTML: {artist} - {album}")
-            response = await rate_limited_request(client, "GET", url, follow_redirects=True)
-
-            year = None
-            year_patterns = [
-                r'<dt class="catalogue-metadata-heading">Release Date</dt>\s*<dd class="catalogue-metadata-description">[^<]*(\d{4})</dd>',
-                r'<dd class="catalogue-metadata-description">(\d+)\s+\w+\s+(\d{4})</dd>',
-                r'<dd class="catalogue-metadata-description">(\d{4})</dd>',
-                r'"datePublished"\s*:\s*"(\d{4})',
-                r'<time[^>]*datetime="(\d{4})',
-            ]
-            for pattern in year_patterns:
-                match = re.search(pattern, response.text)
-                if match:
-                    year = int(match.group(1))
-                    logger.debug(f"Last.fm release year found for {artist} - {album}: {year}")
-                    break
+        client = client or http_client()
+        logger.debug(f"Last.fm scraping album HTML: {artist} - {album}")
+        response = await rate_limited_request(client, "GET", url, follow_redirects=True)
+
+        year = None
+        year_patterns = [
+            r'<dt class="catalogue-metadata-heading">Release Date</dt>\s*<dd class="catalogue-metadata-description">[^<]*(\d{4})</dd>',
+            r'<dd class="catalogue-metadata-description">(\d+)\s+\w+\s+(\d{4})</dd>',
+            r'<dd class="catalogue-metadata-description">(\d{4})</dd>',
+            r'"datePublished"\s*:\s*"(\d{4})',
+            r'<time[^>]*datetime="(\d{4})',
+        ]
+        for pattern in year_patterns:
+            match = re.search(pattern, response.text)
+            if match:
+                year = int(match.group(1))
+                logger.debug(f"Last.fm release year found for {artist} - {album}: {year}")
+                break
 
-            if not year:
-                logger.debug(f"Last.fm no release date found for {artist} - {album}")
+        if not year:
+            logger.debug(f"Last.fm no release date found for {artist} - {album}")
 
-            cover_url = None
-            cover_match = re.search(r'<meta property="og:image" content="([^"]+)"', response.text)
-            if cover_match:
-                cover_url = cover_match.group(1)
-                logger.debug(f"Last.fm album cover found for {artist} - {album}: {cover_url}")
+        cover_url = None
+        cover_match = re.search(r'<meta property="og:image" content="([^"]+)"', response.text)
+        if cover_match:
+            cover_url = cover_match.group(1)
+            logger.debug(f"Last.fm album cover found for {artist} - {album}: {cover_url}")
 
-            return {"year": year, "cover_url": cover_url}
+        return {"year": year, "cover_url": cover_url}
     except Exception as e:
+        raise_if_unavailable(e)
         logger.error(f"Last.fm error scraping album HTML for {artist} - {album}: {e}")
         return {}
 
 
-async def get_album_info(artist: str, album: str) -> dict:
+async def get_album_info(artist: str, album: str, client: httpx.AsyncClient = None) -> dict:
     if not LASTFM_API_KEY:
         return {}
 
@@ -285,26 +362,27 @@ async def get_album_info(artist: str, album: str) -> dict:
     api_success = False
 
     try:
-        async with httpx.AsyncClient() as client:
-            logger.debug(f"Last.fm API call: album.getinfo for {artist} - {album}")
-            response = await rate_limited_request(client, "GET", LASTFM_API_BASE, params=params)
-            data = response.json()
-
-            if "album" in data:
-                api_success = True
-                album_data = data["album"]
-
-                if "image" in album_data:
-                    images = album_data["image"]
-                    for img in images:
-                        if img.get("size") == "extralarge" and img.get("#text"):
-                            result["cover_url"] = img["#text"]
-                            break
+        client = client or http_client()
+        logger.debug(f"Last.fm API call: album.getinfo for {artist} - {album}")
+        response = await rate_limited_request(client, "GET", LASTFM_API_BASE, params=params)
+        data = response.json()
+
+        if "album" in data:
+            api_success = True
+            album_data = data["album"]
+
+            if "image" in album_data:
+                images = album_data["image"]
+                for img in images:
+                    if img.get("size") == "extralarge" and img.get("#text"):
+                        result["cover_url"] = img["#text"]
+                        break
     except Exception as e:
+        raise_if_unavailable(e)
         logger.debug(f"Last.fm API failed for {artist} - {album}, trying HTML: {e}")
 
     if not result.get("cover_url") or not result.get("year"):
-        html_info = await get_album_info_from_html(artist, album)
+        html_info = await get_album_info_from_html(artist, album, client)
 
         if not result.get("cover_url") and html_info.get("cover_url"):
             result["cover_url"] = html_info["cover_url"]
@@ -318,37 +396,37 @@ async def get_album_info(artist: str, album: str) -> dict:
     return result
 
 
-async def download_cover(cover_url: str, filename: str) -> Optional[str]:
+async def download_cover(cover_url: str, filename: str, client: httpx.AsyncClient = None) -> Optional[str]:
     if not cover_url:
         return None
 
     try:
-        async with httpx.AsyncClient() as client:
-            logger.debug(f"Downloading cover from: {cover_url}")
-            response = await client.get(cover_url)
-            response.raise_for_status()
-
-            content = response.content
-            resized_content, ext = resize_image(content)
-
-            filename = filename.rsplit('.', 1)[0] + f'.{ext}'
+        client = client or http_client()
+        logger.debug(f"Downloading cover from: {cover_url}")
+        response = await client.get(cover_url)
+        response.raise_for_status()
 
-            os.makedirs(COVERS_DIR, exist_ok=True)
-            filepath = os.path.join(COVERS_DIR, filename)
-
-            with open(filepath, "wb") as f:
-                f.write(resized_content)
+        filename = await run_in_threadpool(
+            save_resized_image, response.content, COVERS_DIR, filename.rsplit('.', 1)[0]
+        )
 
-            logger.debug(f"Cover downloaded successfully: {filename}")
-            return filename
+        logger.debug(f"Cover downloaded successfully: {filename}")
+        return filename
     except Exception as e:
+        raise_if_unavailable(e)
         logger.error(f"Error downloading cover from {cover_url}: {e}")
         return None
 
 
-async def scrape_album(album) -> dict:
+async def scrape_album(album, client: httpx.AsyncClient = None) -> dict:
+    """Fill in an album's missing cover, year and genres from Last.fm.
+
+    "failed" is set when Last.fm could not be asked, as opposed to having
+    nothing for the album; whatever was found before that is still saved.
+    """
     result = {
         "updated": False,
+        "failed": False,
         "cover_updated": False,
         "year_updated": False,
         "genres_updated": False
@@ -362,80 +440,84 @@ async def scrape_album(album) -> dict:
         return result
     
     artist_list = split_artists(album.artist)
-    artist_list = [apply_artist_mapping(a) for a in artist_list]
+    artist_list = await run_in_threadpool(lambda: [apply_artist_mapping(a) for a in artist_list])
     artist_variants = artist_list.copy()
     for artist in artist_list:
         artist_variants.append(artist)
 
-    if needs_cover or needs_year:
-        album_info = {}
-        for artist_name in artist_variants:
-            album_info = await get_album_info(artist_name, album.title)
-            if album_info.get('cover_url') or album_info.get('year'):
-                break
-
-        if needs_cover and album_info.get("cover_url"):
-            ext = album_info["cover_url"].split(".")[-1] or "jpg"
-            if ext not in ["jpg", "jpeg", "png", "gif", "webp"]:
-                ext = "jpg"
-            filename = f"{sanitize_filename(album.artist)}_{sanitize_filename(album.title)}_{album.id}.{ext}".replace(" ", "_").replace("/", "_")
-            cover_path = await download_cover(album_info["cover_url"], filename)
-            if cover_path:
-                album.cover_image_path = cover_path
-                result["cover_updated"] = True
-                result["updated"] = True
+    try:
+        if needs_cover or needs_year:
+            album_info = {}
+            for artist_name in artist_variants:
+                album_info = await get_album_info(artist_name, album.title, client)
+                if album_info.get('cover_url') or album_info.get('year'):
+                    break
 
-        if needs_year and album_info.get("year"):
-            album.year = album_info["year"]
-            result["year_updated"] = True
-            result["updated"] = True
-    
-    if needs_genres:
-        for artist_name in artist_variants:
-            tags = await get_artist_top_tags(artist_name)
-            if tags:
-                album.genres = tags
-                result["genres_updated"] = True
+            if needs_cover and album_info.get("cover_url"):
+                ext = album_info["cover_url"].split(".")[-1] or "jpg"
+                if ext not in ["jpg", "jpeg", "png", "gif", "webp"]:
+                    ext = "jpg"
+                filename = f"{sanitize_filename(album.artist)}_{sanitize_filename(album.title)}_{album.id}.{ext}".replace(" ", "_").replace("/", "_")
+                cover_path = await download_cover(album_info["cover_url"], filename, client)
+                if cover_path:
+                    album.cover_image_path = cover_path
+                    result["cover_updated"] = True
+                    result["updated"] = True
+
+            if needs_year and album_info.get("year"):
+                album.year = album_info["year"]
+                result["year_updated"] = True
                 result["updated"] = True
-                break
+        
+        if needs_genres:
+            for artist_name in artist_variants:
+                tags = await get_artist_top_tags(artist_name, client)
+                if tags:
+                    album.genres = tags
+                    result["genres_updated"] = True
+                    result["updated"] = True
+                    break
+    except LastfmUnavailable as e:
+        logger.warning(f"Last.fm scrape of {album.artist} - {album.title} failed: {e}")
+        result["failed"] = True
 
     if result["updated"]:
-        album.save()
+        await run_in_threadpool(album.save)
 
     return result
 
 
-async def download_artist_image(image_url: str, artist_name: str) -> Optional[str]:
+async def download_artist_image(image_url: str, artist_name: str, client: httpx.AsyncClient = None) -> Optional[str]:
     if not image_url:
         return None
 
     try:
-        async with httpx.AsyncClient() as client:
-            logger.debug(f"Downloading artist image from: {image_url}")
-            response = await client.get(image_url)
-            response.raise_for_status()
-
-            content = response.content
-            resized_content, ext = resize_image(content)
-
-            filename = f"{artist_name.replace(' ', '_').replace('/', '_')}.{ext}"
-
-            os.makedirs(ARTISTS_DIR, exist_ok=True)
-            filepath = os.path.join(ARTISTS_DIR, filename)
+        client = client or http_client()
+        logger.debug(f"Downloading artist image from: {image_url}")
+        response = await client.get(image_url)
+        response.raise_for_status()
 
-            with open(filepath, "wb") as f:
-                f.write(resized_content)
+        filename = await run_in_threadpool(
+            save_resized_image, response.content, ARTISTS_DIR, artist_name.replace(' ', '_').replace('/', '_')
+        )
 
-            logger.debug(f"Artist image downloaded successfully: {filename}")
-            return filename
+        logger.debug(f"Artist image downloaded successfully: {filename}")
+        return filename
     except Exception as e:
+        raise_if_unavailable(e)
         logger.error(f"Error downloading artist image for {artist_name}: {e}")
         return None
 
 
-async def scrape_artist(artist_name: str) -> dict:
+async def scrape_artist(artist_name: str, client: httpx.AsyncClient = None) -> dict:
+    """Create or update an artist profile from Last.fm.
+
+    "failed" is set when Last.fm could not be asked (including when no
+    LASTFM_API_KEY is configured), as opposed to having nothing for the artist.
+    """
     result = {
         "updated": False,
+        "failed": False,
         "created": False,
         "image_updated": False,
         "bio_updated": False,
@@ -443,21 +525,32 @@ async def scrape_artist(artist_name: str) -> dict:
     }
 
     if not LASTFM_API_KEY:
+        result["failed"] = True
         return result
 
-    artist_info = await get_artist_info(artist_name)
+    try:
+        artist_info = await get_artist_info(artist_name, client)
+    except LastfmUnavailable as e:
+        logger.warning(f"Last.fm scrape of {artist_name} failed: {e}")
+        result["failed"] = True
+        return result
 
     if not artist_info:
         return result
 
-    artist = Artist.select().where(Artist.name == artist_name).first()
+    artist = await run_in_threadpool(get_or_create_artist, artist_name)
 
     image_filename = None
     if artist_info.get("image_url") and not (artist and artist.image_url):
-        image_filename = await download_artist_image(artist_info["image_url"], artist_name)
+        try:
+            image_filename = await download_artist_image(artist_info["image_url"], artist_name, client)
+        except LastfmUnavailable as e:
+            logger.warning(f"Artist image download for {artist_name} failed: {e}")
+            result["failed"] = True
 
     if not artist:
-        artist = Artist.create(
+        await run_in_threadpool(
+            Artist.create,
             name=artist_name,
             image_url=image_filename,
             bio=artist_info.get("bio"),
@@ -496,11 +589,35 @@ async def scrape_artist(artist_name: str) -> dict:
         artist.lastfm_url = artist_info["lastfm_url"]
 
     if result["updated"]:
-        artist.save()
+        await run_in_threadpool(artist.save)
 
     return result
 
 
+async def scrape_many(items: list, scrape, concurrency: int = SCRAPE_CONCURRENCY) -> list:
+    """Run scrape(item) for every item, `concurrency` at a time. Returns the results in order.
+
+    Overlaps the network round trips and image resizing of different items;
+    lastfm_limiter still paces the requests themselves. An item whose scrape
+    raises is logged and gets None.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(item):
+        async with semaphore:
+            # Each task needs its own connection, like a request would
+            new_db_state()
+            try:
+                return await scrape(item)
+            except Exception as e:
+                logger.error(f"Scrape failed for {item}: {e}")
+                return None
+            finally:
+                close_db(None)
+
+    return await asyncio.gather(*(run(item) for item in items))
+
+
 def get_or_create_artist(artist_name: str):
     artist = Artist.select().where(Artist.name == artist_name).first()
     return artist
@@ -0,0 +1,104 @@
+"""Persistent cache for Last.fm API and page responses.
+
+Entries live in the response_cache table, so every worker process and
+every restart shares them. Requests are keyed without their api_key. A
+fresh entry is served without touching the network; a stale one is
+revalidated with If-None-Match / If-Modified-Since and refreshed on a 304.
+Once the compressed bodies pass LASTFM_CACHE_MAX_MB the least recently
+used entries are evicted.
+"""
+import hashlib
+import zlib
+from datetime import datetime, timedelta
+from typing import Optional
+import httpx
+from app.models import db, ResponseCache
+from app.config import LASTFM_CACHE_MAX_MB
+
+# Query parameters left out of cache keys
+SECRET_PARAMS = {'api_key'}
+# Response headers kept with an entry; the body is stored already decoded
+KEPT_HEADERS = ('content-type', 'etag', 'last-modified')
+# Stores between size checks, per process
+PRUNE_EVERY = 100
+
+_stores = 0
+
+
+def normalized_url(url: str, params=None) -> str:
+    url = httpx.URL(url, params=params) if params else httpx.URL(url)
+    kept = sorted((k, v) for k, v in url.params.multi_items() if k not in SECRET_PARAMS)
+    return str(url.copy_with(query=None).copy_merge_params(kept))
+
+
+def cache_key(method: str, url: str) -> str:
+    return hashlib.sha1(f"{method.upper()} {url}".encode('utf-8')).hexdigest()
+
+
+def load_entry(key: str) -> Optional[ResponseCache]:
+    entry = ResponseCache.select().where(ResponseCache.key == key).first()
+    if entry:
+        ResponseCache.update(used_at=datetime.now()).where(ResponseCache.id == entry.id).execute()
+    return entry
+
+
+def is_fresh(entry: ResponseCache) -> bool:
+    return entry.expires_at > datetime.now()
+
+
+def revalidation_headers(entry: ResponseCache) -> dict:
+    headers = {}
+    if entry.headers.get('etag'):
+        headers['If-None-Match'] = entry.headers['etag']
+    if entry.headers.get('last-modified'):
+        headers['If-Modified-Since'] = entry.headers['last-modified']
+    return headers
+
+
+def entry_response(entry: ResponseCache, method: str = "GET") -> httpx.Response:
+    return httpx.Response(
+        entry.status_code,
+        headers=entry.headers,
+        content=zlib.decompress(bytes(entry.body)),
+        request=httpx.Request(method, entry.url),
+    )
+
+
+def refresh_entry(entry: ResponseCache, ttl: timedelta) -> None:
+    now = datetime.now()
+    (ResponseCache
+     .update(fetched_at=now, expires_at=now + ttl, used_at=now)
+     .where(ResponseCache.id == entry.id)
+     .execute())
+
+
+def store_response(key: str, url: str, response: httpx.Response, ttl: timedelta) -> None:
+    global _stores
+    body = zlib.compress(response.content)
+    now = datetime.now()
+    (ResponseCache
+     .insert(
+         key=key, url=url, status_code=response.status_code,
+         headers={name: response.headers[name] for name in KEPT_HEADERS if name in response.headers},
+         body=body, size=len(body), fetched_at=now, expires_at=now + ttl, used_at=now)
+     .on_conflict(
+         conflict_target=[ResponseCache.key],
+         preserve=[ResponseCache.status_code, ResponseCache.headers, ResponseCache.body, ResponseCache.size,
+                   ResponseCache.fetched_at, ResponseCache.expires_at, ResponseCache.used_at])
+     .execute())
+    _stores += 1
+    if _stores % PRUNE_EVERY == 0:
+        prune_cache()
+
+
+def prune_cache(max_bytes: int = LASTFM_CACHE_MAX_MB * 1024 * 1024) -> int:
+    """Evict least recently used entries until the cache fits in max_bytes. Returns how many went."""
+    return db.execute_sql("""
+        DELETE FROM response_cache WHERE id IN (
+            SELECT id FROM (
+                SELECT id, SUM(size) OVER (ORDER BY used_at DESC, id DESC) AS running
+                FROM response_cache
+            ) ranked
+            WHERE running > %s
+        )
+    """, (max_bytes,)).rowcount
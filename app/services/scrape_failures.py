@@ -0,0 +1,91 @@
+"""Backoff for items bulk scrapes keep finding nothing for.
+
+When a bulk scrape finds nothing for an album or artist, a
+scrape_failures row keeps it out of bulk scrapes for SCRAPE_BACKOFF_HOURS,
+twice that after the next miss and so on, up to SCRAPE_BACKOFF_MAX_DAYS.
+A scrape that does update the item clears its row, and the admin page can
+clear them all. Scrapes that could not reach Last.fm, or ran without a
+LASTFM_API_KEY, are not counted either way.
+"""
+from datetime import datetime, timedelta
+from peewee import fn
+from app.models import db, ScrapeFailure
+from app.config import SCRAPE_BACKOFF_HOURS, SCRAPE_BACKOFF_MAX_DAYS, LASTFM_API_KEY
+
+ALBUM = 'album'
+ARTIST = 'artist'
+
+BATCH_SIZE = 1000
+
+
+def backoff(attempts: int) -> timedelta:
+    hours = SCRAPE_BACKOFF_HOURS * 2 ** min(attempts - 1, 30)
+    return timedelta(hours=min(hours, SCRAPE_BACKOFF_MAX_DAYS * 24))
+
+
+def cooling_down(kind: str) -> set:
+    """Keys of the items of `kind` bulk scrapes should skip for now."""
+    query = (ScrapeFailure
+             .select(ScrapeFailure.key)
+             .where((ScrapeFailure.kind == kind) & (ScrapeFailure.retry_after > datetime.now()))
+             .tuples())
+    return {key for key, in query.iterator()}
+
+
+def record_scrape_results(kind: str, keys: list, results: list) -> None:
+    """Update the failure records after a bulk scrape, given results as returned by scrape_many().
+
+    Items whose scrape raised (None) or could not reach Last.fm ("failed")
+    are left alone, since that says nothing about whether Last.fm knows them.
+    """
+    if not LASTFM_API_KEY:
+        return
+    succeeded = [str(key) for key, result in zip(keys, results) if result and result["updated"]]
+    failed = [str(key) for key, result in zip(keys, results)
+              if result is not None and not result["updated"] and not result.get("failed")]
+    now = datetime.now()
+    
+    with db.atomic():
+        for start in range(0, len(succeeded), BATCH_SIZE):
+            ScrapeFailure.delete().where(
+                (ScrapeFailure.kind == kind) & ScrapeFailure.key.in_(succeeded[start:start + BATCH_SIZE])
+            ).execute()
+        
+        for start in range(0, len(failed), BATCH_SIZE):
+            batch = failed[start:start + BATCH_SIZE]
+            previous = dict(ScrapeFailure
+                            .select(ScrapeFailure.key, ScrapeFailure.attempts)
+                            .where((ScrapeFailure.kind == kind) & ScrapeFailure.key.in_(batch))
+                            .tuples())
+            rows = []
+            for key in batch:
+                attempts = previous.get(key, 0) + 1
+                rows.append({
+                    'kind': kind, 'key': key, 'attempts': attempts,
+                    'last_attempt_at': now, 'retry_after': now + backoff(attempts)
+                })
+            (ScrapeFailure
+             .insert_many(rows)
+             .on_conflict(
+                 conflict_target=[ScrapeFailure.kind, ScrapeFailure.key],
+                 preserve=[ScrapeFailure.attempts, ScrapeFailure.last_attempt_at, ScrapeFailure.retry_after])
+             .execute())
+
+
+def scrape_failure_counts() -> dict:
+    """Items of each kind currently cooling down."""
+    query = (ScrapeFailure
+             .select(ScrapeFailure.kind, fn.COUNT(ScrapeFailure.id))
+             .where(ScrapeFailure.retry_after > datetime.now())
+             .group_by(ScrapeFailure.kind)
+             .tuples())
+    counts = {ALBUM: 0, ARTIST: 0}
+    counts.update(dict(query))
+    return counts
+
+
+def reset_scrape_failures(kind: str = None) -> int:
+    query = ScrapeFailure.delete()
+    if kind:
+        query = query.where(ScrapeFailure.kind == kind)
+    return query.execute()
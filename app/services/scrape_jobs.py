@@ -0,0 +1,275 @@
+"""Bulk Last.fm scrapes run as background jobs.
+
+/admin/scrape and /admin/scrape-artists queue a scrape_jobs row with one
+scrape_job_items row per album or artist, and scrape_worker(), which every
+uvicorn worker process runs, works through the pending items a batch at a
+time. Item states and counters are saved after every batch, so a job
+resumes where it left off after a restart, or once a worker that died has
+not reported progress for SCRAPE_JOB_STALE_TIMEOUT seconds. Pausing and
+cancelling take effect between batches.
+
+Only one job runs at a time across all worker processes, so the
+process-local Last.fm limiter of the worker running it paces every bulk
+scrape; other queued jobs wait their turn.
+
+Every claim gives the job a new claim_token. A worker that was still busy
+with a batch when its job was paused and resumed, or reclaimed as stale,
+finds the token changed: its batch is discarded and it stops, leaving the
+job to the worker that claimed it.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from fastapi.concurrency import run_in_threadpool
+from peewee import IntegrityError
+from app.models import db, Album, ScrapeJob, ScrapeJobItem, new_db_state, close_db
+from app.config import SCRAPE_POLL_INTERVAL, SCRAPE_JOB_STALE_TIMEOUT, SCRAPE_CONCURRENCY
+from app.services.lastfm import scrape_album, scrape_artist, scrape_many
+from app.services.scrape_failures import ALBUM, ARTIST, record_scrape_results
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+RUNNING = 'running'
+PAUSED = 'paused'
+CANCELLED = 'cancelled'
+DONE = 'done'
+FAILED = 'failed'
+ACTIVE = (PENDING, RUNNING, PAUSED)
+
+# Serializes claims, so two workers can't each start a job at the same time
+CLAIM_LOCK_ID = 7305150025
+
+# Item states besides pending: what the scrape did, or that the album was deleted meanwhile
+UPDATED = 'updated'
+MISSED = 'missed'
+GONE = 'gone'
+
+BATCH_SIZE = SCRAPE_CONCURRENCY * 2
+INSERT_BATCH_SIZE = 1000
+
+
+def load_albums(keys: list) -> list:
+    albums = {str(album.id): album for album in Album.select().where(Album.id.in_([int(key) for key in keys]))}
+    return [albums.get(key) for key in keys]
+
+
+def load_artists(keys: list) -> list:
+    return list(keys)
+
+
+# kind: (load the items for a batch of keys, scrape one item)
+SCRAPE_KINDS = {
+    ALBUM: (load_albums, scrape_album),
+    ARTIST: (load_artists, scrape_artist),
+}
+
+
+def submit_scrape(kind: str, keys: list) -> ScrapeJob:
+    """Queue a scrape of `keys`, or return the job of that kind that is still active."""
+    if kind not in SCRAPE_KINDS:
+        raise ValueError(f"Unknown scrape kind: {kind}")
+    active = active_job(kind)
+    if active:
+        return active
+    try:
+        with db.atomic():
+            job = ScrapeJob.create(kind=kind, items_total=len(keys))
+            for start in range(0, len(keys), INSERT_BATCH_SIZE):
+                ScrapeJobItem.insert_many([
+                    {'job': job.id, 'key': str(key)} for key in keys[start:start + INSERT_BATCH_SIZE]
+                ]).execute()
+    except IntegrityError:
+        # Another submission queued one first (scrapejob_active_kind allows one active job per kind)
+        active = active_job(kind)
+        if active is None:
+            raise
+        return active
+    return job
+
+
+def active_job(kind: str):
+    return ScrapeJob.select().where((ScrapeJob.kind == kind) & ScrapeJob.status.in_(ACTIVE)).first()
+
+
+def get_scrape_job(job_id: int):
+    return ScrapeJob.select().where(ScrapeJob.id == job_id).first()
+
+
+def recent_scrape_jobs(limit: int = 5) -> list:
+    return list(ScrapeJob.select().order_by(ScrapeJob.id.desc()).limit(limit))
+
+
+def pause_scrape_job(job_id: int) -> bool:
+    return ScrapeJob.update(status=PAUSED).where(
+        (ScrapeJob.id == job_id) & ScrapeJob.status.in_((PENDING, RUNNING))
+    ).execute() > 0
+
+
+def resume_scrape_job(job_id: int) -> bool:
+    return ScrapeJob.update(status=PENDING).where(
+        (ScrapeJob.id == job_id) & (ScrapeJob.status == PAUSED)
+    ).execute() > 0
+
+
+def cancel_scrape_job(job_id: int) -> bool:
+    return ScrapeJob.update(status=CANCELLED, finished_at=datetime.now()).where(
+        (ScrapeJob.id == job_id) & ScrapeJob.status.in_(ACTIVE)
+    ).execute() > 0
+
+
+def claim_next_job():
+    stale = datetime.now() - timedelta(seconds=SCRAPE_JOB_STALE_TIMEOUT)
+    with db.atomic():
+        db.execute_sql("SELECT pg_advisory_xact_lock(%s)", (CLAIM_LOCK_ID,))
+        if ScrapeJob.select().where((ScrapeJob.status == RUNNING) & (ScrapeJob.heartbeat_at >= stale)).exists():
+            return None
+        job = (ScrapeJob
+               .select()
+               .where((ScrapeJob.status == PENDING) |
+                      ((ScrapeJob.status == RUNNING) & (ScrapeJob.heartbeat_at < stale)))
+               .order_by(ScrapeJob.id)
+               .limit(1)
+               .for_update('FOR UPDATE SKIP LOCKED')
+               .first())
+        if job is None:
+            return None
+        now = datetime.now()
+        job.status = RUNNING
+        job.started_at = now
+        job.heartbeat_at = now
+        job.items_at_start = job.items_processed
+        job.claim_token = uuid.uuid4().hex
+        job.save(only=[ScrapeJob.status, ScrapeJob.started_at, ScrapeJob.heartbeat_at, ScrapeJob.items_at_start,
+                       ScrapeJob.claim_token])
+    return job
+
+
+def owned_by(job: ScrapeJob):
+    """Matches the job's row while this worker's claim on it stands."""
+    return (ScrapeJob.id == job.id) & (ScrapeJob.claim_token == job.claim_token)
+
+
+def job_status(job: ScrapeJob):
+    """The job's status, or None once another worker has claimed it."""
+    return ScrapeJob.select(ScrapeJob.status).where(owned_by(job)).scalar()
+
+
+def pending_keys(job_id: int, limit: int = BATCH_SIZE) -> list:
+    query = (ScrapeJobItem
+             .select(ScrapeJobItem.key)
+             .where((ScrapeJobItem.job == job_id) & (ScrapeJobItem.status == PENDING))
+             .order_by(ScrapeJobItem.id)
+             .limit(limit)
+             .tuples())
+    return [key for key, in query]
+
+
+def item_state(result) -> str:
+    if result is None or result.get("failed"):
+        return FAILED
+    return UPDATED if result["updated"] else MISSED
+
+
+def save_batch(job: ScrapeJob, keys: list, scraped_keys: list, results: list) -> bool:
+    """Record a finished batch: item states, job counters and the scrape failure backoff.
+
+    Returns False, saving nothing, if another worker has claimed the job since.
+    """
+    states = {key: GONE for key in keys}
+    states.update((key, item_state(result)) for key, result in zip(scraped_keys, results))
+    by_state = {}
+    for key, state in states.items():
+        by_state.setdefault(state, []).append(key)
+    now = datetime.now()
+
+    with db.atomic():
+        owned = ScrapeJob.update(
+            items_processed=ScrapeJob.items_processed + len(keys),
+            items_updated=ScrapeJob.items_updated + len(by_state.get(UPDATED, [])),
+            heartbeat_at=now
+        ).where(owned_by(job)).execute()
+        if not owned:
+            return False
+        for state, state_keys in by_state.items():
+            ScrapeJobItem.update(status=state, finished_at=now).where(
+                (ScrapeJobItem.job == job.id) & ScrapeJobItem.key.in_(state_keys)
+            ).execute()
+        record_scrape_results(job.kind, scraped_keys, results)
+    return True
+
+
+def finish_job(job: ScrapeJob, status: str, error: str = None) -> None:
+    ScrapeJob.update(status=status, error=error, finished_at=datetime.now()).where(
+        owned_by(job) & (ScrapeJob.status == RUNNING)
+    ).execute()
+
+
+def requeue_job(job: ScrapeJob) -> None:
+    ScrapeJob.update(status=PENDING).where(owned_by(job) & (ScrapeJob.status == RUNNING)).execute()
+
+
+async def run_job(job: ScrapeJob) -> None:
+    load, scrape = SCRAPE_KINDS[job.kind]
+    try:
+        while await run_in_threadpool(job_status, job) == RUNNING:
+            keys = await run_in_threadpool(pending_keys, job.id)
+            if not keys:
+                await run_in_threadpool(finish_job, job, DONE)
+                return
+            items = await run_in_threadpool(load, keys)
+            scraped = [(key, item) for key, item in zip(keys, items) if item is not None]
+            results = await scrape_many([item for _, item in scraped], scrape)
+            if not await run_in_threadpool(save_batch, job, keys, [key for key, _ in scraped], results):
+                logger.info(f"Scrape job {job.id} was claimed by another worker, discarding its last batch")
+                return
+    except asyncio.CancelledError:
+        # Shutting down: hand the job back so the next worker resumes it straight away
+        await run_in_threadpool(requeue_job, job)
+        raise
+    except Exception as e:
+        logger.exception(f"Scrape job {job.id} failed")
+        await run_in_threadpool(finish_job, job, FAILED, str(e))
+
+
+def job_progress(job: ScrapeJob) -> dict:
+    items_per_second = None
+    eta_seconds = None
+    processed = job.items_processed - job.items_at_start
+    if job.started_at and job.heartbeat_at and processed > 0:
+        elapsed = (job.heartbeat_at - job.started_at).total_seconds()
+        if elapsed > 0:
+            items_per_second = round(processed / elapsed, 2)
+            if job.status == RUNNING:
+                eta_seconds = round(max(job.items_total - job.items_processed, 0) / items_per_second)
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'items_total': job.items_total,
+        'items_processed': job.items_processed,
+        'items_updated': job.items_updated,
+        'items_per_second': items_per_second,
+        'eta_seconds': eta_seconds,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+async def scrape_worker(poll_interval: float = SCRAPE_POLL_INTERVAL):
+    # Runs for the life of the process with its own connection, separate from requests
+    new_db_state()
+    while True:
+        job = None
+        try:
+            job = await run_in_threadpool(claim_next_job)
+            if job:
+                await run_job(job)
+        except Exception:
+            logger.exception("Scrape worker failed to claim a job")
+        finally:
+            close_db(None)
+        if not job:
+            await asyncio.sleep(poll_interval)
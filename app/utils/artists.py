@@ -1,5 +1,9 @@
 import re
+import threading
 import unicodedata
+from contextlib import contextmanager
+from functools import lru_cache
+from app.utils.cache import TTLCache
 
 
 def sanitize_filename(name: str) -> str:
@@ -8,30 +12,49 @@ def sanitize_filename(name: str) -> str:
     return re.sub(r'[^\w\s\-_]', '', name)
 
 
-def split_artists(artist_string: str) -> list:
-    if not artist_string:
-        return []
-    
+# Separators in the order split_artists() prefers them, without their trailing space:
+# the first kind present decides the split
+FEAT_SEPARATORS = (' feat.', ' feat', ' featuring', ' ft.', ' ft')
+LIST_SEPARATORS = (' /', ' +', ' ·', ' ∙')
+
+# Finds every separator in one scan of the lowercased string. Only the leading space is consumed,
+# so adjacent separators sharing a space are all found, same as checking each with `in`
+SEPARATOR_PATTERN = re.compile(r' (?:/|\+|·|∙|-|feat\.|featuring|feat|ft\.|ft)(?= )')
+FEAT_SPLIT_PATTERNS = {sep: re.compile(re.escape(sep + ' '), re.IGNORECASE) for sep in FEAT_SEPARATORS}
+COMMA_FEAT_PATTERN = re.compile(r', .* (feat\.?|featuring|ft\.?) ')
+NAME_SUFFIX_PATTERN = re.compile(r'^,? ?(jr\.?|sr\.?)$', re.IGNORECASE)
+
+SPLIT_CACHE_SIZE = 8192
+
+
+def separators(text: str) -> set:
+    return set(SEPARATOR_PATTERN.findall(text.lower()))
+
+
+def split_feat(text: str, found: set) -> tuple:
+    """Split on the first featuring separator in `found`. Returns the parts and the separator used."""
+    for sep in FEAT_SEPARATORS:
+        if sep in found:
+            return [a.strip() for a in FEAT_SPLIT_PATTERNS[sep].split(text) if a.strip()], sep
+    return None, None
+
+
+@lru_cache(maxsize=SPLIT_CACHE_SIZE)
+def _split_artists(artist_string: str) -> tuple:
     artist_string = artist_string.strip()
     if not artist_string:
-        return []
+        return ()
+    
+    found = separators(artist_string)
+    if not found and ', ' not in artist_string:
+        return (artist_string,)
+    has_feat = not found.isdisjoint(FEAT_SEPARATORS)
     
     artists = []
-    lower = artist_string.lower()
-    
-    if re.search(r', .* (feat\.?|featuring|ft\.?) ', lower):
-        if ' feat. ' in lower:
-            artists = [a.strip() for a in re.split(' feat\\. ', artist_string, flags=re.IGNORECASE) if a.strip()]
-        elif ' feat ' in lower:
-            artists = [a.strip() for a in re.split(' feat ', artist_string, flags=re.IGNORECASE) if a.strip()]
-        elif ' featuring ' in lower:
-            artists = [a.strip() for a in re.split(' featuring ', artist_string, flags=re.IGNORECASE) if a.strip()]
-        elif ' ft. ' in lower:
-            artists = [a.strip() for a in re.split(' ft\\. ', artist_string, flags=re.IGNORECASE) if a.strip()]
-        elif ' ft ' in lower:
-            artists = [a.strip() for a in re.split(' ft ', artist_string, flags=re.IGNORECASE) if a.strip()]
-        
-        if artists and any(', ' in a for a in artists):
+    split_on = None
+    if has_feat and ', ' in artist_string and COMMA_FEAT_PATTERN.search(artist_string.lower()):
+        artists, split_on = split_feat(artist_string, found)
+        if any(', ' in a for a in artists):
             split_again = []
             for a in artists:
                 if ', ' in a:
@@ -39,26 +62,14 @@ def split_artists(artist_string: str) -> list:
                 else:
                     split_again.append(a)
             artists = split_again
-    elif ' / ' in artist_string:
-        artists = artist_string.split(' / ')
-    elif ' + ' in artist_string:
-        artists = artist_string.split(' + ')
-    elif ' · ' in artist_string:
-        artists = artist_string.split(' · ')
-    elif ' ∙ ' in artist_string:
-        artists = artist_string.split(' ∙ ')
-    elif ' feat. ' in lower:
-        artists = [a.strip() for a in re.split(' feat\\. ', artist_string, flags=re.IGNORECASE) if a.strip()]
-    elif ' feat ' in lower:
-        artists = [a.strip() for a in re.split(' feat ', artist_string, flags=re.IGNORECASE) if a.strip()]
-    elif ' featuring ' in lower:
-        artists = [a.strip() for a in re.split(' featuring ', artist_string, flags=re.IGNORECASE) if a.strip()]
-    elif ' ft. ' in lower:
-        artists = [a.strip() for a in re.split(' ft\\. ', artist_string, flags=re.IGNORECASE) if a.strip()]
-    elif ' ft ' in lower:
-        artists = [a.strip() for a in re.split(' ft ', artist_string, flags=re.IGNORECASE) if a.strip()]
-    elif ' - ' in artist_string:
-        artists = [a.strip() for a in artist_string.split(' - ') if a.strip()]
+    else:
+        separator = next((sep for sep in LIST_SEPARATORS if sep in found), None)
+        if separator:
+            artists = artist_string.split(separator + ' ')
+        elif has_feat:
+            artists, split_on = split_feat(artist_string, found)
+        elif ' -' in found:
+            artists = [a.strip() for a in artist_string.split(' - ') if a.strip()]
     
     if not artists:
         if ', ' in artist_string:
@@ -66,39 +77,41 @@ def split_artists(artist_string: str) -> list:
         else:
             artists = [artist_string]
     
-    final_artists = []
-    for artist in artists:
-        lower_artist = artist.lower()
-        if ' feat. ' in lower_artist:
-            sub_artists = [a.strip() for a in re.split(' feat\\. ', artist, flags=re.IGNORECASE) if a.strip()]
-            final_artists.extend(sub_artists)
-        elif ' feat ' in lower_artist:
-            sub_artists = [a.strip() for a in re.split(' feat ', artist, flags=re.IGNORECASE) if a.strip()]
-            final_artists.extend(sub_artists)
-        elif ' featuring ' in lower_artist:
-            sub_artists = [a.strip() for a in re.split(' featuring ', artist, flags=re.IGNORECASE) if a.strip()]
-            final_artists.extend(sub_artists)
-        elif ' ft. ' in lower_artist:
-            sub_artists = [a.strip() for a in re.split(' ft\\. ', artist, flags=re.IGNORECASE) if a.strip()]
-            final_artists.extend(sub_artists)
-        elif ' ft ' in lower_artist:
-            sub_artists = [a.strip() for a in re.split(' ft ', artist, flags=re.IGNORECASE) if a.strip()]
-            final_artists.extend(sub_artists)
-        else:
-            final_artists.append(artist)
+    # Parts can still hold a featuring separator of another kind than the one split on
+    if has_feat and any(sep in found for sep in FEAT_SEPARATORS if sep != split_on):
+        final_artists = []
+        for artist in artists:
+            sub_artists, _ = split_feat(artist, separators(artist))
+            if sub_artists is None:
+                final_artists.append(artist)
+            else:
+                final_artists.extend(sub_artists)
+        artists = final_artists
     
     merged_artists = []
-    i = 0
-    while i < len(final_artists):
-        current = final_artists[i]
-        if i > 0 and re.search(r'^,? ?(jr\.?|sr\.?)$', current, re.IGNORECASE):
-            merged = merged_artists[-1] + ' ' + current.replace(',', '').strip()
-            merged_artists[-1] = merged.strip()
+    for i, current in enumerate(artists):
+        # A name suffix part is at most ", jr." plus the newline `$` allows
+        if i > 0 and len(current) <= 6 and NAME_SUFFIX_PATTERN.search(current):
+            merged_artists[-1] = (merged_artists[-1] + ' ' + current.replace(',', '').strip()).strip()
         else:
             merged_artists.append(current)
-        i += 1
     
-    return [a.strip() for a in merged_artists if a.strip()]
+    return tuple(a.strip() for a in merged_artists if a.strip())
+
+
+def split_artists(artist_string: str) -> list:
+    """Individual artist names in a credit string like "A feat. B" or "A / B".
+
+    Results are memoized per distinct string (up to SPLIT_CACHE_SIZE).
+    """
+    if not artist_string:
+        return []
+    return list(_split_artists(artist_string))
+
+
+def split_artists_many(artist_strings) -> dict:
+    """split_artists() for many credit strings, keyed by string. Each distinct string is split once."""
+    return {artist_string: split_artists(artist_string) for artist_string in set(artist_strings)}
 
 
 def join_artists(artists: list) -> str:
@@ -113,9 +126,132 @@ def strip_discogs_suffix(artist_string: str) -> str:
     return result
 
 
-def apply_artist_mapping(artist_string: str) -> str:
+def load_artist_mappings() -> list:
     from app.models import ArtistMapping
     
+    query = ArtistMapping.select(ArtistMapping.original_name, ArtistMapping.new_name).order_by(ArtistMapping.id)
+    return list(query.tuples())
+
+
+def follow_chain(name: str, links: dict) -> str:
+    seen = {name}
+    while name in links and links[name] not in seen:
+        name = links[name]
+        seen.add(name)
+    return name
+
+
+class RenameChains:
+    """Name -> name links with the end of every chain kept up to date as links change."""
+    
+    def __init__(self):
+        self.links = {}
+        self.ends = {}
+        self.sources = {}
+    
+    def end(self, name: str) -> str:
+        return self.ends.get(name, name)
+    
+    def link(self, name: str, target: str) -> None:
+        previous = self.links.get(name)
+        if previous is not None:
+            self.sources[previous].discard(name)
+        self.links[name] = target
+        self.sources.setdefault(target, set()).add(name)
+        # Only chains that pass through `name` can end somewhere new
+        for affected in self._reaching(name):
+            self.ends[affected] = follow_chain(affected, self.links)
+    
+    def _reaching(self, name: str) -> set:
+        reaching = {name}
+        queue = [name]
+        while queue:
+            for source in self.sources.get(queue.pop(), ()):
+                if source not in reaching:
+                    reaching.add(source)
+                    queue.append(source)
+        return reaching
+
+
+class ArtistMappingResolver:
+    """All artist mappings, resolved in memory.
+
+    Mappings are loaded once per process and every chain is followed ahead
+    of time in both directions: `resolve()` gives the name a raw artist
+    ends up as, `original()` the first name a current artist was known by.
+    `add()` updates the loaded maps in place; renames and deletes call
+    `invalidate()` to reload on next use. Code that adds mappings inside a
+    transaction opens it with `atomic()`, so a rollback drops them from
+    memory too. Changes made by other processes are picked up after `ttl`
+    seconds.
+    """
+    
+    def __init__(self, ttl: float = 60):
+        self._cache = TTLCache(ttl, albums=False)
+        # Held while the maps are built, read or changed; import threads share them
+        self._lock = threading.Lock()
+    
+    def _build(self, pairs: list) -> tuple:
+        renamed_to = RenameChains()
+        renamed_from = RenameChains()
+        for original_name, new_name in pairs:
+            self._link(renamed_to, renamed_from, original_name, new_name)
+        return set(pairs), renamed_to, renamed_from
+    
+    @staticmethod
+    def _link(renamed_to, renamed_from, original_name: str, new_name: str) -> None:
+        if original_name == new_name:
+            return
+        # The latest mapping for a name wins, the earliest origin is kept
+        renamed_to.link(original_name, new_name)
+        if new_name not in renamed_from.links:
+            renamed_from.link(new_name, original_name)
+    
+    def _current(self) -> tuple:
+        # Callers hold self._lock
+        return self._cache.get("mappings", lambda: self._build(load_artist_mappings()))
+    
+    def resolve(self, name: str) -> str:
+        with self._lock:
+            return self._current()[1].end(name)
+    
+    def original(self, name: str) -> str:
+        with self._lock:
+            return self._current()[2].end(name)
+    
+    def add(self, original_name: str, new_name: str) -> bool:
+        """Record a mapping unless it already exists. Returns True if created."""
+        from app.models import ArtistMapping
+        
+        with self._lock:
+            pairs, renamed_to, renamed_from = self._current()
+            if (original_name, new_name) in pairs:
+                return False
+            ArtistMapping.create(original_name=original_name, new_name=new_name)
+            pairs.add((original_name, new_name))
+            self._link(renamed_to, renamed_from, original_name, new_name)
+        return True
+    
+    def invalidate(self) -> None:
+        self._cache.invalidate()
+    
+    @contextmanager
+    def atomic(self):
+        """db.atomic() that reloads the mappings on next use if it rolls back."""
+        from app.models import db
+        
+        try:
+            with db.atomic():
+                yield
+        except BaseException:
+            self.invalidate()
+            raise
+
+
+artist_mappings = ArtistMappingResolver()
+
+
+def apply_artist_mapping(artist_string: str) -> str:
     artists = split_artists(artist_string)
     mapped_artists = []
     
@@ -123,18 +259,9 @@ def apply_artist_mapping(artist_string: str) -> str:
         mapped_name = strip_discogs_suffix(artist)
         
         if mapped_name != artist:
-            existing_mapping = ArtistMapping.select().where(
-                (ArtistMapping.original_name == artist) &
-                (ArtistMapping.new_name == mapped_name)
-            ).first()
-            if not existing_mapping:
-                ArtistMapping.create(original_name=artist, new_name=mapped_name)
+            artist_mappings.add(artist, mapped_name)
             artist = mapped_name
         
-        mapping = ArtistMapping.select().where(ArtistMapping.original_name == artist).first()
-        if mapping:
-            mapped_artists.append(mapping.new_name)
-        else:
-            mapped_artists.append(artist)
+        mapped_artists.append(artist_mappings.resolve(artist))
     
     return ', '.join(mapped_artists)
@@ -0,0 +1,66 @@
+import threading
+import time
+
+_album_caches = []
+
+# Read and bump the album generation every worker process shares; app.models
+# keeps it in the database. Until use_shared_generation() is called, caches
+# only see invalidations made in this process.
+read_shared_generation = None
+bump_shared_generation = None
+
+
+def use_shared_generation(read, bump) -> None:
+    global read_shared_generation, bump_shared_generation
+    read_shared_generation = read
+    bump_shared_generation = bump
+
+
+class TTLCache:
+    """Small thread-safe memo for values derived from the albums table.
+
+    Entries expire after `ttl` seconds. Caches created with `albums=True`
+    are also cleared by invalidate_album_caches(), which the album write
+    paths call. Their entries are tagged with the shared album generation
+    as well, so a write made by any worker process makes every process
+    recompute on its next read.
+    """
+
+    def __init__(self, ttl: float, albums: bool = True):
+        self.ttl = ttl
+        self.albums = albums
+        self._entries = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        if albums:
+            _album_caches.append(self)
+
+    def get(self, key, factory):
+        now = time.monotonic()
+        shared = read_shared_generation() if self.albums and read_shared_generation else None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now and entry[1] == shared:
+                return entry[2]
+            generation = self._generation
+        value = factory()
+        with self._lock:
+            # Don't store a value computed while a write invalidated the cache
+            if generation == self._generation:
+                self._entries[key] = (now + self.ttl, shared, value)
+        return value
+
+    def invalidate(self, key=None):
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+def invalidate_album_caches():
+    if bump_shared_generation:
+        bump_shared_generation()
+    for cache in _album_caches:
+        cache.invalidate()
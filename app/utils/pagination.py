@@ -0,0 +1,121 @@
+import base64
+import json
+from peewee import Tuple, Function, IntegerField
+from app.config import STATS_CACHE_TTL
+from app.utils.cache import TTLCache
+
+DEFAULT_PAGE_SIZE = 60
+MAX_PAGE_SIZE = 200
+
+# Totals of filtered listings, cleared with the other album caches
+count_cache = TTLCache(STATS_CACHE_TTL)
+
+
+class Page:
+    def __init__(self, items: list, total: int, next_url: str = None, prev_url: str = None):
+        self.items = items
+        self.total = total
+        self.next_url = next_url
+        self.prev_url = prev_url
+
+
+def encode_cursor(sort_value, item_id) -> str:
+    raw = json.dumps([sort_value, item_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, key_type: type = None):
+    """(sort value, id) from a cursor, or None if it is malformed.
+
+    With `key_type`, a sort value of any other type (say from a cursor made
+    for another sort) is rejected too, rather than sent to the database.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort_value, item_id = json.loads(raw)
+        if key_type and (not isinstance(sort_value, key_type) or isinstance(sort_value, bool)):
+            return None
+        return sort_value, int(item_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def sort_key_type(sort_key) -> type:
+    """The Python type of a sort key's values: int for integer columns and COALESCEs of them, else str."""
+    if isinstance(sort_key, Function) and sort_key.arguments:
+        sort_key = sort_key.arguments[0]
+    return int if isinstance(sort_key, IntegerField) else str
+
+
+def total_count(query) -> int:
+    sql, params = query.sql()
+    return count_cache.get((sql, repr(params)), query.count)
+
+
+def clamp_page_size(limit) -> int:
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def _page_url(base_url, **params) -> str:
+    url = base_url.include_query_params(**params)
+    return f"{url.path}?{url.query}"
+
+
+def paginate(query, request, sort_key, order: str = "asc", after: str = None,
+             before: str = None, limit: int = DEFAULT_PAGE_SIZE) -> Page:
+    """Keyset pagination on (sort_key, id).
+
+    `after` and `before` are opaque cursors taken from the next/prev links,
+    so every page is an index range scan regardless of how deep it is.
+    The total is counted once per distinct query and cached until albums
+    change, rather than on every page.
+    """
+    limit = clamp_page_size(limit)
+    pk = query.model._meta.primary_key
+    descending = order == "desc"
+    total = total_count(query)
+
+    key_type = sort_key_type(sort_key)
+    after_key = decode_cursor(after, key_type)
+    before_key = decode_cursor(before, key_type)
+    backwards = before_key is not None and after_key is None
+
+    page_query = query.select_extend(sort_key.alias('_sort_key'))
+    position = Tuple(sort_key, pk)
+    if after_key is not None:
+        cursor = Tuple(*after_key)
+        page_query = page_query.where(position < cursor if descending else position > cursor)
+    elif backwards:
+        cursor = Tuple(*before_key)
+        page_query = page_query.where(position > cursor if descending else position < cursor)
+
+    if descending != backwards:
+        page_query = page_query.order_by(sort_key.desc(), pk.desc())
+    else:
+        page_query = page_query.order_by(sort_key.asc(), pk.asc())
+
+    items = list(page_query.limit(limit + 1))
+    has_more = len(items) > limit
+    items = items[:limit]
+    if backwards:
+        items.reverse()
+
+    has_next = (has_more or backwards) and bool(items)
+    has_prev = (has_more if backwards else after_key is not None) and bool(items)
+
+    base_url = request.url.remove_query_params(['after', 'before'])
+    next_url = prev_url = None
+    if has_next:
+        last = items[-1]
+        next_url = _page_url(base_url, after=encode_cursor(last._sort_key, getattr(last, pk.name)))
+    if has_prev:
+        first = items[0]
+        prev_url = _page_url(base_url, before=encode_cursor(first._sort_key, getattr(first, pk.name)))
+
+    return Page(items, total, next_url, prev_url)
@@ -0,0 +1,116 @@
+"""Latency of GET / while a cover upload or a bulk scrape runs on the same worker.
+
+Talks to a running instance over HTTP, so point it at a development server:
+
+    python -m benchmarks.concurrency_benchmark --url http://localhost:8000 --background upload
+    python -m benchmarks.concurrency_benchmark --background scrape --requests 200
+
+--background none measures the idle baseline. The upload case posts a large
+generated image to /albums so resize_image() has real work to do; the scrape
+case posts /admin/scrape, which queues a scrape job for the server's
+background worker (cancel it from /admin afterwards). Both need
+ADMIN_PASSWORD to log in first.
+"""
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import time
+import httpx
+from PIL import Image
+
+
+def large_image(size: int = 4000) -> bytes:
+    img = Image.effect_noise((size, size), 64).convert("RGB")
+    output = io.BytesIO()
+    img.save(output, format="PNG")
+    return output.getvalue()
+
+
+async def login(client: httpx.AsyncClient, password: str):
+    response = await client.post("/login", data={"password": password})
+    if "error" in response.headers.get("location", ""):
+        raise SystemExit("Login failed, check ADMIN_PASSWORD")
+
+
+async def upload_loop(client: httpx.AsyncClient, stop: asyncio.Event):
+    image = large_image()
+    created = []
+    while not stop.is_set():
+        response = await client.post(
+            "/albums",
+            data={"title": "concurrency-benchmark", "artist": "Benchmark", "is_wanted": "true"},
+            files={"cover": ("cover.png", image, "image/png")},
+        )
+        if response.status_code == 303:
+            created.append(response.headers["location"].rsplit("/", 1)[-1])
+    for album_id in created:
+        await client.post(f"/albums/{album_id}/delete")
+
+
+async def scrape_loop(client: httpx.AsyncClient, stop: asyncio.Event):
+    # The scrape runs as a job on the server; keep it queued while measuring
+    await client.post("/admin/scrape")
+    await stop.wait()
+
+
+async def measure(client: httpx.AsyncClient, count: int, concurrency: int) -> list:
+    timings = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.get("/")
+            response.raise_for_status()
+            timings.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(count)))
+    return timings
+
+
+def percentile(timings: list, pct: float) -> float:
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, int(len(timings) * pct))]
+
+
+async def run(args):
+    async with httpx.AsyncClient(base_url=args.url, timeout=60.0) as client, \
+            httpx.AsyncClient(base_url=args.url, timeout=60.0) as admin:
+        background = None
+        stop = asyncio.Event()
+        if args.background != "none":
+            await login(admin, args.password)
+            loop = upload_loop if args.background == "upload" else scrape_loop
+            background = asyncio.create_task(loop(admin, stop))
+            await asyncio.sleep(args.warmup)
+
+        timings = await measure(client, args.requests, args.concurrency)
+
+        stop.set()
+        if background:
+            if args.background == "scrape":
+                background.cancel()
+            await asyncio.gather(background, return_exceptions=True)
+
+    print(f"GET / x{args.requests} (concurrency {args.concurrency}) with background={args.background}")
+    print(f"  p50 {statistics.median(timings):8.2f} ms")
+    print(f"  p99 {percentile(timings, 0.99):8.2f} ms")
+    print(f"  max {max(timings):8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=os.getenv("BASE_URL", "http://localhost:8000"))
+    parser.add_argument("--background", choices=["none", "upload", "scrape"], default="upload")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=float, default=1.0, help="seconds to let the background job start")
+    parser.add_argument("--password", default=os.getenv("ADMIN_PASSWORD", ""))
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Discogs CSV normalization throughput with 1, 2, 4 and 8 worker processes.
+
+Times normalized_rows() alone over a synthetic export: decoding, parsing
+and normalizing every row and handing the results back in file order. It
+needs no database; see import_benchmark for end-to-end import times.
+
+    python -m benchmarks.normalize_benchmark --rows 500000
+    python -m benchmarks.normalize_benchmark --rows 200000 --workers 1,4
+"""
+import argparse
+import os
+import time
+from app.services.import_csv import normalized_rows, NORMALIZE_CHUNK_SIZE
+from benchmarks.import_benchmark import synthetic_export
+
+
+def run(content: bytes, workers: int, chunk_size: int) -> tuple:
+    start = time.perf_counter()
+    count = sum(1 for _ in normalized_rows(content, workers, chunk_size))
+    return count, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--workers", default="1,2,4,8", help="comma-separated worker counts")
+    parser.add_argument("--chunk-size", type=int, default=NORMALIZE_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    content = synthetic_export(args.rows)
+    print(f"{args.rows} CSV rows ({len(content) / 1e6:.1f} MB), {os.cpu_count()} CPUs\n")
+
+    baseline = None
+    for workers in (int(w) for w in args.workers.split(",")):
+        count, elapsed = run(content, workers, args.chunk_size)
+        baseline = baseline or elapsed
+        print(f"{workers:2} worker(s) {elapsed:8.2f} s   {count / elapsed:10.0f} rows/s   {baseline / elapsed:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
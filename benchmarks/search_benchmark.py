@@ -0,0 +1,92 @@
+"""Search latency on a synthetic collection: legacy ILIKE scan vs. trigram index.
+
+Inserts synthetic albums inside a transaction that is rolled back at the end,
+so it can be pointed at a development database without leaving data behind.
+
+    python -m benchmarks.search_benchmark --albums 100000 --runs 20
+"""
+import argparse
+import random
+import statistics
+import time
+from app.models import db, Album, album_search, create_tables
+
+WORDS = [
+    "blue", "night", "train", "soul", "fire", "river", "electric", "dream", "velvet", "echo",
+    "sunday", "golden", "ghost", "moon", "city", "wild", "silver", "heart", "storm", "garden",
+    "canción", "corazón", "mañana", "noche", "brûlée", "über", "säge", "café", "niño", "ação",
+]
+NAMES = [
+    "John", "Björk", "Sigur", "Ana", "Camarón", "Paco", "Miles", "Nina", "Léo", "Zoë",
+    "Davis", "Simone", "Lucía", "Ferré", "Gilberto", "Jobim", "Coltrane", "Mingus", "Rós", "Shorter",
+]
+SEARCHES = ["night", "corazon", "BJORK", "cafe", "electric dream", "lucia", "zzzz-not-there"]
+
+
+def synthetic_albums(count: int, seed: int = 42):
+    rng = random.Random(seed)
+    for i in range(count):
+        yield {
+            'title': " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title(),
+            'artist': f"{rng.choice(NAMES)} {rng.choice(NAMES)}",
+            'year': rng.randint(1950, 2024),
+            'physical_format': rng.choice(["CD", "Vinyl", "Tape", "EP - Single"]),
+            'genres': [],
+            'genres_normalized': [],
+            'is_wanted': rng.random() < 0.1,
+            'notes': 'search-benchmark',
+        }
+
+
+def legacy_condition(search: str):
+    return Album.title.contains(search) | Album.artist.contains(search)
+
+
+def time_query(condition, runs: int) -> list:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        list(Album.select(Album.id).where((Album.is_wanted == False) & condition).tuples())
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def summarize(timings: list) -> str:
+    timings = sorted(timings)
+    p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+    return f"median {statistics.median(timings):8.2f} ms   p95 {p95:8.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--albums", type=int, default=100_000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    create_tables()
+    db.connect(reuse_if_open=True)
+    with db.atomic() as txn:
+        rows = list(synthetic_albums(args.albums))
+        for start in range(0, len(rows), 5000):
+            Album.insert_many(rows[start:start + 5000]).execute()
+        db.execute_sql("ANALYZE albums")
+        print(f"{args.albums} synthetic albums, {args.runs} runs per query\n")
+
+        for search in SEARCHES:
+            legacy = time_query(legacy_condition(search), args.runs)
+            trigram = time_query(album_search(search), args.runs)
+            print(f"{search!r:18} ILIKE   {summarize(legacy)}")
+            print(f"{'':18} trigram {summarize(trigram)}")
+
+        sql, params = Album.select(Album.id).where(album_search("night")).sql()
+        plan = db.execute_sql("EXPLAIN " + sql, params).fetchall()
+        print("\nPlan for trigram search:")
+        for line, in plan:
+            print("  " + line)
+
+        txn.rollback()
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""split_artists() throughput: the memoized tokenizer vs. the original cascade.
+
+Splits a synthetic set of credit strings, with repeats as in a real library,
+using the original implementation (kept with the tests as their reference),
+the current one without its cache, with a cold cache and with a warm cache.
+
+    python -m benchmarks.split_artists_benchmark --strings 100000 --distinct 20000
+"""
+import argparse
+import random
+import time
+from app.utils.artists import split_artists, split_artists_many, _split_artists
+from tests.unit.split_artists_reference import legacy_split_artists
+
+NAMES = ["Miles Davis", "John Coltrane", "Björk", "Sigur Rós", "Nina Simone", "Camarón", "Paco de Lucía",
+         "Harry Connick", "Tool", "Massive Attack", "Lee Scratch Perry", "Zoë", "Ry Cooder"]
+SEPARATORS = [" / ", " + ", " · ", " feat. ", " Feat ", " featuring ", " ft. ", " ft ", " - ", ", ", " & ", " and "]
+SUFFIXES = ["", "", "", ", Jr.", " Jr", " Sr."]
+
+
+def synthetic_credits(distinct: int, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    credits = []
+    for _ in range(distinct):
+        parts = [rng.choice(NAMES) + rng.choice(SUFFIXES)]
+        for _ in range(rng.choice([0, 0, 0, 1, 1, 2])):
+            parts.append(rng.choice(SEPARATORS) + rng.choice(NAMES))
+        credits.append("".join(parts))
+    return credits
+
+
+def time_split(func, strings: list) -> float:
+    start = time.perf_counter()
+    for artist_string in strings:
+        func(artist_string)
+    return time.perf_counter() - start
+
+
+def report(label: str, elapsed: float, count: int) -> None:
+    print(f"{label:28} {elapsed * 1000:9.1f} ms   {count / elapsed / 1000:9.1f} k strings/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--strings", type=int, default=100_000)
+    parser.add_argument("--distinct", type=int, default=20_000)
+    args = parser.parse_args()
+
+    credits = synthetic_credits(args.distinct)
+    rng = random.Random(7)
+    strings = [rng.choice(credits) for _ in range(args.strings)]
+    print(f"{args.strings} credit strings, {len(set(strings))} distinct\n")
+
+    report("original", time_split(legacy_split_artists, strings), len(strings))
+    report("tokenizer, no cache", time_split(_split_artists.__wrapped__, strings), len(strings))
+    _split_artists.cache_clear()
+    report("tokenizer, cold cache", time_split(split_artists, strings), len(strings))
+    report("tokenizer, warm cache", time_split(split_artists, strings), len(strings))
+    _split_artists.cache_clear()
+    start = time.perf_counter()
+    split_artists_many(strings)
+    report("split_artists_many, cold", time.perf_counter() - start, len(strings))
+
+    mismatches = sum(1 for s in set(strings) if split_artists(s) != legacy_split_artists(s))
+    print(f"\n{mismatches} strings split differently from the original")
+
+
+if __name__ == "__main__":
+    main()
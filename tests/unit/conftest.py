@@ -0,0 +1,33 @@
+import pytest
+import sys
+sys.path.insert(0, '/Users/hanzonian/Documents/personal/music-library')
+
+from datetime import datetime
+from types import SimpleNamespace
+
+
+@pytest.fixture(autouse=True)
+def album_generation(mocker):
+    """Keep the shared album cache generation in memory instead of the database."""
+    generation = {'value': 0}
+    
+    def bump():
+        generation['value'] += 1
+    
+    mocker.patch('app.utils.cache.read_shared_generation', lambda: generation['value'])
+    mocker.patch('app.utils.cache.bump_shared_generation', bump)
+    return generation
+
+
+@pytest.fixture
+def make_job(request):
+    """Build a background job row: shared job columns, the test module's JOB_FIELDS, then keyword overrides."""
+    def make(**kwargs):
+        fields = {
+            'id': 1, 'status': 'running', 'error': None, 'created_at': datetime(2024, 1, 1),
+            'started_at': None, 'heartbeat_at': None, 'finished_at': None, 'claim_token': 'run-1',
+        }
+        fields.update(request.module.JOB_FIELDS)
+        fields.update(kwargs)
+        return SimpleNamespace(**fields)
+    return make
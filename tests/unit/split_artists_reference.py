@@ -0,0 +1,95 @@
+"""The original split_artists(), which the memoized tokenizer must keep matching."""
+import re
+
+
+def legacy_split_artists(artist_string: str) -> list:
+    if not artist_string:
+        return []
+    
+    artist_string = artist_string.strip()
+    if not artist_string:
+        return []
+    
+    artists = []
+    lower = artist_string.lower()
+    
+    if re.search(r', .* (feat\.?|featuring|ft\.?) ', lower):
+        if ' feat. ' in lower:
+            artists = [a.strip() for a in re.split(' feat\\. ', artist_string, flags=re.IGNORECASE) if a.strip()]
+        elif ' feat ' in lower:
+            artists = [a.strip() for a in re.split(' feat ', artist_string, flags=re.IGNORECASE) if a.strip()]
+        elif ' featuring ' in lower:
+            artists = [a.strip() for a in re.split(' featuring ', artist_string, flags=re.IGNORECASE) if a.strip()]
+        elif ' ft. ' in lower:
+            artists = [a.strip() for a in re.split(' ft\\. ', artist_string, flags=re.IGNORECASE) if a.strip()]
+        elif ' ft ' in lower:
+            artists = [a.strip() for a in re.split(' ft ', artist_string, flags=re.IGNORECASE) if a.strip()]
+        
+        if artists and any(', ' in a for a in artists):
+            split_again = []
+            for a in artists:
+                if ', ' in a:
+                    split_again.extend([s.strip() for s in a.split(', ') if s.strip()])
+                else:
+                    split_again.append(a)
+            artists = split_again
+    elif ' / ' in artist_string:
+        artists = artist_string.split(' / ')
+    elif ' + ' in artist_string:
+        artists = artist_string.split(' + ')
+    elif ' · ' in artist_string:
+        artists = artist_string.split(' · ')
+    elif ' ∙ ' in artist_string:
+        artists = artist_string.split(' ∙ ')
+    elif ' feat. ' in lower:
+        artists = [a.strip() for a in re.split(' feat\\. ', artist_string, flags=re.IGNORECASE) if a.strip()]
+    elif ' feat ' in lower:
+        artists = [a.strip() for a in re.split(' feat ', artist_string, flags=re.IGNORECASE) if a.strip()]
+    elif ' featuring ' in lower:
+        artists = [a.strip() for a in re.split(' featuring ', artist_string, flags=re.IGNORECASE) if a.strip()]
+    elif ' ft. ' in lower:
+        artists = [a.strip() for a in re.split(' ft\\. ', artist_string, flags=re.IGNORECASE) if a.strip()]
+    elif ' ft ' in lower:
+        artists = [a.strip() for a in re.split(' ft ', artist_string, flags=re.IGNORECASE) if a.strip()]
+    elif ' - ' in artist_string:
+        artists = [a.strip() for a in artist_string.split(' - ') if a.strip()]
+    
+    if not artists:
+        if ', ' in artist_string:
+            artists = [a.strip() for a in artist_string.split(', ') if a.strip()]
+        else:
+            artists = [artist_string]
+    
+    final_artists = []
+    for artist in artists:
+        lower_artist = artist.lower()
+        if ' feat. ' in lower_artist:
+            sub_artists = [a.strip() for a in re.split(' feat\\. ', artist, flags=re.IGNORECASE) if a.strip()]
+            final_artists.extend(sub_artists)
+        elif ' feat ' in lower_artist:
+            sub_artists = [a.strip() for a in re.split(' feat ', artist, flags=re.IGNORECASE) if a.strip()]
+            final_artists.extend(sub_artists)
+        elif ' featuring ' in lower_artist:
+            sub_artists = [a.strip() for a in re.split(' featuring ', artist, flags=re.IGNORECASE) if a.strip()]
+            final_artists.extend(sub_artists)
+        elif ' ft. ' in lower_artist:
+            sub_artists = [a.strip() for a in re.split(' ft\\. ', artist, flags=re.IGNORECASE) if a.strip()]
+            final_artists.extend(sub_artists)
+        elif ' ft ' in lower_artist:
+            sub_artists = [a.strip() for a in re.split(' ft ', artist, flags=re.IGNORECASE) if a.strip()]
+            final_artists.extend(sub_artists)
+        else:
+            final_artists.append(artist)
+    
+    merged_artists = []
+    i = 0
+    while i < len(final_artists):
+        current = final_artists[i]
+        if i > 0 and re.search(r'^,? ?(jr\.?|sr\.?)$', current, re.IGNORECASE):
+            merged = merged_artists[-1] + ' ' + current.replace(',', '').strip()
+            merged_artists[-1] = merged.strip()
+        else:
+            merged_artists.append(current)
+        i += 1
+    
+    return [a.strip() for a in merged_artists if a.strip()]
@@ -0,0 +1,80 @@
+import re
+import pytest
+import sys
+sys.path.insert(0, '/Users/hanzonian/Documents/personal/music-library')
+
+from app.models import db
+from app.routes.admin import get_dashboard_stats, dashboard_cache
+
+
+class FakeCursor:
+    """A cursor over a collection of `size` albums/artists.
+    
+    Ungrouped aggregates return their one row of counts; any other query returns
+    a row per item, the way Postgres would.
+    """
+    def __init__(self, sql, size):
+        select = sql.split(' FROM ')[0]
+        columns = re.findall(r' AS "(\w+)"', select) or ['id']
+        self.description = [(name,) for name in columns]
+        if 'COUNT(' in select and 'GROUP BY' not in sql:
+            self.rows = [tuple(size for _ in columns)]
+        else:
+            self.rows = [tuple(i for _ in columns) for i in range(size)]
+    
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+    
+    def fetchmany(self, size=1):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+    
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+    
+    def __iter__(self):
+        return iter(self.fetchall())
+    
+    def close(self):
+        pass
+
+
+class TestDashboardQueryCount:
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        dashboard_cache.invalidate()
+        yield
+        dashboard_cache.invalidate()
+    
+    @pytest.mark.parametrize("collection_size", [10, 100000])
+    def test_fixed_number_of_queries(self, mocker, collection_size):
+        execute = mocker.patch.object(
+            db, 'execute_sql', side_effect=lambda sql, params=None: FakeCursor(sql, collection_size)
+        )
+        
+        stats, artist_stats = get_dashboard_stats()
+        
+        assert execute.call_count == 2
+        assert stats['collection_count'] == collection_size
+        assert artist_stats['total'] == collection_size
+    
+    def test_query_count_independent_of_collection_size(self, mocker):
+        calls = []
+        for collection_size in (10, 100000):
+            dashboard_cache.invalidate()
+            execute = mocker.patch.object(
+                db, 'execute_sql', side_effect=lambda sql, params=None, size=collection_size: FakeCursor(sql, size)
+            )
+            get_dashboard_stats()
+            calls.append(execute.call_count)
+        
+        assert calls[0] == calls[1]
+    
+    def test_cached_between_requests(self, mocker):
+        execute = mocker.patch.object(db, 'execute_sql', side_effect=lambda sql, params=None: FakeCursor(sql, 1))
+        
+        get_dashboard_stats()
+        get_dashboard_stats()
+        
+        assert execute.call_count == 2
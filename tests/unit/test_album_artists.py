@@ -0,0 +1,65 @@
+import pytest
+import sys
+sys.path.insert(0, '/Users/hanzonian/Documents/personal/music-library')
+
+from app.services.album_artists import sync_album_artists, remove_album
+
+
+class TestArtistSummaryMaintenance:
+    @pytest.fixture(autouse=True)
+    def no_db(self, mocker):
+        mocker.patch('app.services.album_artists.db')
+        mocker.patch('app.services.album_artists.AlbumArtist')
+        self.refresh = mocker.patch('app.services.album_artists.refresh_artist_summaries')
+        self.previous = mocker.patch('app.services.album_artists.album_artist_names')
+    
+    def test_sync_refreshes_previous_and_new_credits(self, mocker):
+        self.previous.return_value = {'Old Name'}
+        album = mocker.Mock(id=7, artist='Miles Davis, John Coltrane')
+        
+        sync_album_artists(album)
+        
+        self.refresh.assert_called_once_with({'Old Name', 'Miles Davis', 'John Coltrane'})
+    
+    def test_remove_album_refreshes_its_credits(self, mocker):
+        self.previous.return_value = {'Miles Davis'}
+        album = mocker.Mock(id=7, discogs_id=None)
+        
+        remove_album(album)
+        
+        album.delete_instance.assert_called_once()
+        self.refresh.assert_called_once_with({'Miles Davis'})
+    
+    def test_remove_album_forgets_import_fingerprint(self, mocker):
+        self.previous.return_value = set()
+        mock_delete = mocker.patch('app.services.album_artists.ImportFingerprint.delete')
+        album = mocker.Mock(id=7, discogs_id='123', is_wanted=False)
+        
+        remove_album(album)
+        
+        mock_delete.return_value.where.return_value.execute.assert_called_once()
+
+
+class TestSaveAlbum:
+    @pytest.fixture(autouse=True)
+    def no_db(self, mocker):
+        mocker.patch('app.routes.albums.db')
+        mocker.patch('app.routes.albums.sync_album_artists')
+        self.forget = mocker.patch('app.routes.albums.forget_fingerprint')
+    
+    def test_moving_to_collection_forgets_wishlist_fingerprint(self, mocker):
+        from app.routes.albums import save_album
+        album = mocker.Mock(discogs_id='123', is_wanted=False)
+        
+        save_album(album, was_wanted=True)
+        
+        album.save.assert_called_once()
+        self.forget.assert_called_once_with('123', True)
+    
+    def test_same_list_keeps_fingerprint(self, mocker):
+        from app.routes.albums import save_album
+        album = mocker.Mock(discogs_id='123', is_wanted=False)
+        
+        save_album(album, was_wanted=False)
+        
+        self.forget.assert_not_called()
@@ -2,7 +2,9 @@ import pytest
 import sys
 sys.path.insert(0, '/Users/hanzonian/Documents/personal/music-library')
 
-from app.utils.artists import split_artists, strip_discogs_suffix, join_artists, sanitize_filename
+import random
+from app.utils.artists import split_artists, split_artists_many, strip_discogs_suffix, join_artists, sanitize_filename
+from split_artists_reference import legacy_split_artists
 
 
 class TestSanitizeFilename:
@@ -103,6 +105,31 @@ class TestSplitArtists:
     
     def test_whitespace_only(self):
         assert split_artists("   ") == []
+    
+    def test_result_is_a_fresh_list(self):
+        split_artists("Tool / Björk").append("Mutated")
+        assert split_artists("Tool / Björk") == ["Tool", "Björk"]
+
+
+class TestSplitArtistsMatchesOriginal:
+    PIECES = [
+        "Miles Davis", "Björk", "Tool", "Harry Connick", "x", "", " ", ",", "\n", "-", "/", "ı", "İ",
+        " / ", " + ", " · ", " ∙ ", " - ", ", ", " & ", " feat. ", " Feat. ", " FEAT ", " feat ",
+        " featuring ", " Featurıng ", " ft. ", " Ft ", " ft ", " ft", "feat ", ", Jr.", " Jr", " sr.", ", jr",
+    ]
+    
+    def test_random_credits(self):
+        rng = random.Random(1234)
+        for _ in range(20000):
+            credit = "".join(rng.choice(self.PIECES) for _ in range(rng.randint(1, 7)))
+            assert split_artists(credit) == legacy_split_artists(credit), credit
+
+
+class TestSplitArtistsMany:
+    def test_keyed_by_distinct_string(self):
+        result = split_artists_many(["Tool", "Tool / Björk", "Tool"])
+        
+        assert result == {"Tool": ["Tool"], "Tool / Björk": ["Tool", "Björk"]}
 
 
 class TestStripDiscogsSuffix:
@@ -148,11 +175,17 @@ class TestJoinArtists:
 
 
 class TestApplyArtistMapping:
+    @pytest.fixture(autouse=True)
+    def fresh_resolver(self):
+        from app.utils.artists import artist_mappings
+        artist_mappings.invalidate()
+        yield
+        artist_mappings.invalidate()
+    
     def test_single_artist_no_mapping(self, mocker):
         from app.utils.artists import apply_artist_mapping
         
-        mock_select = mocker.patch('app.models.ArtistMapping.select')
-        mock_select.return_value.where.return_value.first.return_value = None
+        mocker.patch('app.utils.artists.load_artist_mappings', return_value=[])
         
         result = apply_artist_mapping("Tool")
         assert result == "Tool"
@@ -160,22 +193,27 @@ class TestApplyArtistMapping:
     def test_artist_with_discogs_suffix_creates_mapping(self, mocker):
         from app.utils.artists import apply_artist_mapping
         
-        mock_select = mocker.patch('app.models.ArtistMapping.select')
-        mock_select.return_value.where.return_value.first.return_value = None
+        mocker.patch('app.utils.artists.load_artist_mappings', return_value=[])
         mock_create = mocker.patch('app.models.ArtistMapping.create')
         
         result = apply_artist_mapping("Tool (2)")
         assert result == "Tool"
         mock_create.assert_called_once_with(original_name="Tool (2)", new_name="Tool")
     
-    def test_artist_mapping_from_db(self, mocker):
+    def test_existing_suffix_mapping_not_recreated(self, mocker):
         from app.utils.artists import apply_artist_mapping
         
-        mock_mapping = mocker.MagicMock()
-        mock_mapping.new_name = "The Tool"
+        mocker.patch('app.utils.artists.load_artist_mappings', return_value=[("Tool (2)", "Tool")])
+        mock_create = mocker.patch('app.models.ArtistMapping.create')
         
-        mock_select = mocker.patch('app.models.ArtistMapping.select')
-        mock_select.return_value.where.return_value.first.return_value = mock_mapping
+        result = apply_artist_mapping("Tool (2)")
+        assert result == "Tool"
+        mock_create.assert_not_called()
+    
+    def test_artist_mapping_from_db(self, mocker):
+        from app.utils.artists import apply_artist_mapping
+        
+        mocker.patch('app.utils.artists.load_artist_mappings', return_value=[("Tool", "The Tool")])
         
         result = apply_artist_mapping("Tool")
         assert result == "The Tool"
@@ -183,8 +221,7 @@ class TestApplyArtistMapping:
     def test_multiple_artists_split_and_map(self, mocker):
         from app.utils.artists import apply_artist_mapping
         
-        mock_select = mocker.patch('app.models.ArtistMapping.select')
-        mock_select.return_value.where.return_value.first.return_value = None
+        mocker.patch('app.utils.artists.load_artist_mappings', return_value=[])
         
         result = apply_artist_mapping("John Lennon, Paul McCartney")
         assert result == "John Lennon, Paul McCartney"
@@ -192,11 +229,7 @@ class TestApplyArtistMapping:
     def test_combined_suffix_and_db_mapping(self, mocker):
         from app.utils.artists import apply_artist_mapping
         
-        mock_mapping = mocker.MagicMock()
-        mock_mapping.new_name = "The Beatles"
-        
-        mock_select = mocker.patch('app.models.ArtistMapping.select')
-        mock_select.return_value.where.return_value.first.return_value = mock_mapping
+        mocker.patch('app.utils.artists.load_artist_mappings', return_value=[("The Beatles (2)", "The Beatles")])
         
         result = apply_artist_mapping("The Beatles (2)")
         assert result == "The Beatles"
@@ -204,8 +237,107 @@ class TestApplyArtistMapping:
     def test_slash_separated_artists(self, mocker):
         from app.utils.artists import apply_artist_mapping
         
-        mock_select = mocker.patch('app.models.ArtistMapping.select')
-        mock_select.return_value.where.return_value.first.return_value = None
+        mocker.patch('app.utils.artists.load_artist_mappings', return_value=[])
         
         result = apply_artist_mapping("John Lennon / Paul McCartney")
         assert result == "John Lennon, Paul McCartney"
+    
+    def test_mapping_chain_followed_to_the_end(self, mocker):
+        from app.utils.artists import apply_artist_mapping
+        
+        mocker.patch('app.utils.artists.load_artist_mappings', return_value=[("A", "B"), ("B", "C")])
+        
+        assert apply_artist_mapping("A") == "C"
+    
+    def test_mappings_loaded_once(self, mocker):
+        from app.utils.artists import apply_artist_mapping
+        
+        load = mocker.patch('app.utils.artists.load_artist_mappings', return_value=[("Tool", "The Tool")])
+        
+        for _ in range(5):
+            apply_artist_mapping("Tool, Opeth")
+        assert load.call_count == 1
+
+
+class TestArtistMappingResolver:
+    def test_original_follows_chain_backwards(self, mocker):
+        from app.utils.artists import ArtistMappingResolver
+        
+        mocker.patch('app.utils.artists.load_artist_mappings', return_value=[("A", "B"), ("B", "C")])
+        resolver = ArtistMappingResolver()
+        
+        assert resolver.original("C") == "A"
+        assert resolver.original("Unmapped") == "Unmapped"
+    
+    def test_cycles_terminate(self, mocker):
+        from app.utils.artists import ArtistMappingResolver
+        
+        mocker.patch('app.utils.artists.load_artist_mappings', return_value=[("A", "B"), ("B", "A")])
+        resolver = ArtistMappingResolver()
+        
+        assert resolver.resolve("A") == "B"
+        assert resolver.original("A") == "B"
+    
+    def test_add_updates_without_reload(self, mocker):
+        from app.utils.artists import ArtistMappingResolver
+        
+        load = mocker.patch('app.utils.artists.load_artist_mappings', return_value=[("A", "B")])
+        mocker.patch('app.models.ArtistMapping.create')
+        resolver = ArtistMappingResolver()
+        
+        assert resolver.resolve("A") == "B"
+        assert resolver.add("B", "C") is True
+        assert resolver.resolve("A") == "C"
+        assert resolver.original("C") == "A"
+        assert resolver.add("B", "C") is False
+        assert load.call_count == 1
+    
+    def test_invalidate_reloads(self, mocker):
+        from app.utils.artists import ArtistMappingResolver
+        
+        load = mocker.patch('app.utils.artists.load_artist_mappings', return_value=[("A", "B")])
+        resolver = ArtistMappingResolver()
+        
+        assert resolver.resolve("A") == "B"
+        load.return_value = [("A", "D")]
+        resolver.invalidate()
+        assert resolver.resolve("A") == "D"
+        assert load.call_count == 2
+    
+    def test_rolled_back_add_is_forgotten(self, mocker):
+        from app.models import db
+        from app.utils.artists import ArtistMappingResolver
+        
+        load = mocker.patch('app.utils.artists.load_artist_mappings', return_value=[])
+        mocker.patch('app.models.ArtistMapping.create')
+        mocker.patch.object(db, 'atomic', return_value=mocker.MagicMock(__exit__=mocker.Mock(return_value=False)))
+        resolver = ArtistMappingResolver()
+        
+        with pytest.raises(RuntimeError):
+            with resolver.atomic():
+                resolver.add("A", "B")
+                raise RuntimeError("rolled back")
+        
+        assert resolver.resolve("A") == "A"
+        assert resolver.add("A", "B") is True
+        assert load.call_count == 2
+    
+    def test_adds_match_full_reload(self, mocker):
+        from app.utils.artists import ArtistMappingResolver
+        
+        rng = random.Random(11)
+        names = [f"Artist {i}" for i in range(12)]
+        pairs = [(rng.choice(names), rng.choice(names)) for _ in range(60)]
+        load = mocker.patch('app.utils.artists.load_artist_mappings', return_value=[])
+        mocker.patch('app.models.ArtistMapping.create')
+        incremental = ArtistMappingResolver()
+        
+        created = []
+        for pair in pairs:
+            if incremental.add(*pair):
+                created.append(pair)
+            load.return_value = created
+            reloaded = ArtistMappingResolver()
+            for name in names:
+                assert incremental.resolve(name) == reloaded.resolve(name)
+                assert incremental.original(name) == reloaded.original(name)
@@ -0,0 +1,59 @@
+import pytest
+import sys
+sys.path.insert(0, '/Users/hanzonian/Documents/personal/music-library')
+
+from app.utils.cache import TTLCache, invalidate_album_caches
+
+
+class TestTTLCache:
+    def test_returns_cached_value_until_expiry(self, mocker):
+        clock = mocker.patch('app.utils.cache.time.monotonic', return_value=100.0)
+        cache = TTLCache(ttl=10, albums=False)
+        factory = mocker.Mock(side_effect=[1, 2])
+        
+        assert cache.get("stats", factory) == 1
+        clock.return_value = 109.0
+        assert cache.get("stats", factory) == 1
+        clock.return_value = 111.0
+        assert cache.get("stats", factory) == 2
+        assert factory.call_count == 2
+    
+    def test_invalidate_album_caches_clears_registered_caches(self, mocker):
+        cache = TTLCache(ttl=60)
+        other = TTLCache(ttl=60, albums=False)
+        factory = mocker.Mock(side_effect=[1, 2, 3, 4])
+        cache.get("stats", factory)
+        other.get("stats", factory)
+        
+        invalidate_album_caches()
+        
+        assert cache.get("stats", factory) == 3
+        assert other.get("stats", factory) == 2
+    
+    def test_value_computed_during_invalidation_is_not_stored(self, mocker):
+        cache = TTLCache(ttl=60, albums=False)
+        
+        def stale():
+            cache.invalidate()
+            return "stale"
+        
+        assert cache.get("stats", stale) == "stale"
+        assert cache.get("stats", lambda: "fresh") == "fresh"
+    
+    def test_write_in_another_process_expires_album_caches(self, mocker, album_generation):
+        cache = TTLCache(ttl=60)
+        local = TTLCache(ttl=60, albums=False)
+        factory = mocker.Mock(side_effect=[1, 2, 3])
+        cache.get("stats", factory)
+        local.get("stats", factory)
+        
+        # Another worker's write only bumps the shared generation
+        album_generation['value'] += 1
+        
+        assert cache.get("stats", factory) == 3
+        assert local.get("stats", factory) == 2
+    
+    def test_invalidate_album_caches_bumps_shared_generation(self, album_generation):
+        invalidate_album_caches()
+        
+        assert album_generation['value'] == 1
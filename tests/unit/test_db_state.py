@@ -0,0 +1,42 @@
+import asyncio
+import pytest
+import sys
+sys.path.insert(0, '/Users/hanzonian/Documents/personal/music-library')
+
+from app.models import db, new_db_state
+
+
+class TestContextConnectionState:
+    async def test_concurrent_tasks_get_separate_state(self):
+        seen = {}
+        
+        async def request(name):
+            new_db_state()
+            db._state.set_connection(name)
+            await asyncio.sleep(0.01)
+            seen[name] = db._state.conn
+        
+        await asyncio.gather(request("first"), request("second"))
+        
+        assert seen == {"first": "first", "second": "second"}
+    
+    async def test_threadpool_shares_request_state(self):
+        new_db_state()
+        db._state.set_connection("request-conn")
+        
+        conn = await asyncio.to_thread(lambda: db._state.conn)
+        
+        assert conn == "request-conn"
+    
+    async def test_connection_opened_in_threadpool_is_visible_to_request(self):
+        from fastapi.concurrency import run_in_threadpool
+        new_db_state()
+        
+        await run_in_threadpool(db._state.set_connection, "worker-conn")
+        
+        assert db._state.conn == "worker-conn"
+    
+    async def test_new_state_starts_closed(self):
+        new_db_state()
+        assert db.is_closed()
+        assert db._state.conn is None
@@ -3,9 +3,16 @@ import sys
 sys.path.insert(0, '/Users/hanzonian/Documents/personal/music-library')
 
 from app.services.import_csv import detect_artist_mappings
+from app.utils.artists import artist_mappings
 
 
 class TestDetectArtistMappings:
+    @pytest.fixture(autouse=True)
+    def fresh_resolver(self):
+        artist_mappings.invalidate()
+        yield
+        artist_mappings.invalidate()
+    
     def test_no_existing_albums_returns_empty(self, mocker):
         mock_album_select = mocker.patch('app.services.import_csv.Album.select')
         mock_album_select.return_value.where.return_value.first.return_value = None
@@ -38,9 +45,8 @@ class TestDetectArtistMappings:
         mock_album_select = mocker.patch('app.services.import_csv.Album.select')
         mock_album_select.return_value.where.return_value.first.return_value = mock_album
         
-        mock_mapping_select = mocker.patch('app.services.import_csv.ArtistMapping.select')
-        mock_mapping_select.return_value.where.return_value.first.return_value = None
-        mock_mapping_create = mocker.patch('app.services.import_csv.ArtistMapping.create')
+        mocker.patch('app.utils.artists.load_artist_mappings', return_value=[])
+        mock_mapping_create = mocker.patch('app.models.ArtistMapping.create')
         
         csv_content = b"Artist,Title,Format,Released,release_id\nTool (2),Undertow,CD,2023,123"
         
@@ -56,9 +62,7 @@ class TestDetectArtistMappings:
         mock_album_select = mocker.patch('app.services.import_csv.Album.select')
         mock_album_select.return_value.where.return_value.first.return_value = mock_album
         
-        mock_mapping = mocker.MagicMock()
-        mock_mapping_select = mocker.patch('app.services.import_csv.ArtistMapping.select')
-        mock_mapping_select.return_value.where.return_value.first.return_value = mock_mapping
+        mocker.patch('app.utils.artists.load_artist_mappings', return_value=[("Tool (2)", "Tool")])
         
         csv_content = b"Artist,Title,Format,Released,release_id\nTool (2),Undertow,CD,2023,123"
         
@@ -74,8 +78,7 @@ class TestDetectArtistMappings:
         mock_album_select = mocker.patch('app.services.import_csv.Album.select')
         mock_album_select.return_value.where.return_value.first.return_value = mock_album
         
-        mock_mapping_select = mocker.patch('app.services.import_csv.ArtistMapping.select')
-        mock_mapping_select.return_value.where.return_value.first.return_value = None
+        mocker.patch('app.utils.artists.load_artist_mappings', return_value=[])
         
         csv_content = b"Artist,Title,Format,Released,release_id\nJohn Lennon / Paul McCartney,Abbey Road,CD,2023,456"
         
@@ -0,0 +1,53 @@
+import pytest
+import sys
+sys.path.insert(0, '/Users/hanzonian/Documents/personal/music-library')
+
+from app.models import db
+from app.services.facets import parse_filters, filter_params, facet_counts
+
+
+class FakeCursor:
+    description = [('facet',), ('value',), ('count',)]
+    
+    def __init__(self, rows):
+        self.rows = list(reversed(rows))
+    
+    def fetchone(self):
+        return self.rows.pop() if self.rows else None
+    
+    def close(self):
+        pass
+
+
+class TestParseFilters:
+    def test_parses_all_facets(self):
+        filters = parse_filters(decade="1990s", year="1994", format="CD", genre=" Rock ", compilation="false")
+        assert filters == {'decade': 1990, 'year': 1994, 'format': 'CD', 'genre': 'rock', 'compilation': False}
+    
+    def test_ignores_invalid_values(self):
+        assert parse_filters(decade="nineties", year="abc", compilation="maybe", genre=" ") == {}
+    
+    def test_filter_params_round_trip(self):
+        filters = parse_filters(decade="1970s", compilation="true")
+        assert filter_params(filters) == {'decade': '1970s', 'compilation': 'true'}
+
+
+class TestFacetCounts:
+    def test_single_statement_for_all_facets(self, mocker):
+        rows = [
+            ('decade', '1990', 3), ('decade', '1970', 2), ('decade', None, 1),
+            ('year', '1994', 3), ('year', '1971', 2),
+            ('format', 'Vinyl', 2), ('format', 'CD', 3),
+            ('genre', 'rock', 4), ('genre', 'jazz', 4),
+            ('compilation', 'false', 5), ('compilation', 'true', 1),
+        ]
+        execute = mocker.patch.object(db, 'execute_sql', return_value=FakeCursor(rows))
+        
+        counts = facet_counts({'genre': 'rock'})
+        
+        assert execute.call_count == 1
+        assert counts['decade'] == [('1970s', 2), ('1990s', 3)]
+        assert counts['year'] == [('1971', 2), ('1994', 3)]
+        assert counts['format'] == [('CD', 3), ('Vinyl', 2)]
+        assert counts['genre'] == [('jazz', 4), ('rock', 4)]
+        assert counts['compilation'] == [(False, 5), (True, 1)]
@@ -2,7 +2,27 @@ import pytest
 import sys
 sys.path.insert(0, '/Users/hanzonian/Documents/personal/music-library')
 
-from app.services.import_csv import map_format, is_compilation_artist
+from contextlib import contextmanager
+from app.models import db
+from app.services.import_csv import map_format, is_compilation_artist, open_csv, record, discogs_year_row, copy_rows, stage_discogs_csv, new_import_results, normalized_rows, album_row, copy_discogs_csv, update_discogs_years
+from app.utils.artists import artist_mappings
+
+
+@contextmanager
+def fake_transaction():
+    # Marks the current connection state as inside a transaction without a database
+    db.push_transaction(object())
+    try:
+        yield
+    finally:
+        db.pop_transaction()
+
+
+@pytest.fixture
+def fake_database(mocker):
+    mocker.patch.object(db, 'atomic', side_effect=fake_transaction)
+    mocker.patch.object(db, 'execute_sql')
+    mocker.patch.object(db, 'cursor')
 
 
 class TestMapFormat:
@@ -106,3 +126,200 @@ class TestIsCompilationArtist:
     
     def test_movie_soundtrack(self):
         assert is_compilation_artist("Movie Soundtrack") == False
+
+
+class TestOpenCsv:
+    def test_utf8_with_bom(self):
+        rows = list(open_csv("Artist,Title\nBjörk,Début\n".encode('utf-8-sig')))
+        assert rows == [{'Artist': 'Björk', 'Title': 'Début'}]
+    
+    def test_latin1_file(self):
+        rows = list(open_csv("Artist,Title\nBjörk,Début\n".encode('latin-1')))
+        assert rows == [{'Artist': 'Björk', 'Title': 'Début'}]
+    
+    def test_latin1_bytes_after_sniffed_block(self):
+        content = b"Artist,Title\n" + b"Tool,Undertow\n" * 10000 + "Björk,Début\n".encode('latin-1')
+        rows = list(open_csv(content))
+        assert len(rows) == 10001
+        assert rows[-1] == {'Artist': 'Björk', 'Title': 'Début'}
+    
+    def test_reads_file_objects(self):
+        import tempfile
+        with tempfile.SpooledTemporaryFile(max_size=16) as upload:
+            upload.write(b"Artist,Title\nTool,Undertow\n")
+            upload.seek(0)
+            assert list(open_csv(upload)) == [{'Artist': 'Tool', 'Title': 'Undertow'}]
+
+
+class TestRecord:
+    def test_keeps_exact_count_but_bounded_details(self, mocker):
+        mocker.patch('app.services.import_csv.MAX_REPORTED_ROWS', 2)
+        results = {'skipped_missing': []}
+        
+        for row in range(5):
+            record(results, 'skipped_missing', {'row': row})
+        
+        assert results['skipped_missing_count'] == 5
+        assert results['skipped_missing'] == [{'row': 0}, {'row': 1}]
+
+
+class TestDiscogsYearRow:
+    def test_parses_release_year(self):
+        row = {'Artist': 'Tool', 'Title': 'Undertow', 'Format': 'CD, Album', 'Released': '1993-04-06'}
+        assert discogs_year_row(row) == ('Tool', 'Undertow', 'CD', 1993)
+    
+    def test_missing_format_is_none(self):
+        row = {'Artist': 'Tool', 'Title': 'Undertow', 'Format': '', 'Released': '1993'}
+        assert discogs_year_row(row) == ('Tool', 'Undertow', None, 1993)
+    
+    def test_skips_rows_without_year(self):
+        assert discogs_year_row({'Artist': 'Tool', 'Title': 'Undertow', 'Released': ''}) is None
+        assert discogs_year_row({'Artist': 'Tool', 'Title': 'Undertow', 'Released': 'unknown'}) is None
+    
+    def test_skips_rows_without_artist_or_title(self):
+        assert discogs_year_row({'Artist': '', 'Title': 'Undertow', 'Released': '1993'}) is None
+        assert discogs_year_row({'Artist': 'Tool', 'Title': '', 'Released': '1993'}) is None
+
+
+class TestCopyRows:
+    def test_copies_csv_with_nulls_and_quoted_strings(self, mocker):
+        cursor = mocker.Mock()
+        
+        copy_rows(cursor, 'staging', ('row_num', 'artist', 'physical_format'), [(2, 'Tool, "The"', None), (3, '', 'CD')])
+        
+        statement, buffer = cursor.copy_expert.call_args[0]
+        assert statement == "COPY staging (row_num, artist, physical_format) FROM STDIN WITH (FORMAT csv)"
+        assert buffer.read() == '2,"Tool, ""The""",\n3,"","CD"\n'
+    
+    def test_booleans_written_as_postgres_literals(self, mocker):
+        cursor = mocker.Mock()
+        
+        copy_rows(cursor, 'staging', ('flag',), [(True,), (False,)])
+        
+        assert cursor.copy_expert.call_args[0][1].read() == 'true\nfalse\n'
+
+
+class TestStageDiscogsCsv:
+    @pytest.fixture(autouse=True)
+    def no_database(self, mocker):
+        mocker.patch('app.utils.artists.load_artist_mappings', return_value=[])
+        mocker.patch('app.models.ArtistMapping.create')
+        mocker.patch('app.services.import_csv.load_discogs_artists', return_value={})
+        mocker.patch('app.services.import_csv.load_fingerprints', return_value={})
+        artist_mappings.invalidate()
+        yield
+        artist_mappings.invalidate()
+    
+    def test_stages_normalized_rows(self, mocker):
+        mock_copy = mocker.patch('app.services.import_csv.copy_rows')
+        results = new_import_results()
+        csv_content = b"""Artist,Title,Format,Released,release_id,Notes
+Tool (2),Undertow,CD,1993-04-06,123,
+Various,Hits,2xLP,,456,Gatefold"""
+        
+        stage_discogs_csv(None, csv_content, False, results)
+        
+        table, columns, rows = mock_copy.call_args[0][1:]
+        assert table == 'album_import'
+        assert columns[0] == 'row_num'
+        assert rows == [
+            (2, 'Undertow', 'Tool', 1993, '1993-04-06', 'CD', '123', False, None),
+            (3, 'Hits', 'Various', None, None, 'Vinyl', '456', True, 'Gatefold'),
+        ]
+    
+    def test_missing_rows_reported_not_staged(self, mocker):
+        mock_copy = mocker.patch('app.services.import_csv.copy_rows')
+        results = new_import_results()
+        csv_content = b"Artist,Title,Format,Released,release_id\n,Undertow,CD,1993,123"
+        
+        stage_discogs_csv(None, csv_content, False, results)
+        
+        mock_copy.assert_not_called()
+        assert results['skipped_missing_count'] == 1
+
+
+class TestCopyDiscogsCsv:
+    def test_progress_written_outside_transaction(self, mocker, fake_database):
+        mocker.patch('app.services.import_csv.save_fingerprints')
+        seen = []
+        
+        def stage(cursor, csv_file, is_wanted, results, progress, workers):
+            seen.append(('staging', db.in_transaction()))
+            progress(1000)
+            return {}
+        mocker.patch('app.services.import_csv.stage_discogs_csv', side_effect=stage)
+        
+        copy_discogs_csv(b"Artist,Title\n", progress=lambda count: seen.append((count, db.in_transaction())))
+        
+        assert seen == [('staging', True), (1000, False)]
+    
+    def test_only_written_rows_fingerprinted(self, mocker, fake_database):
+        save = mocker.patch('app.services.import_csv.save_fingerprints')
+        mocker.patch('app.services.import_csv.stage_discogs_csv', return_value={'123': 'new', '456': 'changed'})
+        
+        def execute_sql(sql, params=None):
+            return [('123',)] if 'SELECT DISTINCT discogs_id' in sql else mocker.MagicMock()
+        db.execute_sql.side_effect = execute_sql
+        
+        copy_discogs_csv(b"Artist,Title\n")
+        
+        assert save.call_args[0][0] == {'123': 'new'}
+
+
+class TestUpdateDiscogsYears:
+    def test_progress_written_outside_transaction(self, mocker, fake_database):
+        mocker.patch('app.services.import_csv.copy_rows')
+        seen = []
+        
+        update_discogs_years(b"Artist,Title,Released\nTool,Undertow,1993\n",
+                             progress=lambda count: seen.append((count, db.in_transaction())))
+        
+        assert seen == [(1, False)]
+
+
+class TestNormalizedRows:
+    CSV = b"""Artist,Title,Format,Released,release_id,Notes
+Tool,Undertow,CD,1993-04-06,123,
+
+Various,Hits,2xLP,,456,Gatefold
+Tool,Opiate
+"""
+    
+    def test_rows_numbered_like_dict_reader(self):
+        rows = list(normalized_rows(self.CSV, chunk_size=2))
+        
+        assert [row_num for row_num, _, _ in rows] == [2, 3, 4]
+        assert rows[0][1]['year_discogs_release'] == 1993
+        assert rows[1][1]['is_compilation'] is True
+        assert rows[1][1]['physical_format'] == 'Vinyl'
+    
+    def test_short_row_reported_as_error(self):
+        row_num, fields, error = list(normalized_rows(self.CSV))[2]
+        
+        assert (row_num, fields) == (4, None)
+        assert "strip" in error
+    
+    def test_process_pool_keeps_file_order(self):
+        content = b"Artist,Title,release_id\n" + b"".join(
+            f"Artist {i},Title {i},{i}\n".encode() for i in range(50)
+        )
+        
+        assert list(normalized_rows(content, workers=2, chunk_size=7)) == list(normalized_rows(content))
+
+
+class TestAlbumRow:
+    @pytest.fixture(autouse=True)
+    def no_database(self, mocker):
+        mocker.patch('app.utils.artists.load_artist_mappings', return_value=[('VA', 'Various')])
+        mocker.patch('app.models.ArtistMapping.create')
+        artist_mappings.invalidate()
+        yield
+        artist_mappings.invalidate()
+    
+    def test_mapped_artist_rechecked_for_compilation(self):
+        fields = next(normalized_rows(b"Artist,Title\nVA (2),Hits\n"))[1]
+        
+        album = album_row(fields, is_wanted=False)
+        
+        assert album['artist'] == 'Various'
+        assert album['is_compilation'] is True
@@ -0,0 +1,197 @@
+import pytest
+import sys
+sys.path.insert(0, '/Users/hanzonian/Documents/personal/music-library')
+
+import io
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from app.services.import_jobs import (job_progress, run_job, submit_import, finish_job, report_progress, UploadReader,
+                                      JobReclaimed, IMPORT_KINDS)
+from app.models import ImportJob
+from app.services.import_csv import open_csv
+
+UPLOAD = b"Artist,Title\nTool,Undertow\nTool,Lateralus\n"
+
+
+JOB_FIELDS = {
+    'kind': 'collection', 'filename': 'collection.csv', 'rows_processed': 0, 'rows_total': None,
+    'results': None, 'bytes_processed': 0, 'bytes_total': len(UPLOAD),
+}
+
+
+class TestJobProgress:
+    def test_pending_job_has_no_rate(self, make_job):
+        progress = job_progress(make_job(status='pending'))
+        
+        assert progress['rows_per_second'] is None
+        assert progress['eta_seconds'] is None
+    
+    def test_running_job_rate_and_eta(self, make_job):
+        started = datetime(2024, 1, 1, 12, 0, 0)
+        job = make_job(rows_processed=500, bytes_processed=25000, bytes_total=75000,
+                       started_at=started, heartbeat_at=started + timedelta(seconds=10))
+        
+        progress = job_progress(job)
+        
+        assert progress['rows_per_second'] == 50.0
+        assert progress['percent'] == 33
+        assert progress['eta_seconds'] == 20
+    
+    def test_finished_job_has_no_eta(self, make_job):
+        started = datetime(2024, 1, 1, 12, 0, 0)
+        job = make_job(status='done', rows_processed=1000, rows_total=1000, started_at=started,
+                       heartbeat_at=started + timedelta(seconds=5), finished_at=started + timedelta(seconds=20))
+        
+        progress = job_progress(job)
+        
+        assert progress['rows_per_second'] == 50.0
+        assert progress['eta_seconds'] is None
+
+
+def stored_chunks(mocker, data: bytes, size: int):
+    """Serve `data` from UploadReader as chunks of `size` bytes."""
+    chunks = [data[i:i + size] for i in range(0, len(data), size)]
+    select = mocker.patch('app.services.import_jobs.ImportJobChunk.select')
+    select.return_value.where.return_value.scalar.side_effect = chunks + [None]
+    return select
+
+
+class TestUploadReader:
+    def test_reads_chunks_in_order(self, mocker):
+        stored_chunks(mocker, UPLOAD, 5)
+        upload = UploadReader(1, len(UPLOAD))
+        
+        rows = list(open_csv(upload))
+        
+        assert [row['Title'] for row in rows] == ['Undertow', 'Lateralus']
+        assert upload.position == len(UPLOAD)
+    
+    def test_upload_deleted_midway_is_not_read_as_end_of_file(self, mocker):
+        stored_chunks(mocker, UPLOAD[:10], 5)
+        upload = UploadReader(1, len(UPLOAD))
+        
+        with pytest.raises(JobReclaimed):
+            upload.read()
+
+
+class TestRunJob:
+    @pytest.fixture(autouse=True)
+    def no_upload(self, mocker):
+        mocker.patch('app.services.import_jobs.estimate_rows', return_value=2)
+        mocker.patch('app.services.import_jobs.db.atomic')
+        return mocker.patch('app.services.import_jobs.delete_upload')
+    
+    def test_success_stores_results(self, mocker, make_job, no_upload):
+        mock_update = mocker.patch('app.services.import_jobs.ImportJob.update')
+        mocker.patch('app.services.import_jobs.report_progress')
+        
+        def runner(upload, rows_estimate, progress):
+            progress(2)
+            return {'imported': 2}
+        mocker.patch.dict(IMPORT_KINDS, {'collection': runner})
+        
+        run_job(make_job())
+        
+        final = mock_update.call_args_list[-1][1]
+        assert final['status'] == 'done'
+        assert final['results'] == {'imported': 2}
+        assert final['rows_processed'] == 2
+        assert final['rows_total'] == 2
+        assert final['bytes_processed'] == len(UPLOAD)
+        no_upload.assert_called_once_with(1)
+    
+    def test_file_parsed_once(self, mocker, make_job):
+        mocker.patch('app.services.import_jobs.ImportJob.update')
+        mocker.patch('app.services.import_jobs.report_progress')
+        select = stored_chunks(mocker, UPLOAD, 1024)
+        mocker.patch.dict(IMPORT_KINDS, {'collection': lambda upload, rows_estimate, progress: list(open_csv(upload))})
+        
+        run_job(make_job())
+        
+        # The one chunk, then the empty read that ends the file
+        assert select.return_value.where.return_value.scalar.call_count == 2
+    
+    def test_failure_records_error(self, mocker, make_job, no_upload):
+        mock_update = mocker.patch('app.services.import_jobs.ImportJob.update')
+        mocker.patch.dict(IMPORT_KINDS, {'collection': mocker.Mock(side_effect=ValueError("bad file"))})
+        
+        run_job(make_job())
+        
+        final = mock_update.call_args_list[-1][1]
+        assert final['status'] == 'failed'
+        assert final['error'] == 'bad file'
+        no_upload.assert_called_once_with(1)
+    
+    def test_progress_reported_for_job(self, mocker, make_job):
+        mocker.patch('app.services.import_jobs.ImportJob.update')
+        mock_report = mocker.patch('app.services.import_jobs.report_progress')
+        
+        def runner(upload, rows_estimate, progress):
+            progress(500)
+            return {}
+        mocker.patch.dict(IMPORT_KINDS, {'collection': runner})
+        
+        job = make_job(id=7)
+        run_job(job)
+        
+        mock_report.assert_called_once_with(job, 500, 0)
+
+
+class TestReclaimedJob:
+    def test_old_worker_stops_without_touching_the_job(self, mocker, make_job):
+        mocker.patch('app.services.import_jobs.estimate_rows', return_value=2)
+        mocker.patch('app.services.import_jobs.report_progress', side_effect=JobReclaimed("claimed"))
+        update = mocker.patch('app.services.import_jobs.ImportJob.update')
+        delete = mocker.patch('app.services.import_jobs.delete_upload')
+        
+        def runner(upload, rows_estimate, progress):
+            progress(500)
+            return {'imported': 500}
+        mocker.patch.dict(IMPORT_KINDS, {'collection': runner})
+        
+        run_job(make_job())
+        
+        update.assert_not_called()
+        delete.assert_not_called()
+    
+    def test_progress_rejected_once_token_changed(self, mocker, make_job):
+        update = mocker.patch('app.services.import_jobs.ImportJob.update')
+        update.return_value.where.return_value.execute.return_value = 0
+        
+        with pytest.raises(JobReclaimed):
+            report_progress(make_job(), 500, 1024)
+        
+        guard = update.return_value.where.call_args[0][0]
+        assert 'run-1' in ImportJob.select().where(guard).sql()[1]
+    
+    def test_final_status_and_upload_left_to_new_owner(self, mocker, make_job):
+        mocker.patch('app.services.import_jobs.db.atomic')
+        update = mocker.patch('app.services.import_jobs.ImportJob.update')
+        update.return_value.where.return_value.execute.return_value = 0
+        delete = mocker.patch('app.services.import_jobs.delete_upload')
+        
+        finish_job(make_job(), status='done', results={})
+        
+        guard = update.return_value.where.call_args[0][0]
+        assert 'run-1' in ImportJob.select().where(guard).sql()[1]
+        delete.assert_not_called()
+
+
+class TestSubmitImport:
+    def test_unknown_kind_rejected(self):
+        with pytest.raises(ValueError):
+            submit_import('unknown', 'file.csv', io.BytesIO(b''))
+    
+    def test_upload_stored_in_chunks(self, mocker):
+        mocker.patch('app.services.import_jobs.db.atomic')
+        mocker.patch('app.services.import_jobs.CHUNK_SIZE', 10)
+        job = SimpleNamespace(id=3, bytes_total=0, save=mocker.Mock())
+        mocker.patch('app.services.import_jobs.ImportJob.create', return_value=job)
+        create_chunk = mocker.patch('app.services.import_jobs.ImportJobChunk.create')
+        
+        submit_import('collection', 'collection.csv', io.BytesIO(UPLOAD))
+        
+        chunks = [call.kwargs['data'] for call in create_chunk.call_args_list]
+        assert b''.join(chunks) == UPLOAD
+        assert max(len(chunk) for chunk in chunks) == 10
+        assert job.bytes_total == len(UPLOAD)
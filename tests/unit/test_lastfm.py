@@ -0,0 +1,140 @@
+import pytest
+import sys
+sys.path.insert(0, '/Users/hanzonian/Documents/personal/music-library')
+
+import asyncio
+import httpx
+from app.services import lastfm
+from types import SimpleNamespace
+from app.services.lastfm import scrape_many, get_artist_top_tags, scrape_album, scrape_artist
+from app.services.http_client import http_client, close_http_client
+
+
+class TestScrapeMany:
+    @pytest.fixture(autouse=True)
+    def no_database(self, mocker):
+        mocker.patch('app.services.lastfm.new_db_state')
+        mocker.patch('app.services.lastfm.close_db')
+    
+    async def test_results_in_item_order(self):
+        async def scrape(item):
+            await asyncio.sleep(0.01 * (5 - item))
+            return {'updated': item % 2 == 0}
+        
+        results = await scrape_many(list(range(5)), scrape)
+        
+        assert [r['updated'] for r in results] == [True, False, True, False, True]
+    
+    async def test_concurrency_is_bounded(self):
+        running = []
+        peak = []
+        
+        async def scrape(item):
+            running.append(item)
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            running.remove(item)
+            return {'updated': True}
+        
+        await scrape_many(list(range(10)), scrape, concurrency=3)
+        
+        assert max(peak) == 3
+    
+    async def test_failed_item_gets_none(self):
+        async def scrape(item):
+            if item == 'bad':
+                raise RuntimeError("boom")
+            return {'updated': True}
+        
+        results = await scrape_many(['good', 'bad'], scrape)
+        
+        assert results == [{'updated': True}, None]
+    
+    async def test_each_item_gets_its_own_connection(self, mocker):
+        async def scrape(item):
+            return {}
+        
+        await scrape_many(['a', 'b'], scrape)
+        
+        assert lastfm.new_db_state.call_count == 2
+        assert lastfm.close_db.call_count == 2
+
+
+class TestSharedHttpClient:
+    @pytest.fixture(autouse=True)
+    def fresh_client(self, mocker):
+        mocker.patch('app.services.http_client._client', None)
+    
+    async def test_client_is_shared(self):
+        assert http_client() is http_client()
+        await close_http_client()
+    
+    async def test_new_client_after_close(self):
+        first = http_client()
+        
+        await close_http_client()
+        
+        assert first.is_closed
+        assert http_client() is not first
+        await close_http_client()
+    
+    async def test_injected_client_used_for_requests(self, mocker):
+        mocker.patch('app.services.lastfm.LASTFM_API_KEY', 'key')
+        mocker.patch('app.services.lastfm.LASTFM_CACHE_MAX_MB', 0)
+        requests = []
+        
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(200, json={'toptags': {'tag': [{'name': 'Metal'}, {'name': 'Prog'}]}})
+        
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            tags = await get_artist_top_tags('Tool', client)
+        
+        assert tags == ['Metal', 'Prog']
+        assert requests[0].url.params['method'] == 'artist.gettoptags'
+
+
+class TestScrapeFailures:
+    @pytest.fixture(autouse=True)
+    def no_waiting(self, mocker):
+        mocker.patch('app.services.lastfm.LASTFM_API_KEY', 'key')
+        mocker.patch('app.services.lastfm.LASTFM_CACHE_MAX_MB', 0)
+        mocker.patch('app.services.lastfm.lastfm_limiter.acquire')
+        mocker.patch('app.services.lastfm.asyncio.sleep')
+        mocker.patch('app.services.lastfm.apply_artist_mapping', side_effect=lambda name: name)
+    
+    def client(self, handler):
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    
+    def album(self):
+        return SimpleNamespace(id=1, artist='Tool', title='Undertow', cover_image_path=None, year=None, genres=[])
+    
+    async def test_network_failure_marks_album_failed(self):
+        def handler(request):
+            raise httpx.ConnectError("connection refused", request=request)
+        
+        async with self.client(handler) as client:
+            result = await scrape_album(self.album(), client)
+        
+        assert result['failed'] is True
+        assert result['updated'] is False
+    
+    async def test_server_errors_mark_artist_failed(self):
+        async with self.client(lambda request: httpx.Response(503)) as client:
+            result = await scrape_artist('Tool', client)
+        
+        assert result['failed'] is True
+    
+    async def test_not_found_is_a_miss(self):
+        async with self.client(lambda request: httpx.Response(404)) as client:
+            result = await scrape_album(self.album(), client)
+        
+        assert result['failed'] is False
+        assert result['updated'] is False
+    
+    async def test_no_api_key_marks_artist_failed(self, mocker):
+        mocker.patch('app.services.lastfm.LASTFM_API_KEY', '')
+        
+        result = await scrape_artist('Tool')
+        
+        assert result['failed'] is True
@@ -0,0 +1,19 @@
+import pytest
+import sys
+sys.path.insert(0, '/Users/hanzonian/Documents/personal/music-library')
+
+from app.migrations import MIGRATIONS
+
+
+class TestMigrations:
+    def test_versions_are_unique(self):
+        versions = [version for version, _, _ in MIGRATIONS]
+        assert len(versions) == len(set(versions))
+    
+    def test_versions_are_contiguous(self):
+        versions = sorted(version for version, _, _ in MIGRATIONS)
+        assert versions == list(range(1, len(versions) + 1))
+    
+    def test_names_are_unique(self):
+        names = [name for _, name, _ in MIGRATIONS]
+        assert len(names) == len(set(names))
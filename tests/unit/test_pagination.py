@@ -0,0 +1,75 @@
+import pytest
+import sys
+sys.path.insert(0, '/Users/hanzonian/Documents/personal/music-library')
+
+from app.models import Album, album_year_sort_key
+from app.utils.pagination import encode_cursor, decode_cursor, clamp_page_size, sort_key_type, total_count, count_cache, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+
+class TestCursor:
+    def test_round_trip_string_key(self):
+        assert decode_cursor(encode_cursor("Undertow", 42)) == ("Undertow", 42)
+    
+    def test_round_trip_int_key(self):
+        assert decode_cursor(encode_cursor(1993, 7)) == (1993, 7)
+    
+    def test_round_trip_unicode_key(self):
+        assert decode_cursor(encode_cursor("Camarón", 3)) == ("Camarón", 3)
+    
+    def test_cursor_is_url_safe(self):
+        cursor = encode_cursor("AC/DC ?&=+", 1)
+        assert all(c.isalnum() or c in "-_" for c in cursor)
+    
+    def test_empty_cursor(self):
+        assert decode_cursor("") is None
+        assert decode_cursor(None) is None
+    
+    def test_garbage_cursor(self):
+        assert decode_cursor("not-a-cursor") is None
+    
+    def test_wrong_shape_cursor(self):
+        assert decode_cursor(encode_cursor("a", "b")) is None
+    
+    def test_sort_value_of_wrong_type_rejected(self):
+        assert decode_cursor(encode_cursor("Undertow", 1), int) is None
+        assert decode_cursor(encode_cursor(1993, 1), str) is None
+        assert decode_cursor(encode_cursor({"a": 1}, 1), str) is None
+        assert decode_cursor(encode_cursor([1], 1), int) is None
+        assert decode_cursor(encode_cursor(True, 1), int) is None
+        assert decode_cursor(encode_cursor(1993, 1), int) == (1993, 1)
+    
+    def test_sort_key_types(self):
+        assert sort_key_type(Album.title) is str
+        assert sort_key_type(album_year_sort_key()) is int
+
+
+class TestTotalCount:
+    @pytest.fixture(autouse=True)
+    def empty_cache(self):
+        count_cache.invalidate()
+        yield
+        count_cache.invalidate()
+    
+    def test_counted_once_per_query(self, mocker):
+        count = mocker.patch.object(type(Album.select()), 'count', return_value=12)
+        
+        assert total_count(Album.select().where(Album.is_wanted == False)) == 12
+        assert total_count(Album.select().where(Album.is_wanted == False)) == 12
+        assert count.call_count == 1
+        
+        total_count(Album.select().where(Album.is_wanted == True))
+        assert count.call_count == 2
+
+
+class TestClampPageSize:
+    def test_default(self):
+        assert clamp_page_size(DEFAULT_PAGE_SIZE) == DEFAULT_PAGE_SIZE
+    
+    def test_too_large(self):
+        assert clamp_page_size(10000) == MAX_PAGE_SIZE
+    
+    def test_too_small(self):
+        assert clamp_page_size(0) == 1
+    
+    def test_invalid(self):
+        assert clamp_page_size("abc") == DEFAULT_PAGE_SIZE
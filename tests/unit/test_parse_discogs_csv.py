@@ -2,33 +2,53 @@ import pytest
 import sys
 sys.path.insert(0, '/Users/hanzonian/Documents/personal/music-library')
 
-from app.services.import_csv import parse_discogs_csv
+from app.services import import_csv
+from app.services.import_csv import parse_discogs_csv, DuplicateIndex, row_fingerprint
+from app.utils.artists import artist_mappings
+
+
+@pytest.fixture
+def duplicate_index(mocker):
+    index = DuplicateIndex()
+    mocker.patch('app.services.import_csv.load_duplicate_index', return_value=index)
+    return index
+
+
+@pytest.fixture
+def fingerprints(mocker):
+    known = {}
+    mocker.patch('app.services.import_csv.load_fingerprints', return_value=known)
+    return known
+
+
+@pytest.fixture
+def write_albums(mocker, duplicate_index, fingerprints):
+    mocker.patch('app.utils.artists.load_artist_mappings', return_value=[])
+    mocker.patch('app.services.import_csv.invalidate_album_caches')
+    mocker.patch('app.services.import_csv.save_fingerprints')
+    artist_mappings.invalidate()
+    yield mocker.patch('app.services.import_csv.write_albums')
+    artist_mappings.invalidate()
+
+
+def written_rows(write_albums) -> list:
+    return [row for call in write_albums.call_args_list for row in call.args[0]]
 
 
 class TestParseDiscogsCsv:
-    def test_import_single_album(self, mocker):
-        mocker.patch('app.services.import_csv.detect_artist_mappings')
-        mock_album_select = mocker.patch('app.services.import_csv.Album.select')
-        mock_album_select.return_value.where.return_value.first.return_value = None
-        mock_album_create = mocker.patch('app.services.import_csv.Album.create')
-        
+    def test_import_single_album(self, write_albums):
         csv_content = b"Artist,Title,Format,Released,release_id\nTool,Undertow,CD,2023,123456"
         
         result = parse_discogs_csv(csv_content)
         
         assert result['imported'] == 1
-        mock_album_create.assert_called_once()
-        call_kwargs = mock_album_create.call_args[1]
+        write_albums.assert_called_once()
+        call_kwargs = written_rows(write_albums)[0]
         assert call_kwargs['title'] == 'Undertow'
         assert call_kwargs['artist'] == 'Tool'
         assert call_kwargs['discogs_id'] == '123456'
     
-    def test_import_multiple_albums(self, mocker):
-        mocker.patch('app.services.import_csv.detect_artist_mappings')
-        mock_album_select = mocker.patch('app.services.import_csv.Album.select')
-        mock_album_select.return_value.where.return_value.first.return_value = None
-        mock_album_create = mocker.patch('app.services.import_csv.Album.create')
-        
+    def test_import_multiple_albums(self, write_albums):
         csv_content = b"""Artist,Title,Format,Released,release_id
 Tool,Undertow,CD,2023,123
 Tool,Fear Inoculum,CD,2023,456"""
@@ -37,11 +57,8 @@ Tool,Fear Inoculum,CD,2023,456"""
         
         assert result['imported'] == 2
     
-    def test_skip_duplicate_by_discogs_id(self, mocker):
-        mocker.patch('app.services.import_csv.detect_artist_mappings')
-        mock_existing = mocker.MagicMock()
-        mock_album_select = mocker.patch('app.services.import_csv.Album.select')
-        mock_album_select.return_value.where.return_value.first.return_value = mock_existing
+    def test_skip_duplicate_by_discogs_id(self, write_albums, duplicate_index):
+        duplicate_index.add('123', 'Tool', 'Undertow', 'Vinyl', '1993', False)
         
         csv_content = b"Artist,Title,Format,Released,release_id\nTool,Undertow,CD,2023,123"
         
@@ -50,11 +67,7 @@ Tool,Fear Inoculum,CD,2023,456"""
         assert result['imported'] == 0
         assert len(result['skipped_duplicates']) == 1
     
-    def test_skip_missing_artist(self, mocker):
-        mocker.patch('app.services.import_csv.detect_artist_mappings')
-        mock_album_select = mocker.patch('app.services.import_csv.Album.select')
-        mock_album_select.return_value.where.return_value.first.return_value = None
-        
+    def test_skip_missing_artist(self, write_albums):
         csv_content = b"Artist,Title,Format,Released,release_id\n,Undertow,CD,2023,123"
         
         result = parse_discogs_csv(csv_content)
@@ -62,11 +75,7 @@ Tool,Fear Inoculum,CD,2023,456"""
         assert result['imported'] == 0
         assert len(result['skipped_missing']) == 1
     
-    def test_skip_missing_title(self, mocker):
-        mocker.patch('app.services.import_csv.detect_artist_mappings')
-        mock_album_select = mocker.patch('app.services.import_csv.Album.select')
-        mock_album_select.return_value.where.return_value.first.return_value = None
-        
+    def test_skip_missing_title(self, write_albums):
         csv_content = b"Artist,Title,Format,Released,release_id\nTool,,CD,2023,123"
         
         result = parse_discogs_csv(csv_content)
@@ -74,138 +83,203 @@ Tool,Fear Inoculum,CD,2023,456"""
         assert result['imported'] == 0
         assert len(result['skipped_missing']) == 1
     
-    def test_applies_artist_mapping(self, mocker):
-        mocker.patch('app.services.import_csv.detect_artist_mappings')
-        mock_album_select = mocker.patch('app.services.import_csv.Album.select')
-        mock_album_select.return_value.where.return_value.first.return_value = None
-        mock_album_create = mocker.patch('app.services.import_csv.Album.create')
-        
+    def test_applies_artist_mapping(self, write_albums, mocker):
+        mocker.patch('app.models.ArtistMapping.create')
         csv_content = b"Artist,Title,Format,Released,release_id\nTool (2),Undertow,CD,2023,123"
         
         result = parse_discogs_csv(csv_content)
         
         assert result['imported'] == 1
-        call_kwargs = mock_album_create.call_args[1]
+        call_kwargs = written_rows(write_albums)[0]
         assert call_kwargs['artist'] == 'Tool'
     
-    def test_import_wanted_album(self, mocker):
-        mocker.patch('app.services.import_csv.detect_artist_mappings')
-        mock_album_select = mocker.patch('app.services.import_csv.Album.select')
-        mock_album_select.return_value.where.return_value.first.return_value = None
-        mock_album_create = mocker.patch('app.services.import_csv.Album.create')
-        
+    def test_import_wanted_album(self, write_albums):
         csv_content = b"Artist,Title,Format,Released,release_id\nTool,Undertow,CD,2023,123"
         
         result = parse_discogs_csv(csv_content, is_wanted=True)
         
         assert result['imported'] == 1
-        call_kwargs = mock_album_create.call_args[1]
+        call_kwargs = written_rows(write_albums)[0]
         assert call_kwargs['is_wanted'] == True
     
-    def test_maps_format_cd(self, mocker):
-        mocker.patch('app.services.import_csv.detect_artist_mappings')
-        mock_album_select = mocker.patch('app.services.import_csv.Album.select')
-        mock_album_select.return_value.where.return_value.first.return_value = None
-        mock_album_create = mocker.patch('app.services.import_csv.Album.create')
-        
+    def test_maps_format_cd(self, write_albums):
         csv_content = b"Artist,Title,Format,Released,release_id\nTool,Undertow,CD,2023,123"
         
         result = parse_discogs_csv(csv_content)
         
-        call_kwargs = mock_album_create.call_args[1]
+        call_kwargs = written_rows(write_albums)[0]
         assert call_kwargs['physical_format'] == 'CD'
     
-    def test_maps_format_vinyl(self, mocker):
-        mocker.patch('app.services.import_csv.detect_artist_mappings')
-        mock_album_select = mocker.patch('app.services.import_csv.Album.select')
-        mock_album_select.return_value.where.return_value.first.return_value = None
-        mock_album_create = mocker.patch('app.services.import_csv.Album.create')
-        
+    def test_maps_format_vinyl(self, write_albums):
         csv_content = b"Artist,Title,Format,Released,release_id\nTool,Undertow,12\" Vinyl,2023,123"
         
         result = parse_discogs_csv(csv_content)
         
-        call_kwargs = mock_album_create.call_args[1]
+        call_kwargs = written_rows(write_albums)[0]
         assert call_kwargs['physical_format'] == 'Vinyl'
     
-    def test_stores_discogs_year(self, mocker):
-        mocker.patch('app.services.import_csv.detect_artist_mappings')
-        mock_album_select = mocker.patch('app.services.import_csv.Album.select')
-        mock_album_select.return_value.where.return_value.first.return_value = None
-        mock_album_create = mocker.patch('app.services.import_csv.Album.create')
-        
+    def test_stores_discogs_year(self, write_albums):
         csv_content = b"Artist,Title,Format,Released,release_id\nTool,Undertow,CD,2023-11-15,123"
         
         result = parse_discogs_csv(csv_content)
         
-        call_kwargs = mock_album_create.call_args[1]
+        call_kwargs = written_rows(write_albums)[0]
         assert call_kwargs['year_discogs_release'] == 2023
         assert call_kwargs['year'] is None
     
-    def test_stores_notes(self, mocker):
-        mocker.patch('app.services.import_csv.detect_artist_mappings')
-        mock_album_select = mocker.patch('app.services.import_csv.Album.select')
-        mock_album_select.return_value.where.return_value.first.return_value = None
-        mock_album_create = mocker.patch('app.services.import_csv.Album.create')
-        
+    def test_stores_notes(self, write_albums):
         csv_content = b"Artist,Title,Format,Released,release_id,Notes\nTool,Undertow,CD,2023,123,First pressing"
         
         result = parse_discogs_csv(csv_content)
         
-        call_kwargs = mock_album_create.call_args[1]
+        call_kwargs = written_rows(write_albums)[0]
         assert call_kwargs['notes'] == 'First pressing'
     
-    def test_empty_notes_becomes_none(self, mocker):
-        mocker.patch('app.services.import_csv.detect_artist_mappings')
-        mock_album_select = mocker.patch('app.services.import_csv.Album.select')
-        mock_album_select.return_value.where.return_value.first.return_value = None
-        mock_album_create = mocker.patch('app.services.import_csv.Album.create')
-        
+    def test_empty_notes_becomes_none(self, write_albums):
         csv_content = b"Artist,Title,Format,Released,release_id,Notes\nTool,Undertow,CD,2023,123,"
         
         result = parse_discogs_csv(csv_content)
         
-        call_kwargs = mock_album_create.call_args[1]
+        call_kwargs = written_rows(write_albums)[0]
         assert call_kwargs['notes'] is None
     
-    def test_import_compilation_various_artist(self, mocker):
-        mocker.patch('app.services.import_csv.detect_artist_mappings')
-        mock_album_select = mocker.patch('app.services.import_csv.Album.select')
-        mock_album_select.return_value.where.return_value.first.return_value = None
-        mock_album_create = mocker.patch('app.services.import_csv.Album.create')
-        
+    def test_import_compilation_various_artist(self, write_albums):
         csv_content = b"Artist,Title,Format,Released,release_id\nVarious,Greatest Hits,CD,2023,123"
         
         result = parse_discogs_csv(csv_content)
         
         assert result['imported'] == 1
-        call_kwargs = mock_album_create.call_args[1]
+        call_kwargs = written_rows(write_albums)[0]
         assert call_kwargs['is_compilation'] == True
         assert call_kwargs['artist'] == 'Various'
     
-    def test_import_compilation_va(self, mocker):
-        mocker.patch('app.services.import_csv.detect_artist_mappings')
-        mock_album_select = mocker.patch('app.services.import_csv.Album.select')
-        mock_album_select.return_value.where.return_value.first.return_value = None
-        mock_album_create = mocker.patch('app.services.import_csv.Album.create')
-        
+    def test_import_compilation_va(self, write_albums):
         csv_content = b"Artist,Title,Format,Released,release_id\nV.A.,Movie Soundtrack,CD,2023,456"
         
         result = parse_discogs_csv(csv_content)
         
         assert result['imported'] == 1
-        call_kwargs = mock_album_create.call_args[1]
+        call_kwargs = written_rows(write_albums)[0]
         assert call_kwargs['is_compilation'] == True
     
-    def test_import_regular_artist_not_compilation(self, mocker):
-        mocker.patch('app.services.import_csv.detect_artist_mappings')
-        mock_album_select = mocker.patch('app.services.import_csv.Album.select')
-        mock_album_select.return_value.where.return_value.first.return_value = None
-        mock_album_create = mocker.patch('app.services.import_csv.Album.create')
-        
+    def test_import_regular_artist_not_compilation(self, write_albums):
         csv_content = b"Artist,Title,Format,Released,release_id\nTool,Undertow,CD,2023,123"
         
         result = parse_discogs_csv(csv_content)
         
-        call_kwargs = mock_album_create.call_args[1]
+        call_kwargs = written_rows(write_albums)[0]
         assert call_kwargs['is_compilation'] == False
+    
+    def test_skip_duplicate_by_artist_title_format(self, write_albums, duplicate_index):
+        duplicate_index.add(None, 'Tool', 'Undertow', 'CD', '2023', False)
+        
+        csv_content = b"Artist,Title,Format,Released,release_id\nTool,Undertow,CD,2023,999"
+        
+        result = parse_discogs_csv(csv_content)
+        
+        assert result['imported'] == 0
+        assert result['skipped_duplicates_count'] == 1
+        write_albums.assert_not_called()
+    
+    def test_same_album_in_other_list_is_not_duplicate(self, write_albums, duplicate_index):
+        duplicate_index.add(None, 'Tool', 'Undertow', 'CD', '2023', False)
+        
+        csv_content = b"Artist,Title,Format,Released,release_id\nTool,Undertow,CD,2023,"
+        
+        result = parse_discogs_csv(csv_content, is_wanted=True)
+        
+        assert result['imported'] == 1
+    
+    def test_skip_duplicate_within_file(self, write_albums):
+        csv_content = b"""Artist,Title,Format,Released,release_id
+Tool,Undertow,CD,2023,123
+Tool,Undertow,CD,2023,123"""
+        
+        result = parse_discogs_csv(csv_content)
+        
+        assert result['imported'] == 1
+        assert result['skipped_duplicates_count'] == 1
+    
+    def test_writes_in_batches(self, write_albums):
+        lines = [f"Tool,Album {i},CD,2023,{i}" for i in range(5)]
+        csv_content = ("Artist,Title,Format,Released,release_id\n" + "\n".join(lines)).encode()
+        
+        result = parse_discogs_csv(csv_content, batch_size=2)
+        
+        assert result['imported'] == 5
+        assert [len(call.args[0]) for call in write_albums.call_args_list] == [2, 2, 1]
+    
+    def test_failed_batch_retried_per_row(self, write_albums):
+        def write(rows):
+            if len(rows) > 1 or rows[0]['title'] == 'Bad':
+                raise ValueError("boom")
+            return [1]
+        write_albums.side_effect = write
+        
+        csv_content = b"""Artist,Title,Format,Released,release_id
+Tool,Undertow,CD,2023,1
+Tool,Bad,CD,2023,2
+Tool,Lateralus,CD,2023,3"""
+        
+        result = parse_discogs_csv(csv_content)
+        
+        assert result['imported'] == 2
+        assert result['errors'] == ["Row 3: boom"]
+
+
+class TestIncrementalImport:
+    CSV = b"""Artist,Title,Format,Released,release_id
+Tool,Undertow,CD,1993,123
+Tool,Lateralus,CD,2001,456
+Tool,Opiate,CD,1992,"""
+    
+    def test_first_import_counts_rows_as_new(self, write_albums):
+        result = parse_discogs_csv(self.CSV)
+        
+        assert (result['new'], result['changed'], result['unchanged']) == (3, 0, 0)
+        assert result['imported'] == 3
+    
+    def test_unchanged_rows_skipped_before_any_work(self, write_albums, fingerprints, mocker):
+        fingerprints['123'] = row_fingerprint({'Artist': 'Tool', 'Title': 'Undertow', 'Format': 'CD', 'Released': '1993'})
+        fingerprints['456'] = 'stale'
+        mock_album_row = mocker.patch('app.services.import_csv.album_row', wraps=import_csv.album_row)
+        
+        mock_normalize = mocker.patch('app.services.import_csv.normalize_row', wraps=import_csv.normalize_row)
+        
+        result = parse_discogs_csv(self.CSV)
+        
+        assert (result['new'], result['changed'], result['unchanged']) == (1, 1, 1)
+        assert mock_album_row.call_count == 2
+        assert mock_normalize.call_count == 2
+        assert [row['title'] for row in written_rows(write_albums)] == ['Lateralus', 'Opiate']
+    
+    def test_saves_fingerprints_of_rows_with_release_id(self, write_albums):
+        parse_discogs_csv(self.CSV, is_wanted=True)
+        
+        saved, is_wanted = import_csv.save_fingerprints.call_args[0]
+        assert set(saved) == {'123', '456'}
+        assert is_wanted is True
+    
+    def test_failed_rows_not_fingerprinted(self, write_albums):
+        write_albums.side_effect = ValueError("boom")
+        
+        result = parse_discogs_csv(self.CSV)
+        
+        assert import_csv.save_fingerprints.call_args[0][0] == {}
+        assert result['errors_count'] == 3
+    
+    def test_changed_duplicate_not_fingerprinted(self, write_albums, duplicate_index, fingerprints):
+        fingerprints['123'] = 'stale'
+        duplicate_index.add('123', 'Tool', 'Undertow', 'CD', '1993', False)
+        
+        result = parse_discogs_csv(self.CSV)
+        
+        assert result['changed'] == 1
+        assert result['skipped_duplicates_count'] == 1
+        assert '123' not in import_csv.save_fingerprints.call_args[0][0]
+    
+    def test_fingerprint_ignores_unrelated_columns(self):
+        row = {'Artist': 'Tool', 'Title': 'Undertow', 'Format': 'CD', 'Released': '1993'}
+        
+        assert row_fingerprint(row) == row_fingerprint(dict(row, Rating='5', Label='Zoo'))
+        assert row_fingerprint(row) != row_fingerprint(dict(row, Notes='Signed'))
@@ -0,0 +1,46 @@
+import pytest
+import sys
+sys.path.insert(0, '/Users/hanzonian/Documents/personal/music-library')
+
+from app.utils.rate_limit import TokenBucket
+
+
+@pytest.fixture
+def clock(mocker):
+    now = [100.0]
+    mocker.patch('app.utils.rate_limit.time.monotonic', side_effect=lambda: now[0])
+    return now
+
+
+class TestTokenBucket:
+    def test_burst_goes_out_immediately(self, clock):
+        bucket = TokenBucket(rate=2, burst=3)
+        
+        assert [bucket.reserve() for _ in range(3)] == [0, 0, 0]
+    
+    def test_waits_grow_by_one_interval_per_caller(self, clock):
+        bucket = TokenBucket(rate=2, burst=1)
+        
+        assert [bucket.reserve() for _ in range(4)] == [0, 0.5, 1.0, 1.5]
+    
+    def test_tokens_refill_over_time(self, clock):
+        bucket = TokenBucket(rate=1, burst=2)
+        bucket.reserve()
+        bucket.reserve()
+        
+        clock[0] += 10
+        
+        assert [bucket.reserve() for _ in range(3)] == [0, 0, 1.0]
+    
+    def test_invalid_settings_rejected(self):
+        with pytest.raises(ValueError):
+            TokenBucket(rate=0)
+    
+    async def test_acquire_sleeps_for_reserved_wait(self, clock, mocker):
+        mock_sleep = mocker.patch('app.utils.rate_limit.asyncio.sleep')
+        bucket = TokenBucket(rate=4, burst=1)
+        
+        await bucket.acquire()
+        await bucket.acquire()
+        
+        mock_sleep.assert_called_once_with(0.25)
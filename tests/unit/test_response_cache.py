@@ -0,0 +1,124 @@
+import pytest
+import sys
+sys.path.insert(0, '/Users/hanzonian/Documents/personal/music-library')
+
+import zlib
+import httpx
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from app.services import lastfm, response_cache
+from app.services.response_cache import normalized_url, cache_key, entry_response, revalidation_headers
+from app.services.lastfm import rate_limited_request, cache_ttl, LASTFM_API_BASE
+
+
+def make_entry(body=b'{"toptags": {}}', expires_in=timedelta(hours=1), **headers):
+    return SimpleNamespace(
+        id=1, url=LASTFM_API_BASE, status_code=200,
+        headers={'content-type': 'application/json', **headers},
+        body=zlib.compress(body), expires_at=datetime.now() + expires_in,
+    )
+
+
+class TestCacheKeys:
+    def test_api_key_left_out_and_params_sorted(self):
+        url = normalized_url(LASTFM_API_BASE, {'method': 'artist.getinfo', 'artist': 'Sigur Rós', 'api_key': 'secret'})
+        
+        assert 'secret' not in url
+        assert url == normalized_url(LASTFM_API_BASE, {'artist': 'Sigur Rós', 'api_key': 'other', 'method': 'artist.getinfo'})
+    
+    def test_method_is_part_of_key(self):
+        assert cache_key('GET', LASTFM_API_BASE) != cache_key('POST', LASTFM_API_BASE)
+    
+    def test_ttl_per_endpoint(self):
+        assert cache_ttl('GET', LASTFM_API_BASE, {'method': 'album.getinfo'}) == timedelta(days=30)
+        assert cache_ttl('GET', 'https://www.last.fm/music/Tool') == timedelta(days=7)
+        assert cache_ttl('GET', 'https://lastfm.freetls.fastly.net/i/u/cover.jpg') is None
+        assert cache_ttl('POST', LASTFM_API_BASE, {'method': 'album.getinfo'}) is None
+
+
+class TestEntryResponse:
+    def test_rebuilds_response_from_entry(self):
+        response = entry_response(make_entry(body=b'{"a": 1}'))
+        
+        assert response.status_code == 200
+        assert response.json() == {'a': 1}
+    
+    def test_revalidation_headers(self):
+        entry = make_entry(etag='"abc"', **{'last-modified': 'Mon, 01 Jan 2024 00:00:00 GMT'})
+        
+        assert revalidation_headers(entry) == {
+            'If-None-Match': '"abc"', 'If-Modified-Since': 'Mon, 01 Jan 2024 00:00:00 GMT'
+        }
+
+
+class TestCachedRequest:
+    PARAMS = {'method': 'artist.gettoptags', 'artist': 'Tool', 'api_key': 'key', 'format': 'json'}
+    
+    @pytest.fixture(autouse=True)
+    def cache(self, mocker):
+        mocker.patch('app.services.lastfm.LASTFM_CACHE_MAX_MB', 256)
+        mocker.patch('app.services.lastfm.lastfm_limiter.acquire')
+        mocker.patch('app.services.response_cache.store_response')
+        mocker.patch('app.services.response_cache.refresh_entry')
+    
+    def client(self, handler):
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    
+    async def test_fresh_hit_skips_network_and_rate_limit(self, mocker):
+        mocker.patch('app.services.response_cache.load_entry', return_value=make_entry())
+        handler = mocker.Mock()
+        
+        async with self.client(handler) as client:
+            response = await rate_limited_request(client, "GET", LASTFM_API_BASE, params=self.PARAMS)
+        
+        assert response.json() == {'toptags': {}}
+        handler.assert_not_called()
+        lastfm.lastfm_limiter.acquire.assert_not_called()
+    
+    async def test_miss_is_fetched_and_stored(self, mocker):
+        mocker.patch('app.services.response_cache.load_entry', return_value=None)
+        
+        async with self.client(lambda request: httpx.Response(200, json={'fresh': True})) as client:
+            response = await rate_limited_request(client, "GET", LASTFM_API_BASE, params=self.PARAMS)
+        
+        assert response.json() == {'fresh': True}
+        key, url, stored, ttl = response_cache.store_response.call_args[0]
+        assert 'api_key' not in url
+        assert ttl == timedelta(days=7)
+    
+    async def test_stale_entry_revalidated_with_etag(self, mocker):
+        entry = make_entry(expires_in=timedelta(hours=-1), etag='"v1"')
+        mocker.patch('app.services.response_cache.load_entry', return_value=entry)
+        seen = []
+        
+        def handler(request):
+            seen.append(request.headers.get('If-None-Match'))
+            return httpx.Response(304)
+        
+        async with self.client(handler) as client:
+            response = await rate_limited_request(client, "GET", LASTFM_API_BASE, params=self.PARAMS)
+        
+        assert seen == ['"v1"']
+        assert response.json() == {'toptags': {}}
+        response_cache.refresh_entry.assert_called_once()
+        response_cache.store_response.assert_not_called()
+    
+    async def test_errors_not_cached(self, mocker):
+        mocker.patch('app.services.response_cache.load_entry', return_value=None)
+        mocker.patch('app.services.lastfm.asyncio.sleep')
+        
+        async with self.client(lambda request: httpx.Response(404)) as client:
+            with pytest.raises(Exception):
+                await rate_limited_request(client, "GET", LASTFM_API_BASE, params=self.PARAMS)
+        
+        response_cache.store_response.assert_not_called()
+    
+    async def test_api_error_with_200_not_cached(self, mocker):
+        mocker.patch('app.services.response_cache.load_entry', return_value=None)
+        body = {'error': 6, 'message': 'The artist you supplied could not be found'}
+        
+        async with self.client(lambda request: httpx.Response(200, json=body)) as client:
+            response = await rate_limited_request(client, "GET", LASTFM_API_BASE, params=self.PARAMS)
+        
+        assert response.json() == body
+        response_cache.store_response.assert_not_called()
@@ -0,0 +1,64 @@
+import pytest
+import sys
+sys.path.insert(0, '/Users/hanzonian/Documents/personal/music-library')
+
+from datetime import timedelta
+from app.services.scrape_failures import backoff, record_scrape_results, ALBUM
+
+
+class TestBackoff:
+    def test_doubles_after_each_miss(self, mocker):
+        mocker.patch('app.services.scrape_failures.SCRAPE_BACKOFF_HOURS', 24)
+        
+        assert [backoff(n) for n in (1, 2, 3)] == [timedelta(hours=24), timedelta(hours=48), timedelta(hours=96)]
+    
+    def test_capped(self, mocker):
+        mocker.patch('app.services.scrape_failures.SCRAPE_BACKOFF_MAX_DAYS', 90)
+        
+        assert backoff(50) == timedelta(days=90)
+
+
+class TestRecordScrapeResults:
+    @pytest.fixture
+    def db_calls(self, mocker):
+        mocker.patch('app.services.scrape_failures.LASTFM_API_KEY', 'key')
+        mocker.patch('app.services.scrape_failures.db.atomic')
+        delete = mocker.patch('app.services.scrape_failures.ScrapeFailure.delete')
+        insert = mocker.patch('app.services.scrape_failures.ScrapeFailure.insert_many')
+        select = mocker.patch('app.services.scrape_failures.ScrapeFailure.select')
+        select.return_value.where.return_value.tuples.return_value = [('2', 2)]
+        return delete, insert
+    
+    def test_misses_recorded_with_growing_attempts(self, db_calls):
+        delete, insert = db_calls
+        
+        record_scrape_results(ALBUM, [1, 2], [{'updated': False}, {'updated': False}])
+        
+        rows = insert.call_args[0][0]
+        assert [(row['key'], row['attempts']) for row in rows] == [('1', 1), ('2', 3)]
+        assert rows[1]['retry_after'] - rows[1]['last_attempt_at'] == backoff(3)
+        delete.assert_not_called()
+    
+    def test_updates_clear_record_and_errors_ignored(self, db_calls):
+        delete, insert = db_calls
+        
+        record_scrape_results(ALBUM, [1, 2], [{'updated': True}, None])
+        
+        delete.assert_called_once()
+        insert.assert_not_called()
+    
+    def test_unreachable_not_counted_as_miss(self, db_calls):
+        delete, insert = db_calls
+        
+        record_scrape_results(ALBUM, [1], [{'updated': False, 'failed': True}])
+        
+        insert.assert_not_called()
+    
+    def test_nothing_recorded_without_api_key(self, mocker, db_calls):
+        delete, insert = db_calls
+        mocker.patch('app.services.scrape_failures.LASTFM_API_KEY', '')
+        
+        record_scrape_results(ALBUM, [1, 2], [{'updated': False}, {'updated': True}])
+        
+        insert.assert_not_called()
+        delete.assert_not_called()
@@ -0,0 +1,162 @@
+import pytest
+import sys
+sys.path.insert(0, '/Users/hanzonian/Documents/personal/music-library')
+
+from datetime import datetime, timedelta
+from peewee import IntegrityError
+from app.services import scrape_jobs
+from app.services.scrape_jobs import (job_progress, run_job, save_batch, item_state, submit_scrape, finish_job,
+                                      requeue_job, SCRAPE_KINDS)
+from app.models import ScrapeJob
+
+
+JOB_FIELDS = {
+    'kind': 'album', 'items_total': 100, 'items_processed': 0, 'items_updated': 0, 'items_at_start': 0,
+}
+
+
+class TestJobProgress:
+    def test_rate_counts_only_the_current_run(self, make_job):
+        started = datetime(2024, 1, 1, 12, 0, 0)
+        job = make_job(items_processed=60, items_at_start=40,
+                       started_at=started, heartbeat_at=started + timedelta(seconds=10))
+        
+        progress = job_progress(job)
+        
+        assert progress['items_per_second'] == 2.0
+        assert progress['eta_seconds'] == 20
+    
+    def test_paused_job_has_no_eta(self, make_job):
+        started = datetime(2024, 1, 1, 12, 0, 0)
+        job = make_job(status='paused', items_processed=10,
+                       started_at=started, heartbeat_at=started + timedelta(seconds=10))
+        
+        assert job_progress(job)['eta_seconds'] is None
+
+
+class TestRunJob:
+    @pytest.fixture
+    def runner(self, mocker):
+        statuses = ['running', 'running', 'running']
+        mocker.patch('app.services.scrape_jobs.job_status', side_effect=lambda job: statuses.pop(0) if statuses else 'running')
+        mocker.patch('app.services.scrape_jobs.pending_keys', side_effect=[['1', '2'], ['3'], []])
+        mocker.patch.dict(SCRAPE_KINDS, {'album': (lambda keys: [None if k == '2' else k for k in keys], mocker.Mock())})
+        mocker.patch('app.services.scrape_jobs.scrape_many', side_effect=lambda items, scrape: [{'updated': True} for _ in items])
+        mocker.patch('app.services.scrape_jobs.save_batch')
+        mocker.patch('app.services.scrape_jobs.finish_job')
+        return statuses
+    
+    async def test_processes_batches_until_done(self, runner, make_job):
+        job = make_job()
+        
+        await run_job(job)
+        
+        batches = [call.args[1:3] for call in scrape_jobs.save_batch.call_args_list]
+        assert batches == [(['1', '2'], ['1']), (['3'], ['3'])]
+        scrape_jobs.finish_job.assert_called_once_with(job, 'done')
+    
+    async def test_stops_when_paused(self, runner, make_job):
+        runner[1:] = ['paused']
+        
+        await run_job(make_job())
+        
+        assert scrape_jobs.save_batch.call_count == 1
+        scrape_jobs.finish_job.assert_not_called()
+    
+    async def test_stops_when_claimed_by_another_worker(self, runner, make_job):
+        scrape_jobs.save_batch.return_value = False
+        
+        await run_job(make_job())
+        
+        assert scrape_jobs.save_batch.call_count == 1
+        scrape_jobs.finish_job.assert_not_called()
+    
+    async def test_failure_recorded(self, runner, make_job):
+        scrape_jobs.save_batch.side_effect = RuntimeError("db gone")
+        job = make_job()
+        
+        await run_job(job)
+        
+        scrape_jobs.finish_job.assert_called_once_with(job, 'failed', 'db gone')
+
+
+class TestSaveBatch:
+    def test_item_states(self, mocker, make_job):
+        mocker.patch('app.services.scrape_jobs.db.atomic')
+        mocker.patch('app.services.scrape_jobs.ScrapeJob.update')
+        mocker.patch('app.services.scrape_jobs.record_scrape_results')
+        item_update = mocker.patch('app.services.scrape_jobs.ScrapeJobItem.update')
+        
+        save_batch(make_job(), ['1', '2', '3', '4'], ['1', '3', '4'], [{'updated': True}, {'updated': False}, None])
+        
+        states = sorted(call.kwargs['status'] for call in item_update.call_args_list)
+        assert states == ['failed', 'gone', 'missed', 'updated']
+    
+    def test_rejected_once_claimed_by_another_worker(self, mocker, make_job):
+        mocker.patch('app.services.scrape_jobs.db.atomic')
+        mocker.patch('app.services.scrape_jobs.ScrapeJob.update').return_value.where.return_value.execute.return_value = 0
+        record = mocker.patch('app.services.scrape_jobs.record_scrape_results')
+        item_update = mocker.patch('app.services.scrape_jobs.ScrapeJobItem.update')
+        
+        assert save_batch(make_job(), ['1'], ['1'], [{'updated': True}]) is False
+        item_update.assert_not_called()
+        record.assert_not_called()
+    
+    def test_unreachable_item_failed_not_missed(self):
+        assert item_state({'updated': False, 'failed': True}) == 'failed'
+
+
+class TestSubmitScrape:
+    def test_unknown_kind_rejected(self):
+        with pytest.raises(ValueError):
+            submit_scrape('label', [])
+    
+    def test_active_job_returned(self, mocker, make_job):
+        active = make_job()
+        mocker.patch('app.services.scrape_jobs.active_job', return_value=active)
+        create = mocker.patch('app.services.scrape_jobs.ScrapeJob.create')
+        
+        assert submit_scrape('album', ['1']) is active
+        create.assert_not_called()
+    
+    def test_concurrent_submission_returns_winner(self, mocker, make_job):
+        winner = make_job(id=2)
+        mocker.patch('app.services.scrape_jobs.active_job', side_effect=[None, winner])
+        mocker.patch('app.services.scrape_jobs.db.atomic')
+        mocker.patch('app.services.scrape_jobs.ScrapeJob.create', side_effect=IntegrityError('scrapejob_active_kind'))
+        
+        assert submit_scrape('album', ['1']) is winner
+
+
+class TestClaimNextJob:
+    def test_waits_while_another_job_runs(self, mocker):
+        mocker.patch('app.services.scrape_jobs.db.atomic')
+        execute_sql = mocker.patch('app.services.scrape_jobs.db.execute_sql')
+        select = mocker.patch('app.services.scrape_jobs.ScrapeJob.select')
+        select.return_value.where.return_value.exists.return_value = True
+        
+        assert scrape_jobs.claim_next_job() is None
+        assert 'pg_advisory_xact_lock' in execute_sql.call_args[0][0]
+        select.return_value.where.return_value.order_by.assert_not_called()
+
+
+class TestReclaimedJob:
+    @pytest.fixture
+    def update(self, mocker):
+        update = mocker.patch('app.services.scrape_jobs.ScrapeJob.update')
+        update.return_value.where.return_value.execute.return_value = 0
+        return update
+    
+    def guarded_by_token(self, update) -> bool:
+        guard = update.return_value.where.call_args[0][0]
+        return 'run-1' in ScrapeJob.select().where(guard).sql()[1]
+    
+    def test_final_status_written_only_by_owner(self, update, make_job):
+        finish_job(make_job(), 'done')
+        
+        assert self.guarded_by_token(update)
+    
+    def test_requeue_written_only_by_owner(self, update, make_job):
+        requeue_job(make_job())
+        
+        assert self.guarded_by_token(update)